@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.corpus import synthetic_documents
+from benchmarks.run import git_commit
+from models.docs import Document
+from models.rag import ChunkingConfig
+from services.chunking import TextChunker
+
+
+def bench_chunker(chunker: TextChunker, documents: List[Document], repeat: int) -> Dict[str, Any]:
+    """Best-of-``repeat`` time of ``split_documents`` over the whole corpus"""
+    chars = sum(len(document.content) for document in documents)
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = chunker.split_documents(documents)
+        best = min(best, time.perf_counter() - started)
+    sizes = sorted(len(chunk.content) for chunk in chunks)
+    return {
+        "length_function": chunker.config.length_function,
+        "chunk_size": chunker.chunk_size,
+        "chunk_overlap": chunker.chunk_overlap,
+        "documents": len(documents),
+        "chunks": len(chunks),
+        "seconds": round(best, 3),
+        "chunks_per_sec": round(len(chunks) / best, 1),
+        "mb_per_sec": round(chars / best / 2**20, 2),
+        "median_chunk_chars": sizes[len(sizes) // 2] if sizes else 0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Splitter throughput of TextChunker in char and token mode")
+    parser.add_argument("--chunks", type=int, default=100_000, help="approximate corpus size in 1000-char chunks")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--token-chunk-size", type=int, default=256)
+    parser.add_argument("--token-chunk-overlap", type=int, default=32)
+    parser.add_argument("--modes", nargs="+", choices=["char", "token"], default=["char", "token"])
+    parser.add_argument("--model", default=None, help="tokenizer for token mode (default: EMBEDDING_MODEL_NAME)")
+    parser.add_argument("--standin", action="store_true", help="use the offline MiniLM stand-in's tokenizer")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="chunking_results.json")
+    args = parser.parse_args()
+
+    documents = list(synthetic_documents(args.chunks, seed=args.seed))
+    results = {
+        "commit": git_commit(),
+        "corpus_chars": sum(len(document.content) for document in documents),
+        "runs": [],
+    }
+    for mode in args.modes:
+        if mode == "char":
+            chunker = TextChunker(ChunkingConfig(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap))
+        else:
+            from services.chunking import load_tokenizer
+            model_name = args.model
+            if args.standin:
+                from benchmarks.standin import build_minilm_standin
+                model_name = build_minilm_standin(os.path.join(tempfile.gettempdir(), "minilm-standin"))
+            tokenizer = load_tokenizer(model_name) if model_name else load_tokenizer()
+            config = ChunkingConfig(
+                chunk_size=max(100, args.token_chunk_size),
+                chunk_overlap=args.token_chunk_overlap,
+                length_function="token",
+            )
+            chunker = TextChunker(config, tokenizer=tokenizer, max_tokens=args.token_chunk_size)
+        run = bench_chunker(chunker, documents, args.repeat)
+        results["runs"].append(run)
+        print(f"{mode:>5}: {run['chunks_per_sec']} chunks/s, {run['mb_per_sec']} MiB/s "
+              f"({run['chunks']} chunks in {run['seconds']} s)")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+import random
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List
+
+import numpy as np
+
+from models.docs import Document, DocumentMetadata, SourceType
+
+_TOPICS = {
+    "onboarding": "laptop badge orientation buddy checklist payroll benefits enrollment manager welcome",
+    "pto": "vacation leave holiday accrual carryover approval calendar sick parental policy",
+    "engineering": "deploy rollback incident oncall pager runbook kubernetes service latency alert",
+    "security": "password rotation vpn mfa phishing access review audit encryption secrets",
+    "product": "roadmap launch codename milestone feedback beta customer pricing tier",
+}
+_FILLER = "the a of to and for with on is are be this that our team please when how".split()
+_AUTHORS = ["alice", "bob", "carol", "dan", "erin", "frank"]
+_SOURCES = [SourceType.notion, SourceType.confluence, SourceType.google_docs]
+_WORD = re.compile(r"\w+")
+
+
+def synthetic_documents(num_chunks: int, chunk_chars: int = 900, seed: int = 0) -> Iterator[Document]:
+    """Deterministic documents sized so that chunking yields roughly ``num_chunks`` chunks"""
+    rng = random.Random(seed)
+    topics = list(_TOPICS)
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    produced, doc_index = 0, 0
+    while produced < num_chunks:
+        topic = rng.choice(topics)
+        vocab = _TOPICS[topic].split()
+        chunks_in_doc = min(rng.randint(1, 8), num_chunks - produced)
+        paragraphs = []
+        for _ in range(chunks_in_doc):
+            words = []
+            while sum(len(w) + 1 for w in words) < chunk_chars - 40:
+                words.append(rng.choice(vocab) if rng.random() < 0.4 else rng.choice(_FILLER))
+            if rng.random() < 0.2:
+                words.append(f"INC-{rng.randint(1000, 9999)}")
+            paragraphs.append(" ".join(words) + ".")
+        source_type = _SOURCES[doc_index % len(_SOURCES)]
+        yield Document(
+            id=f"{source_type.value}-{doc_index}",
+            content="\n\n".join(paragraphs),
+            metadata=DocumentMetadata(
+                source_type=source_type,
+                source_id=f"{source_type.value}-{doc_index}",
+                title=f"{topic.title()} guide {doc_index}",
+                url=f"https://docs.example.com/{source_type.value}/{doc_index}",
+                last_updated=(base + timedelta(hours=doc_index)).isoformat(),
+                author=rng.choice(_AUTHORS),
+            ),
+        )
+        produced += chunks_in_doc
+        doc_index += 1
+
+
+class HashingEmbedder:
+    """Deterministic, offline stand-in for the sentence-transformers model.
+
+    Words are hashed into ``dim`` signed buckets (the hashing trick) and the
+    result L2-normalised, so lexically similar texts get nearby vectors.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self._cache = {}
+
+    def _bucket(self, word: str):
+        entry = self._cache.get(word)
+        if entry is None:
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "big")
+            entry = self._cache[word] = (value % self.dim, 1.0 if value >> 63 else -1.0)
+        return entry
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in _WORD.findall(text.lower()):
+                index, sign = self._bucket(word)
+                vectors[row, index] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self.embed([text])[0]
+
+
+def perturbed_queries(texts: List[str], count: int, seed: int = 1) -> List[str]:
+    """Queries made from random windows of indexed chunks with some words dropped"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        words = rng.choice(texts).split()
+        start = rng.randrange(max(1, len(words) - 12))
+        window = [w for w in words[start:start + 12] if rng.random() > 0.25]
+        queries.append(" ".join(window) or words[0])
+    return queries
+
+
+class FakeChatModel:
+    """Deterministic, offline stand-in for the chat model.
+
+    Streams the first ``words`` words of the prompt's context back as the
+    answer, sleeping ``token_delay_ms`` per word to mimic generation speed.
+    """
+
+    model = "fake-chat-model"
+
+    def __init__(self, words: int = 40, token_delay_ms: float = 0.0):
+        self.words = words
+        self.token_delay = token_delay_ms / 1000
+
+    async def astream(self, messages, max_tokens, temperature):
+        context = messages[0]["content"].split("Context:", 1)[-1]
+        for word in context.split()[:min(self.words, max_tokens)]:
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield word + " "
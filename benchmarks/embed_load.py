@@ -0,0 +1,80 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from benchmarks.corpus import perturbed_queries, synthetic_documents
+from benchmarks.run import git_commit, percentiles
+from services.batching import EmbeddingMicroBatcher
+from services.embeddings import EmbeddingEngine
+
+
+async def _load(embed: Callable[[str], Awaitable[Any]], questions: List[str], concurrency: int) -> Dict[str, Any]:
+    """Keep ``concurrency`` queries in flight until every question is embedded"""
+    pending = iter(questions)
+    latencies: List[float] = []
+
+    async def client() -> None:
+        for question in pending:
+            started = time.perf_counter()
+            await embed(question)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"queries_per_sec": round(len(questions) / elapsed, 1), "latency_ms": percentiles(latencies)}
+
+
+async def bench(engine: EmbeddingEngine, questions: List[str], concurrency: int, max_batch_size: int, max_wait_ms: float) -> Dict[str, Any]:
+    unbatched = await _load(lambda text: asyncio.to_thread(engine.embed_query, text), questions, concurrency)
+    batcher = EmbeddingMicroBatcher(engine.embed, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    try:
+        batched = await _load(batcher.embed, questions, concurrency)
+    finally:
+        batcher.close()
+    batched["avg_batch_size"] = batcher.stats()["avg_batch_size"]
+    return {"concurrency": concurrency, "unbatched": unbatched, "batched": batched}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query-embedding throughput and latency with and without micro-batching")
+    parser.add_argument("--model", default=None, help="sentence-transformers model (default: EMBEDDING_MODEL_NAME)")
+    parser.add_argument("--standin", action="store_true", help="use an offline MiniLM-shaped model with random weights")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--queries", type=int, default=512)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--output", default="embed_load_results.json")
+    args = parser.parse_args()
+
+    model_name = args.model
+    if args.standin:
+        from benchmarks.standin import build_minilm_standin
+        model_name = build_minilm_standin(os.path.join(tempfile.gettempdir(), "minilm-standin"))
+    if model_name is None:
+        from core.config import settings
+        model_name = settings.EMBEDDING_MODEL_NAME
+
+    engine = EmbeddingEngine(model_name=model_name, batch_size=args.max_batch_size)
+    engine.embed(["warm up"])
+    texts = [document.content for document in synthetic_documents(2000)]
+    questions = perturbed_queries(texts, args.queries)
+    results = {"commit": git_commit(), "model": model_name, "runs": []}
+    for concurrency in args.concurrency:
+        run = asyncio.run(bench(engine, questions, concurrency, args.max_batch_size, args.max_wait_ms))
+        results["runs"].append(run)
+        print(f"concurrency {concurrency:>3}: "
+              f"unbatched {run['unbatched']['queries_per_sec']} q/s p95 {run['unbatched']['latency_ms']['p95']} ms, "
+              f"batched {run['batched']['queries_per_sec']} q/s p95 {run['batched']['latency_ms']['p95']} ms "
+              f"(avg batch {run['batched']['avg_batch_size']})")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
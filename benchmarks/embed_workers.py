@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.corpus import synthetic_documents
+from benchmarks.run import git_commit
+from models.rag import ChunkingConfig
+from services.chunking import TextChunker
+from services.embeddings import EmbeddingEngine
+
+
+def _chunks(num_chunks: int, seed: int) -> List[str]:
+    chunker = TextChunker(ChunkingConfig(chunk_size=1000, chunk_overlap=0))
+    texts = [text for document in synthetic_documents(num_chunks, seed=seed) for text in chunker.split_text(document.content)]
+    return texts[:num_chunks]
+
+
+def bench_workers(model_name: str, texts: List[str], workers: int, batch_size: int) -> Dict[str, Any]:
+    """Chunks/sec of ``EmbeddingEngine.embed`` with ``workers`` processes (0 embeds in-process)"""
+    engine = EmbeddingEngine(model_name, batch_size=batch_size, workers=workers)
+    try:
+        # Load the model in every worker before timing
+        engine.embed(texts[:batch_size * max(1, workers)])
+        started = time.perf_counter()
+        vectors = engine.embed(texts)
+        elapsed = time.perf_counter() - started
+    finally:
+        engine.close()
+    return {
+        "workers": workers,
+        "chunks": len(vectors),
+        "seconds": round(elapsed, 2),
+        "chunks_per_sec": round(len(vectors) / elapsed, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Embedding throughput (chunks/sec) versus process-pool size")
+    parser.add_argument("--model", default=None, help="sentence-transformers model (default: EMBEDDING_MODEL_NAME)")
+    parser.add_argument("--standin", action="store_true", help="use an offline MiniLM-shaped model with random weights")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="embed_workers_results.json")
+    args = parser.parse_args()
+
+    model_name = args.model
+    if args.standin:
+        from benchmarks.standin import build_minilm_standin
+        model_name = build_minilm_standin(os.path.join(tempfile.gettempdir(), "minilm-standin"))
+    if model_name is None:
+        from core.config import settings
+        model_name = settings.EMBEDDING_MODEL_NAME
+
+    texts = _chunks(args.chunks, args.seed)
+    results = {
+        "commit": git_commit(),
+        "model": model_name,
+        "cpu_count": os.cpu_count(),
+        "batch_size": args.batch_size,
+        "runs": [],
+    }
+    for workers in args.workers:
+        run = bench_workers(model_name, texts, workers, args.batch_size)
+        results["runs"].append(run)
+        print(f"{workers} workers: {run['chunks_per_sec']} chunks/s ({run['chunks']} chunks in {run['seconds']} s)")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.corpus import HashingEmbedder, perturbed_queries, synthetic_documents
+from benchmarks.run import git_commit, percentiles
+from models.docs import SourceType
+from models.rag import ChunkingConfig
+from services.chunking import TextChunker
+from services.filters import build_where
+from services.pipeline import build_document_pipeline
+
+# Notion dominates, so an unfiltered top-k rarely contains a Confluence chunk
+_SOURCE_WEIGHTS = {SourceType.notion: 0.85, SourceType.google_docs: 0.10, SourceType.confluence: 0.05}
+
+
+async def _skewed_documents(num_chunks: int, seed: int):
+    rng = random.Random(seed)
+    source_types, weights = list(_SOURCE_WEIGHTS), list(_SOURCE_WEIGHTS.values())
+    for document in synthetic_documents(num_chunks, seed=seed):
+        source_type = rng.choices(source_types, weights)[0]
+        yield document.model_copy(update={
+            "metadata": document.metadata.model_copy(update={"source_type": source_type}),
+        })
+
+
+def build_collection(num_chunks: int, embedder: HashingEmbedder, seed: int, path: str) -> Any:
+    import chromadb
+    client = chromadb.PersistentClient(path=path)
+    collection = client.get_or_create_collection("filtered_bench", metadata={"hnsw:space": "cosine"})
+    pipeline = build_document_pipeline(
+        collection,
+        parse=lambda document: document,
+        chunker=TextChunker(ChunkingConfig(chunk_size=1000, chunk_overlap=0)),
+        engine=embedder,
+    )
+    asyncio.run(pipeline.run(_skewed_documents(num_chunks, seed)))
+    return collection
+
+
+def bench_filtered(collection: Any, embedder: HashingEmbedder, num_queries: int, k: int, seed: int) -> Dict[str, Any]:
+    """Confluence-only queries: where clause inside the search vs filtering the unfiltered top-k"""
+    where = build_where(source_types=[SourceType.confluence])
+    subset = collection.get(where=where, include=["embeddings"])
+    subset_ids = subset["ids"]
+    subset_vectors = np.asarray(subset["embeddings"], dtype=np.float32)
+    sample = collection.get(limit=5000, include=["documents"])["documents"]
+    queries = embedder.embed(perturbed_queries(sample, num_queries, seed))
+
+    pushed_ms: List[float] = []
+    post_ms: List[float] = []
+    pushed_recall: List[float] = []
+    post_recall: List[float] = []
+    post_returned: List[int] = []
+    for query in queries:
+        scores = subset_vectors @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        expected = {subset_ids[i] for i in top}
+
+        started = time.perf_counter()
+        found = collection.query(query_embeddings=[query], n_results=k, where=where, include=[])["ids"][0]
+        pushed_ms.append((time.perf_counter() - started) * 1000)
+        pushed_recall.append(len(set(found) & expected) / k)
+
+        started = time.perf_counter()
+        result = collection.query(query_embeddings=[query], n_results=k, include=["metadatas"])
+        kept = [i for i, m in zip(result["ids"][0], result["metadatas"][0]) if m["source_type"] == SourceType.confluence.value]
+        post_ms.append((time.perf_counter() - started) * 1000)
+        post_recall.append(len(set(kept) & expected) / k)
+        post_returned.append(len(kept))
+
+    return {
+        "queries": num_queries,
+        "k": k,
+        "filtered_chunks": len(subset_ids),
+        "where_in_search": {
+            "latency_ms": percentiles(pushed_ms),
+            f"recall_at_{k}": round(float(np.mean(pushed_recall)), 4),
+        },
+        "post_filter": {
+            "latency_ms": percentiles(post_ms),
+            f"recall_at_{k}": round(float(np.mean(post_recall)), 4),
+            "mean_results": round(float(np.mean(post_returned)), 2),
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latency and recall of source-filtered queries on a skewed Chroma index")
+    parser.add_argument("--chunks", type=int, default=500_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--path", default=None, help="Chroma directory (default: a temporary one)")
+    parser.add_argument("--output", default="filtered_results.json")
+    args = parser.parse_args()
+
+    embedder = HashingEmbedder()
+    path = args.path or tempfile.mkdtemp(prefix="filtered-bench-")
+    started = time.perf_counter()
+    collection = build_collection(args.chunks, embedder, args.seed, path)
+    results = {
+        "commit": git_commit(),
+        "corpus_chunks": collection.count(),
+        "build_seconds": round(time.perf_counter() - started, 1),
+        **bench_filtered(collection, embedder, args.queries, args.k, args.seed + 1),
+    }
+    pushed, post = results["where_in_search"], results["post_filter"]
+    print(f"{results['corpus_chunks']} chunks ({results['filtered_chunks']} Confluence), k={args.k}")
+    print(f"where in search: p95 {pushed['latency_ms']['p95']} ms, recall@{args.k} {pushed[f'recall_at_{args.k}']}")
+    print(f"post-filter:     p95 {post['latency_ms']['p95']} ms, recall@{args.k} {post[f'recall_at_{args.k}']}, "
+          f"{post['mean_results']} results on average")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
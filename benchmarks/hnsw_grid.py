@@ -0,0 +1,173 @@
+import argparse
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Sequence, Set
+
+import numpy as np
+
+from benchmarks.corpus import HashingEmbedder, perturbed_queries, synthetic_documents
+from benchmarks.run import git_commit, percentiles
+from models.rag import IndexConfig
+from services.ann import Int8VectorIndex, open_collection
+
+_ADD_BATCH = 5000
+
+
+def _chunk_texts(num_chunks: int, seed: int) -> List[str]:
+    texts = [
+        paragraph
+        for document in synthetic_documents(num_chunks, seed=seed)
+        for paragraph in document.content.split("\n\n")
+    ]
+    return texts[:num_chunks]
+
+
+def _directory_bytes(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def _recall(found: Sequence[str], expected: Set[str], k: int) -> float:
+    return len(set(found) & expected) / k
+
+
+def bench_hnsw(
+    ids: List[str],
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    truth: List[Set[str]],
+    m: int,
+    ef_construction: int,
+    ef_search_values: Sequence[int],
+    k: int,
+) -> List[Dict[str, Any]]:
+    """Build one Chroma HNSW index with (M, ef_construction) and query it at each ef_search"""
+    import chromadb
+    from chromadb.api.client import SharedSystemClient
+    from chromadb.config import Settings as ChromaSettings
+
+    def client() -> Any:
+        # A fresh system, so the segment is loaded again with the collection's current ef_search
+        SharedSystemClient.clear_system_cache()
+        return chromadb.PersistentClient(path=path, settings=ChromaSettings(anonymized_telemetry=False))
+
+    path = tempfile.mkdtemp(prefix="hnsw-grid-")
+    try:
+        config = IndexConfig(hnsw_m=m, hnsw_ef_construction=ef_construction, hnsw_ef_search=ef_search_values[0])
+        collection = open_collection(client(), "hnsw_grid", config)
+        started = time.perf_counter()
+        for start in range(0, len(ids), _ADD_BATCH):
+            collection.add(ids=ids[start:start + _ADD_BATCH], embeddings=vectors[start:start + _ADD_BATCH])
+        build_seconds = time.perf_counter() - started
+        index_bytes = _directory_bytes(path)
+
+        rows = []
+        for ef_search in ef_search_values:
+            collection = open_collection(client(), "hnsw_grid", config.model_copy(update={"hnsw_ef_search": ef_search}))
+            latencies, recalls = [], []
+            for query, expected in zip(queries, truth):
+                started = time.perf_counter()
+                found = collection.query(query_embeddings=[query], n_results=k, include=[])["ids"][0]
+                latencies.append((time.perf_counter() - started) * 1000)
+                recalls.append(_recall(found, expected, k))
+            rows.append({
+                "index": "hnsw",
+                "m": m,
+                "ef_construction": ef_construction,
+                "ef_search": ef_search,
+                "build_seconds": round(build_seconds, 1),
+                "index_bytes": index_bytes,
+                "latency_ms": percentiles(latencies),
+                f"recall_at_{k}": round(float(np.mean(recalls)), 4),
+            })
+        return rows
+    finally:
+        SharedSystemClient.clear_system_cache()
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def bench_int8(
+    ids: List[str],
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    truth: List[Set[str]],
+    rescore_multipliers: Sequence[int],
+    k: int,
+) -> List[Dict[str, Any]]:
+    """Exhaustive int8 scoring with exact float32 rescoring of the best k * multiplier candidates"""
+    rows = []
+    for multiplier in rescore_multipliers:
+        index = Int8VectorIndex.build(ids, vectors, metric="cosine", rescore_multiplier=multiplier)
+        latencies, recalls = [], []
+        for query, expected in zip(queries, truth):
+            started = time.perf_counter()
+            found = [chunk_id for chunk_id, _ in index.search(query, k)]
+            latencies.append((time.perf_counter() - started) * 1000)
+            recalls.append(_recall(found, expected, k))
+        rows.append({
+            "index": "int8",
+            "rescore_multiplier": multiplier,
+            "index_bytes": index.nbytes,
+            "latency_ms": percentiles(latencies),
+            f"recall_at_{k}": round(float(np.mean(recalls)), 4),
+        })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recall, latency and size over the HNSW parameter grid, plus int8")
+    parser.add_argument("--chunks", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--ef-construction", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 128])
+    parser.add_argument("--rescore", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="hnsw_grid_results.json")
+    args = parser.parse_args()
+
+    embedder = HashingEmbedder()
+    texts = _chunk_texts(args.chunks, args.seed)
+    ids = [f"chunk-{i}" for i in range(len(texts))]
+    vectors = embedder.embed(texts)
+    queries = embedder.embed(perturbed_queries(texts, args.queries, args.seed + 1))
+    truth = []
+    for query in queries:
+        top = np.argpartition(-(vectors @ query), args.k - 1)[:args.k]
+        truth.append({ids[i] for i in top})
+
+    rows = bench_int8(ids, vectors, queries, truth, args.rescore, args.k)
+    for m, ef_construction in itertools.product(args.m, args.ef_construction):
+        rows += bench_hnsw(ids, vectors, queries, truth, m, ef_construction, args.ef_search, args.k)
+
+    recall = f"recall_at_{args.k}"
+    for row in rows:
+        if row["index"] == "int8":
+            label = f"int8 rescore x{row['rescore_multiplier']}"
+        else:
+            label = f"hnsw M={row['m']} efC={row['ef_construction']} efS={row['ef_search']}"
+        print(f"{label:<34} p95 {row['latency_ms']['p95']:>8} ms  {recall} {row[recall]:<6}  "
+              f"{row['index_bytes'] / 2**20:.1f} MiB")
+    results = {
+        "commit": git_commit(),
+        "corpus_chunks": len(ids),
+        "float32_bytes": int(vectors.nbytes),
+        "queries": len(queries),
+        "k": args.k,
+        "runs": rows,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import tempfile
+import threading
+import time
+from typing import Any, Dict
+
+from benchmarks.corpus import HashingEmbedder, synthetic_documents
+from benchmarks.rss import memory_mb
+from benchmarks.run import git_commit
+from services.manifest import IndexManifest
+from services.pipeline import build_document_pipeline
+
+
+class NullCollection:
+    """Accepts writes and drops them, so only the pipeline's own memory is measured"""
+
+    def __init__(self):
+        self.written = 0
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.written += len(ids)
+
+    def delete(self, ids):
+        pass
+
+
+async def _documents(num_chunks: int, seed: int):
+    for document in synthetic_documents(num_chunks, seed=seed):
+        yield document
+
+
+def run(num_chunks: int, seed: int, use_manifest: bool) -> Dict[str, Any]:
+    collection = NullCollection()
+    manifest = IndexManifest(os.path.join(tempfile.mkdtemp(), "manifest.json")) if use_manifest else None
+    pipeline = build_document_pipeline(collection, lambda document: document, engine=HashingEmbedder(), manifest=manifest)
+
+    samples = []
+    done = threading.Event()
+
+    def sample() -> None:
+        while not done.wait(1.0):
+            samples.append(memory_mb()["rss_mb"])
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    baseline = memory_mb()["rss_mb"]
+    started = time.perf_counter()
+    sampler.start()
+    try:
+        report = asyncio.run(pipeline.run(_documents(num_chunks, seed)))
+    finally:
+        done.set()
+        sampler.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "chunks": collection.written,
+        "elapsed_seconds": round(elapsed, 1),
+        "chunks_per_sec": round(collection.written / elapsed, 1),
+        "baseline_rss_mb": baseline,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "rss_samples_mb": samples[::max(1, len(samples) // 50)],
+        "manifest": use_manifest,
+        "max_queue_depth": {name: stage["max_queue_depth"] for name, stage in report["stages"].items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Peak memory of the ingestion pipeline over a large synthetic crawl")
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--limit-mb", type=float, default=2048, help="fail if peak RSS exceeds this")
+    parser.add_argument("--no-manifest", action="store_true", help="skip the index manifest (kept in memory during a crawl)")
+    parser.add_argument("--output", default="pipeline_memory_results.json")
+    args = parser.parse_args()
+
+    result = run(args.chunks, args.seed, not args.no_manifest)
+    result["commit"] = git_commit()
+    result["limit_mb"] = args.limit_mb
+    result["within_limit"] = result["peak_rss_mb"] <= args.limit_mb
+    print(f"{result['chunks']} chunks in {result['elapsed_seconds']}s ({result['chunks_per_sec']} chunks/s), "
+          f"peak RSS {result['peak_rss_mb']} MiB (limit {args.limit_mb} MiB)")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {args.output}")
+    if not result["within_limit"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+from benchmarks.run import git_commit
+
+_TEXTS = ["How many vacation days carry over into next year?"] * 32
+
+
+def memory_mb(pid: str = "self") -> Dict[str, float]:
+    """RSS, PSS and USS of a process in MiB, from /proc (Linux only)"""
+    values: Dict[str, float] = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": round(values.get("Rss", 0.0), 1),
+        "pss_mb": round(values.get("Pss", 0.0), 1),
+        "uss_mb": round(values.get("Private_Clean", 0.0) + values.get("Private_Dirty", 0.0), 1),
+    }
+
+
+def _load(model_name: str):
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(model_name, device="cpu")
+    model.encode(_TEXTS)
+    return model
+
+
+def in_process(model_name: str, copies: int) -> Dict[str, Any]:
+    """One worker holding ``copies`` model instances"""
+    models = [_load(model_name) for _ in range(copies)]
+    return {"copies": len(models), **memory_mb()}
+
+
+def preload_fork(model_name: str, workers: int) -> Dict[str, Any]:
+    """Load once, then fork workers that each embed, like ``gunicorn --preload``"""
+    model = _load(model_name)
+    parent = memory_mb()
+    pipes, pids = [], []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            model.encode(_TEXTS)
+            os.write(write_fd, json.dumps(memory_mb()).encode("ascii"))
+            os.close(write_fd)
+            os._exit(0)
+        os.close(write_fd)
+        pipes.append(read_fd)
+        pids.append(pid)
+    children: List[Dict[str, float]] = []
+    for read_fd, pid in zip(pipes, pids):
+        with os.fdopen(read_fd, "rb") as f:
+            children.append(json.loads(f.read()))
+        os.waitpid(pid, 0)
+    return {"parent": parent, "workers": children}
+
+
+def _run_isolated(args: List[str]) -> Dict[str, Any]:
+    output = subprocess.check_output([sys.executable, "-m", "benchmarks.rss", *args], text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-worker memory with per-router vs shared model copies")
+    parser.add_argument("--model", default=None, help="sentence-transformers model (default: EMBEDDING_MODEL_NAME)")
+    parser.add_argument("--standin", action="store_true", help="use an offline MiniLM-shaped model with random weights")
+    parser.add_argument("--copies", type=int, default=3, help="model copies per worker before the shared container")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--output", default="rss_results.json")
+    parser.add_argument("--scenario", choices=["in_process", "preload_fork"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    model_name = args.model
+    if args.standin:
+        from benchmarks.standin import build_minilm_standin
+        model_name = build_minilm_standin(os.path.join(tempfile.gettempdir(), "minilm-standin"))
+    if model_name is None:
+        from core.config import settings
+        model_name = settings.EMBEDDING_MODEL_NAME
+
+    if args.scenario == "in_process":
+        print(json.dumps(in_process(model_name, args.copies)))
+        return
+    if args.scenario == "preload_fork":
+        print(json.dumps(preload_fork(model_name, args.workers)))
+        return
+
+    common = ["--model", model_name, "--workers", str(args.workers)]
+    results = {
+        "commit": git_commit(),
+        "model": model_name,
+        "per_router": _run_isolated(["--scenario", "in_process", "--copies", str(args.copies), *common]),
+        "container": _run_isolated(["--scenario", "in_process", "--copies", "1", *common]),
+        "preload": _run_isolated(["--scenario", "preload_fork", *common]),
+    }
+    before, after = results["per_router"], results["container"]
+    print(f"per-router ({args.copies} copies): RSS {before['rss_mb']} MiB")
+    print(f"shared container (1 copy):  RSS {after['rss_mb']} MiB")
+    for i, worker in enumerate(results["preload"]["workers"]):
+        print(f"preload worker {i}: RSS {worker['rss_mb']} MiB, PSS {worker['pss_mb']} MiB, USS {worker['uss_mb']} MiB")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
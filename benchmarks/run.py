@@ -0,0 +1,230 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models.rag import ChunkingConfig
+from services.ann import Int8VectorIndex
+from services.chunking import TextChunker
+from services.keyword_index import KeywordIndex
+from services.manifest import IndexManifest
+
+from benchmarks.corpus import FakeChatModel, HashingEmbedder, perturbed_queries, synthetic_documents
+
+_PAGE = 10_000
+
+
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    values = np.asarray(samples_ms)
+    return {f"p{p}": round(float(np.percentile(values, p)), 3) for p in (50, 95, 99)}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _documents(num_chunks: int, seed: int):
+    for document in synthetic_documents(num_chunks, seed=seed):
+        yield document
+
+
+def bench_ingest(num_chunks: int, embedder: HashingEmbedder, seed: int, path: str) -> Tuple[Dict[str, Any], Any, KeywordIndex]:
+    """Index a synthetic corpus through ``DocumentService`` into a persistent Chroma collection"""
+    import chromadb
+    from chromadb.config import Settings as ChromaSettings
+
+    from services.ann import open_collection
+    from services.document import DocumentService
+
+    client = chromadb.PersistentClient(path=path, settings=ChromaSettings(anonymized_telemetry=False))
+    collection = open_collection(client, "benchmark")
+    keyword_index = KeywordIndex()
+    service = DocumentService(
+        collection=collection,
+        engine=embedder,
+        chunker=TextChunker(ChunkingConfig(chunk_size=1000, chunk_overlap=0)),
+        cache=None,
+        manifest=IndexManifest(os.path.join(path, "manifest.json")),
+        keyword_index=keyword_index,
+    )
+    started = time.perf_counter()
+    documents = asyncio.run(service.index_documents(_documents(num_chunks, seed)))
+    elapsed = time.perf_counter() - started
+    chunks = collection.count()
+    return {
+        "documents": len(documents),
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "chunks_per_sec": round(chunks / elapsed, 1),
+    }, collection, keyword_index
+
+
+def _load_corpus(collection: Any) -> Tuple[List[str], List[str], np.ndarray]:
+    ids: List[str] = []
+    texts: List[str] = []
+    vectors: List[np.ndarray] = []
+    for offset in range(0, collection.count(), _PAGE):
+        page = collection.get(limit=_PAGE, offset=offset, include=["documents", "embeddings"])
+        ids += page["ids"]
+        texts += page["documents"]
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+    return ids, texts, np.concatenate(vectors)
+
+
+def bench_retrieval(
+    collection: Any,
+    keyword_index: KeywordIndex,
+    embedder: HashingEmbedder,
+    num_queries: int,
+    k: int,
+    seed: int,
+) -> Tuple[Dict[str, Any], List[str]]:
+    """Chroma HNSW and int8 latency and recall@k against brute force, plus BM25 latency; also returns the queries"""
+    ids, texts, vectors = _load_corpus(collection)
+    queries = perturbed_queries(texts, num_queries, seed)
+    query_vectors = embedder.embed(queries)
+
+    brute_ms, truth = [], []
+    for query in query_vectors:
+        started = time.perf_counter()
+        scores = vectors @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        brute_ms.append((time.perf_counter() - started) * 1000)
+        truth.append({ids[i] for i in top})
+
+    hnsw_ms, hnsw_recall = [], []
+    for query, expected in zip(query_vectors, truth):
+        started = time.perf_counter()
+        found = collection.query(query_embeddings=[query], n_results=k, include=[])["ids"][0]
+        hnsw_ms.append((time.perf_counter() - started) * 1000)
+        hnsw_recall.append(len(set(found) & expected) / k)
+
+    int8 = Int8VectorIndex.build(ids, vectors, metric="cosine")
+    int8_ms, int8_recall = [], []
+    for query, expected in zip(query_vectors, truth):
+        started = time.perf_counter()
+        found = {chunk_id for chunk_id, _ in int8.search(query, k)}
+        int8_ms.append((time.perf_counter() - started) * 1000)
+        int8_recall.append(len(found & expected) / k)
+
+    keyword_ms = []
+    for query in queries:
+        started = time.perf_counter()
+        keyword_index.search(query, k)
+        keyword_ms.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "queries": num_queries,
+        "k": k,
+        "brute_force_ms": percentiles(brute_ms),
+        "chroma_hnsw": {
+            "latency_ms": percentiles(hnsw_ms),
+            f"recall_at_{k}": round(float(np.mean(hnsw_recall)), 4),
+        },
+        "int8": {
+            "latency_ms": percentiles(int8_ms),
+            f"recall_at_{k}": round(float(np.mean(int8_recall)), 4),
+            "index_bytes": int8.nbytes,
+            "float32_bytes": int(vectors.nbytes),
+        },
+        "keyword_ms": percentiles(keyword_ms),
+    }, queries
+
+
+def bench_query(
+    collection: Any,
+    keyword_index: KeywordIndex,
+    embedder: HashingEmbedder,
+    questions: List[str],
+    k: int,
+    token_delay_ms: float,
+) -> Dict[str, Any]:
+    """End-to-end ``POST /query`` latency in-process, with the fake chat model and no answer cache"""
+    from fastapi.testclient import TestClient
+
+    from core.config import settings
+    from main import app
+    from services.container import get_rag_service
+    from services.rag import RAGService
+
+    async def embed_query(text: str) -> np.ndarray:
+        return embedder.embed_query(text)
+
+    service = RAGService(
+        collection=collection,
+        llm=FakeChatModel(token_delay_ms=token_delay_ms),
+        embed_query=embed_query,
+        cache=None,
+        conversations=None,
+        keyword_index=keyword_index,
+        reranker=None,
+    )
+    # Measure the query path, not the per-caller rate limits
+    settings.RATE_LIMIT_USER_PER_MINUTE = settings.RATE_LIMIT_ROUTE_PER_SECOND = 1e9
+    settings.RATE_LIMIT_USER_BURST = settings.RATE_LIMIT_ROUTE_BURST = 10**9
+    app.dependency_overrides[get_rag_service] = lambda: service
+    # No lifespan, so the real models are never warmed up
+    client = TestClient(app)
+    latencies = []
+    try:
+        for question in questions:
+            started = time.perf_counter()
+            client.post("/query", json={"question": question, "num_sources": k}).raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+    finally:
+        app.dependency_overrides.pop(get_rag_service, None)
+    return {"queries": len(questions), "token_delay_ms": token_delay_ms, "latency_ms": percentiles(latencies)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline ingest, retrieval and /query benchmarks on synthetic corpora")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000], help="corpus sizes in chunks (e.g. 10000 100000 1000000)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--token-delay-ms", type=float, default=0.0, help="fake LLM delay per streamed word")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--path", default=None, help="directory for the Chroma indexes (default: a temporary one)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    embedder = HashingEmbedder()
+    root = args.path or tempfile.mkdtemp(prefix="benchmark-")
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": args.seed,
+        "runs": [],
+    }
+    for size in args.sizes:
+        ingest, collection, keyword_index = bench_ingest(size, embedder, args.seed, os.path.join(root, str(size)))
+        retrieval, queries = bench_retrieval(collection, keyword_index, embedder, args.queries, args.k, args.seed + 1)
+        query = bench_query(collection, keyword_index, embedder, queries, args.k, args.token_delay_ms)
+        results["runs"].append({"corpus_chunks": size, "ingest": ingest, "retrieval": retrieval, "query": query})
+        print(f"{size:>9} chunks: ingest {ingest['chunks_per_sec']} chunks/s, "
+              f"HNSW p95 {retrieval['chroma_hnsw']['latency_ms']['p95']} ms "
+              f"recall@{args.k} {retrieval['chroma_hnsw'][f'recall_at_{args.k}']}, "
+              f"int8 p95 {retrieval['int8']['latency_ms']['p95']} ms "
+              f"recall@{args.k} {retrieval['int8'][f'recall_at_{args.k}']}, "
+              f"keyword p95 {retrieval['keyword_ms']['p95']} ms, "
+              f"/query p95 {query['latency_ms']['p95']} ms")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import re
+from typing import Set
+
+from benchmarks.corpus import synthetic_documents
+
+# all-MiniLM-L6-v2 and ms-marco-MiniLM-L-6-v2 share this BERT shape
+MINILM_L6 = dict(
+    vocab_size=30522,
+    hidden_size=384,
+    num_hidden_layers=6,
+    num_attention_heads=12,
+    intermediate_size=1536,
+    max_position_embeddings=512,
+)
+_SPECIAL = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+
+
+def _write_vocab(path: str) -> None:
+    words: Set[str] = set()
+    for document in synthetic_documents(2000):
+        words.update(re.findall(r"\w+", document.content.lower()))
+    vocab = _SPECIAL + sorted(set("abcdefghijklmnopqrstuvwxyz0123456789.,:;!?-_/()'\"")) + sorted(words)
+    vocab += [f"##{c}" for c in "abcdefghijklmnopqrstuvwxyz0123456789"]
+    vocab += [f"[unused{i}]" for i in range(MINILM_L6["vocab_size"] - len(vocab))]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(vocab) + "\n")
+
+
+def build_minilm_standin(directory: str, cross_encoder: bool = False) -> str:
+    """Save a randomly initialised MiniLM-L6 so model benchmarks run without the Hugging Face Hub.
+
+    Throughput and memory match the real model (same architecture and
+    sequence limits); the embeddings themselves are meaningless, so use the
+    stand-in for latency and RSS, never for recall. Returns a path usable as
+    ``EMBEDDING_MODEL_NAME`` or ``RERANK_MODEL_NAME``.
+    """
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification, BertModel, BertTokenizerFast
+
+    target = os.path.join(directory, "cross-encoder" if cross_encoder else "bi-encoder")
+    if os.path.exists(os.path.join(target, "config.json")):
+        return target
+    os.makedirs(target, exist_ok=True)
+    vocab_path = os.path.join(directory, "vocab.txt")
+    if not os.path.exists(vocab_path):
+        _write_vocab(vocab_path)
+    tokenizer = BertTokenizerFast(vocab_path, do_lower_case=True, model_max_length=512)
+    torch.manual_seed(0)
+    if cross_encoder:
+        model = BertForSequenceClassification(BertConfig(num_labels=1, **MINILM_L6))
+        model.save_pretrained(target)
+        tokenizer.save_pretrained(target)
+        return target
+
+    from sentence_transformers import SentenceTransformer, models
+    transformer_dir = os.path.join(directory, "bi-encoder-transformer")
+    BertModel(BertConfig(**MINILM_L6)).save_pretrained(transformer_dir)
+    tokenizer.save_pretrained(transformer_dir)
+    transformer = models.Transformer(transformer_dir, max_seq_length=256)
+    pooling = models.Pooling(transformer.get_word_embedding_dimension(), "mean")
+    SentenceTransformer(modules=[transformer, pooling, models.Normalize()], device="cpu").save(target)
+    return target
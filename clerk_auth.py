@@ -1,4 +1,10 @@
-import requests
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
 from jose import jwt, JWTError
 
 # Clerk configuration for your project
@@ -17,27 +23,151 @@ CLERK_AUDIENCE = "https://api.clerk.com"  # Backend API URL as audience
 # 6wIDAQAB
 # -----END PUBLIC KEY-----
 
-_jwks = None
+JWKS_TTL_SECONDS = 60 * 60
+JWKS_MIN_REFRESH_SECONDS = 30  # throttles refreshes triggered by unknown kids
+TOKEN_CACHE_SIZE = 4096
+TOKEN_EXPIRY_LEEWAY_SECONDS = 5
+
+JWKSFetcher = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+class ClerkAuthError(Exception):
+    pass
 
-def get_jwks():
-    global _jwks
-    if _jwks is None:
-        resp = requests.get(CLERK_JWKS_URL)
+
+async def _fetch_clerk_jwks() -> Dict[str, Any]:
+    async with httpx.AsyncClient(timeout=10) as client:
+        resp = await client.get(CLERK_JWKS_URL)
         resp.raise_for_status()
-        _jwks = resp.json()
-    return _jwks
+        return resp.json()
+
+
+class JWKSProvider:
+    """Caches the JWKS for ``ttl`` seconds and refetches when a token names an unknown ``kid``.
+
+    Concurrent refreshes are single-flighted behind one lock. Tests can pass a
+    ``fetcher`` returning a local key set instead of calling Clerk.
+    """
+
+    def __init__(
+        self,
+        fetcher: JWKSFetcher = _fetch_clerk_jwks,
+        ttl: float = JWKS_TTL_SECONDS,
+        min_refresh_interval: float = JWKS_MIN_REFRESH_SECONDS,
+    ):
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._jwks: Optional[Dict[str, Any]] = None
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get_jwks(self, force: bool = False) -> Dict[str, Any]:
+        if self._is_fresh(force):
+            return self._jwks
+        requested_at = time.monotonic()
+        async with self._lock:
+            # Another caller may have refreshed while we waited for the lock
+            if self._fetched_at >= requested_at or self._is_fresh(force):
+                return self._jwks
+            try:
+                self._jwks = await self.fetcher()
+                self._fetched_at = time.monotonic()
+            except Exception:
+                if self._jwks is None:
+                    raise
+                # Keep serving the last known keys if Clerk is briefly unreachable
+        return self._jwks
+
+    async def get_key(self, kid: Optional[str]) -> Dict[str, Any]:
+        key = self._find(await self.get_jwks(), kid)
+        if key is None and time.monotonic() - self._fetched_at >= self.min_refresh_interval:
+            key = self._find(await self.get_jwks(force=True), kid)
+        if key is None:
+            raise ClerkAuthError(f"Invalid Clerk JWT: unknown signing key {kid!r}")
+        return key
+
+    def _is_fresh(self, force: bool) -> bool:
+        if self._jwks is None:
+            return False
+        if force:
+            return time.monotonic() - self._fetched_at < self.min_refresh_interval
+        return time.monotonic() - self._fetched_at < self.ttl
+
+    @staticmethod
+    def _find(jwks: Dict[str, Any], kid: Optional[str]) -> Optional[Dict[str, Any]]:
+        keys = jwks.get("keys", [])
+        if kid is None and len(keys) == 1:
+            return keys[0]
+        return next((key for key in keys if key.get("kid") == kid), None)
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of verified claims keyed by token hash; entries die at ``exp``"""
 
-def verify_clerk_token(token: str):
-    jwks = get_jwks()
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE, leeway: float = TOKEN_EXPIRY_LEEWAY_SECONDS):
+        self.max_size = max_size
+        self.leeway = leeway
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        claims = self._entries.get(key)
+        if claims is None:
+            return None
+        if claims.get("exp", 0) - self.leeway <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return dict(claims)
+
+    def put(self, key: str, claims: Dict[str, Any]) -> None:
+        if "exp" not in claims:
+            return
+        self._entries[key] = dict(claims)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_jwks_provider = JWKSProvider()
+_token_cache = VerifiedTokenCache()
+
+
+def set_jwks_provider(provider: JWKSProvider) -> None:
+    """Swap the JWKS source, e.g. for a local stub in tests"""
+    global _jwks_provider
+    _jwks_provider = provider
+    _token_cache.clear()
+
+
+async def get_jwks() -> Dict[str, Any]:
+    return await _jwks_provider.get_jwks()
+
+
+async def verify_clerk_token(token: str) -> Dict[str, Any]:
+    cache_key = _token_cache.key(token)
+    payload = _token_cache.get(cache_key)
+    if payload is not None:
+        return payload
     try:
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = await _jwks_provider.get_key(kid)
         payload = jwt.decode(
             token,
-            jwks,
+            key,
             algorithms=["RS256"],
             audience=CLERK_AUDIENCE,
             issuer=CLERK_ISSUER,
             options={"verify_at_hash": False}
         )
-        return payload
     except JWTError as e:
-        raise Exception(f"Invalid Clerk JWT: {e}") 
\ No newline at end of file
+        raise ClerkAuthError(f"Invalid Clerk JWT: {e}")
+    _token_cache.put(cache_key, payload)
+    return payload
@@ -0,0 +1,265 @@
+import asyncio
+import heapq
+import ipaddress
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+
+from core.config import settings
+from core.metrics import registry
+from models.auth import UserResponse
+from services.container import get_optional_user
+
+# Lower runs first when the LLM is saturated
+INTERACTIVE = 0
+SLACK = 1
+BATCH = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", SLACK: "slack", BATCH: "batch"}
+
+ADMISSION_REJECTIONS = registry.counter(
+    "rag_admission_rejections_total", "Requests turned away by admission control", ("scope", "reason")
+)
+LLM_QUEUE_SECONDS = registry.histogram(
+    "rag_llm_queue_seconds", "Time spent waiting for an LLM generation slot", ("priority",)
+)
+
+
+class OverloadedError(Exception):
+    """No generation slot within the queue deadline; retry after ``retry_after`` seconds"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Server is overloaded ({reason}), retry in {math.ceil(retry_after)}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def overloaded_exception(error: OverloadedError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(error),
+        headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))}
+    )
+
+
+class RateLimiter:
+    """Non-blocking token buckets per key, for rejecting rather than delaying excess requests.
+
+    Only the ``max_keys`` most recently seen keys keep a bucket; a key that
+    was evicted starts again with a full bucket.
+    """
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def check(self, key: str, rate: float, burst: float) -> Optional[float]:
+        """Take one token for ``key``; None if allowed, else seconds until a token is available"""
+        if rate <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return None if allowed else (1 - tokens) / rate
+
+
+class PriorityGate:
+    """Bounded priority queue in front of LLM generation.
+
+    At most ``max_concurrency`` generations run at once. Up to ``max_queued``
+    callers wait, lowest priority value first; when the queue is full a
+    higher-priority arrival displaces the newest lowest-priority waiter, and
+    anything else is rejected at once. Each priority has a queue-time
+    deadline, so interactive callers fail fast with a retry hint instead of
+    timing out behind a backlog.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queued: int,
+        deadlines: Dict[int, Optional[float]],
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queued = max_queued
+        self.deadlines = deadlines
+        self._active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._service_seconds = 1.0  # moving average, used for Retry-After estimates
+        self._stats = {"admitted": 0, "queued": 0, "rejected_full": 0, "displaced": 0, "expired": 0}
+
+    async def acquire(self, priority: int = INTERACTIVE) -> None:
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            self._stats["admitted"] += 1
+            return
+        if len(self._waiters) >= self.max_queued:
+            self._make_room(priority)
+        started = time.monotonic()
+        entry = (priority, next(self._sequence), asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, entry)
+        self._stats["queued"] += 1
+        try:
+            await asyncio.wait_for(entry[2], self.deadlines.get(priority))
+        except BaseException as e:
+            future = entry[2]
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # The slot was handed over just as we gave up on it
+                self.release()
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            if isinstance(e, asyncio.TimeoutError):
+                self._stats["expired"] += 1
+                ADMISSION_REJECTIONS.inc(1, PRIORITY_NAMES.get(priority, str(priority)), "queue_deadline")
+                raise OverloadedError("queue deadline exceeded", self.retry_after()) from None
+            raise
+        finally:
+            LLM_QUEUE_SECONDS.observe(time.monotonic() - started, PRIORITY_NAMES.get(priority, str(priority)))
+        self._stats["admitted"] += 1
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)  # hand our slot straight to the next waiter
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int = INTERACTIVE) -> AsyncIterator[None]:
+        await self.acquire(priority)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._service_seconds = 0.9 * self._service_seconds + 0.1 * (time.monotonic() - started)
+            self.release()
+
+    async def run(self, priority: int, fn: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        async with self.slot(priority):
+            return await fn(*args)
+
+    def retry_after(self) -> float:
+        """Rough seconds until a new arrival would get a slot"""
+        waves = (len(self._waiters) + 1) / max(1, self.max_concurrency)
+        return max(1.0, waves * self._service_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "active": self._active,
+            "waiting": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queued": self.max_queued,
+            "avg_service_seconds": round(self._service_seconds, 3),
+        }
+
+    def _make_room(self, priority: int) -> None:
+        victim = max(self._waiters)  # lowest priority, newest
+        if victim[0] <= priority:
+            self._stats["rejected_full"] += 1
+            ADMISSION_REJECTIONS.inc(1, PRIORITY_NAMES.get(priority, str(priority)), "queue_full")
+            raise OverloadedError("generation queue full", self.retry_after())
+        self._waiters.remove(victim)
+        heapq.heapify(self._waiters)
+        victim[2].set_exception(OverloadedError("displaced by higher-priority work", self.retry_after()))
+        self._stats["displaced"] += 1
+        ADMISSION_REJECTIONS.inc(1, PRIORITY_NAMES.get(victim[0], str(victim[0])), "displaced")
+
+
+def _networks(addresses: List[str]) -> List[Any]:
+    return [ipaddress.ip_network(address, strict=False) for address in addresses]
+
+
+_trusted_proxies = _networks(settings.TRUSTED_PROXIES)
+
+
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in _trusted_proxies)
+
+
+def client_address(request: Request) -> str:
+    """The caller's IP; X-Forwarded-For is only believed when the peer is a trusted proxy.
+
+    The header is read right to left and the first hop that isn't one of our
+    proxies is taken, since anything further left is supplied by the client.
+    """
+    address = request.client.host if request.client else "unknown"
+    if not _is_trusted_proxy(address):
+        return address
+    hops = [hop.strip() for hop in request.headers.get("X-Forwarded-For", "").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        address = hop
+        if not _is_trusted_proxy(hop):
+            break
+    return address
+
+
+def client_key(request: Request, user: Optional[UserResponse] = None) -> str:
+    """Per-caller rate-limit key: the verified user id, or the client address for anonymous callers"""
+    if user is not None:
+        return "user:" + user.id
+    return "ip:" + client_address(request)
+
+
+def check_rate_limits(route: str, user_key: str) -> Optional[float]:
+    """Apply the per-route and per-user buckets; seconds to wait if either is exhausted"""
+    retry_after = rate_limiter.check(
+        f"route:{route}", settings.RATE_LIMIT_ROUTE_PER_SECOND, settings.RATE_LIMIT_ROUTE_BURST
+    )
+    if retry_after is not None:
+        ADMISSION_REJECTIONS.inc(1, route, "route_rate")
+        return retry_after
+    retry_after = rate_limiter.check(
+        f"user:{route}:{user_key}", settings.RATE_LIMIT_USER_PER_MINUTE / 60, settings.RATE_LIMIT_USER_BURST
+    )
+    if retry_after is not None:
+        ADMISSION_REJECTIONS.inc(1, route, "user_rate")
+    return retry_after
+
+
+def rate_limit(route: str) -> Callable[[Request], Awaitable[None]]:
+    """Dependency that answers 429 with Retry-After once the route or caller is over its rate"""
+
+    async def dependency(request: Request, user: Optional[UserResponse] = Depends(get_optional_user)) -> None:
+        retry_after = check_rate_limits(route, client_key(request, user))
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+            )
+
+    return dependency
+
+
+rate_limiter = RateLimiter()
+llm_gate = PriorityGate(
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    max_queued=settings.LLM_MAX_QUEUED,
+    deadlines={
+        INTERACTIVE: settings.LLM_QUEUE_TIMEOUT_SECONDS,
+        SLACK: settings.LLM_QUEUE_TIMEOUT_SECONDS * 2,
+        BATCH: None,
+    },
+)
+registry.register_gauges("rag_llm_gate", "LLM generation admission queue", llm_gate.stats)
@@ -1,21 +1,11 @@
+from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
 from typing import List, Optional
-import os
-from dotenv import load_dotenv, find_dotenv
 
-# Load environment variables from .env file
-env_file = find_dotenv()
-if env_file:
-    load_dotenv(env_file)
-    print(f"Loaded .env file from: {env_file}")
-else:
-    print("No .env file found")
-
-# Debug: Print key env variables
-print("ENV SECRET_KEY:", os.environ.get("SECRET_KEY"))
-print("ENV GOOGLE_CLIENT_ID:", os.environ.get("GOOGLE_CLIENT_ID"))
-print("ENV GOOGLE_CLIENT_SECRET:", os.environ.get("GOOGLE_CLIENT_SECRET"))
+# Also export .env to os.environ, for libraries that read it directly (e.g. the OpenAI client)
+load_dotenv()
 
+# Values come from the environment and the .env file (see Config below)
 class Settings(BaseSettings):
     # Application Settings
     PROJECT_NAME: str = "Internal Docs Q&A API"
@@ -28,6 +18,7 @@ class Settings(BaseSettings):
     # Security
     SECRET_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    TOKEN_STORE_PATH: str = "token_store.sqlite3"
     
     # Google OAuth
     GOOGLE_CLIENT_ID: str
@@ -39,9 +30,95 @@ class Settings(BaseSettings):
     
     # OpenAI
     OPENAI_API_KEY: Optional[str] = None
+    OPENAI_MODEL: str = "gpt-4o-mini"
+    
+    # Service lifecycle
+    WARM_UP_SERVICES: bool = True  # build models in the background at startup, see /ready
+    PRELOAD_SERVICES_ON_IMPORT: bool = False  # for `gunicorn --preload` copy-on-write sharing
+    
+    # Slack
+    SLACK_SIGNING_SECRET: Optional[str] = None
+    SLACK_MAX_CONCURRENT_QUERIES: int = 4
+    SLACK_MAX_PENDING_COMMANDS: int = 100
+    
+    # Connector crawling
+    CONNECTOR_PER_HOST_CONCURRENCY: int = 4
+    CONNECTOR_REQUESTS_PER_SECOND: float = 10.0
+    NOTION_REQUESTS_PER_SECOND: float = 3.0  # Notion's documented average limit
+    
+    # Observability
+    PROFILE_SLOW_REQUEST_MS: float = 0  # 0 disables the slow-request profiler
+    PROFILE_SAMPLE_RATE: float = 0.1
+    PROFILE_DUMP_DIR: str = "profiles"
     
     # Model Settings
     EMBEDDING_MODEL_NAME: str = "sentence-transformers/all-MiniLM-L6-v2"
+    CHROMA_PERSIST_DIRECTORY: str = "chroma_index"
+    CHROMA_COLLECTION_NAME: str = "langchain"  # shared collection written by the original LangChain indexer
+    # ANN index (see models.rag.IndexConfig); M and ef_construction only apply to new collections
+    SIMILARITY_METRIC: str = "cosine"
+    HNSW_M: int = 16
+    HNSW_EF_CONSTRUCTION: int = 200
+    HNSW_EF_SEARCH: int = 128
+    # Chunking (see models.rag.ChunkingConfig); sized in tokens to MiniLM's 256-token window
+    # less [CLS] and [SEP]. Only documents indexed or edited afterwards are re-chunked.
+    CHUNK_LENGTH_FUNCTION: str = "token"  # or "char"
+    CHUNK_SIZE: int = 254
+    CHUNK_OVERLAP: int = 32
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_WORKERS: int = 0  # 0 embeds in-process
+    QUERY_EMBED_MAX_BATCH_SIZE: int = 32
+    QUERY_EMBED_MAX_WAIT_MS: float = 5.0
+    
+    # Batch queries
+    BATCH_QUERY_CONCURRENCY: int = 8  # default concurrent LLM generations per batch
+    
+    # Prompt context packing
+    LLM_CONTEXT_WINDOW: int = 8192
+    CONTEXT_TOKEN_BUDGET: int = 2000
+    PROMPT_OVERHEAD_TOKENS: int = 300  # system prompt, question and formatting
+    
+    # Hybrid retrieval
+    HYBRID_CANDIDATES: int = 20  # vector and BM25 hits each, before reciprocal rank fusion
+    
+    # Reranking
+    RERANK_ENABLED: bool = True
+    RERANK_MODEL_NAME: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 50  # vector-store over-fetch before reranking
+    RERANK_BUDGET_MS: float = 150
+    RERANK_MIN_SCORE: float = 0.05  # drop weak chunks instead of sending them to the LLM
+    
+    # Per-tenant index shards
+    SHARD_BY: str = "none"  # "none" (shared collection), "user" or "workspace" (Clerk org / Google Workspace)
+    SHARD_MEMORY_BUDGET_MB: int = 1024
+    SHARD_SEARCH_CONCURRENCY: int = 8
+    
+    # Conversation sessions
+    CONVERSATION_STORE_PATH: str = "conversations.sqlite3"
+    CONVERSATION_TTL_SECONDS: int = 60 * 60  # 1 hour since last turn
+    CONVERSATION_REUSE_MIN_SIMILARITY: float = 0.5  # cached chunk vs follow-up question
+    CONVERSATION_HISTORY_TOKEN_LIMIT: int = 1000
+    CONVERSATION_KEEP_TURNS: int = 2  # recent turns kept verbatim after summarising
+    
+    # Admission control
+    RATE_LIMIT_USER_PER_MINUTE: float = 30
+    RATE_LIMIT_USER_BURST: int = 10
+    RATE_LIMIT_ROUTE_PER_SECOND: float = 50
+    RATE_LIMIT_ROUTE_BURST: int = 100
+    TRUSTED_PROXIES: List[str] = []  # addresses/CIDRs whose X-Forwarded-For is believed
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_MAX_QUEUED: int = 64
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 10  # interactive; Slack waits twice as long, batches until displaced
+    
+    # Semantic answer cache
+    ANSWER_CACHE_MAX_ENTRIES: int = 1024
+    ANSWER_CACHE_TTL_SECONDS: int = 60 * 60  # 1 hour
+    ANSWER_CACHE_MAX_DISTANCE: float = 0.08  # cosine distance
+    
+    # Background indexing jobs
+    INDEXING_WORKERS: int = 2
+    INDEXING_MAX_JOBS_PER_USER: int = 2
+    INDEXING_MAX_QUEUED_JOBS: int = 100
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,240 @@
+import cProfile
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from core.config import settings
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Per-request stage timings (name -> milliseconds) for the Server-Timing header
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, total in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[LabelValues, List[float]] = {}  # bucket counts + [sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0.0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, series in sorted(self._series.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                bucket_labels = _format_labels(self.labels, values, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            inf_labels = _format_labels(self.labels, values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf_labels} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    """Holds metrics plus callbacks that report gauges (cache sizes, queue depths) at scrape time"""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._gauge_callbacks: Dict[str, Tuple[str, Callable[[], Dict[str, float]]]] = {}
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_gauges(self, prefix: str, help: str, callback: Callable[[], Dict[str, float]]) -> None:
+        """Expose each numeric value of ``callback()`` as gauge ``<prefix>_<key>``; re-registering a prefix replaces it"""
+        self._gauge_callbacks[prefix] = (help, callback)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        # Prometheus rejects a second HELP/TYPE or sample for the same name
+        seen = {metric.name for metric in self._metrics}
+        for prefix, (help, callback) in list(self._gauge_callbacks.items()):
+            try:
+                values = callback()
+            except Exception:
+                continue
+            for key, value in values.items():
+                name = f"{prefix}_{key}"
+                if name in seen or isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                seen.add(name)
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route", "status")
+)
+STAGE_SECONDS = registry.histogram(
+    "rag_stage_duration_seconds", "Time spent per RAG pipeline stage", ("stage",)
+)
+TOKENS = registry.counter("rag_llm_tokens_total", "LLM tokens by direction", ("direction",))
+CACHE_LOOKUPS = registry.counter("rag_cache_lookups_total", "Cache lookups by cache and result", ("cache", "result"))
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a block into the stage histogram and the current request's Server-Timing"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed * 1000
+
+
+def record_tokens(prompt_tokens: int, completion_tokens: int) -> None:
+    TOKENS.inc(prompt_tokens, "in")
+    TOKENS.inc(completion_tokens, "out")
+
+
+def server_timing_header(timings: Dict[str, float], total_ms: float) -> str:
+    entries = [f"{name};dur={ms:.1f}" for name, ms in timings.items()]
+    entries.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+
+class SlowRequestProfiler:
+    """Opt-in cProfile dumps for slow requests.
+
+    Disabled unless PROFILE_SLOW_REQUEST_MS > 0; then a PROFILE_SAMPLE_RATE
+    fraction of requests is profiled and a ``.prof`` file is written to
+    PROFILE_DUMP_DIR when one exceeds the threshold. cProfile observes the
+    whole thread, so concurrent requests show up in the same dump.
+    """
+
+    def __init__(self, threshold_ms: float, sample_rate: float, dump_dir: str):
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.dump_dir = dump_dir
+        self._active = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def start(self) -> Optional[cProfile.Profile]:
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        # Python allows one active profiler per thread
+        if not self._active.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def stop(self, profile: cProfile.Profile, elapsed_ms: float, label: str) -> None:
+        profile.disable()
+        self._active.release()
+        if elapsed_ms < self.threshold_ms:
+            return
+        os.makedirs(self.dump_dir, exist_ok=True)
+        safe_label = "".join(c if c.isalnum() else "_" for c in label).strip("_")
+        profile.dump_stats(os.path.join(self.dump_dir, f"{int(time.time() * 1000)}_{safe_label}_{int(elapsed_ms)}ms.prof"))
+
+
+profiler = SlowRequestProfiler(
+    settings.PROFILE_SLOW_REQUEST_MS,
+    settings.PROFILE_SAMPLE_RATE,
+    settings.PROFILE_DUMP_DIR,
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency and adding a Server-Timing header"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        profile = profiler.start()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                total_ms = (time.perf_counter() - started) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing_header(timings, total_ms).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(elapsed, scope.get("method", ""), path, str(status[0]))
+            if profile is not None:
+                profiler.stop(profile, elapsed * 1000, f"{scope.get('method', '')}_{path}")
+            _request_timings.reset(token)
@@ -1,8 +1,13 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from core.config import settings
-from routers import auth, docs, query
+from core.metrics import MetricsMiddleware, registry
+from routers import auth, docs, query, slack
+from services.container import container
 from typing import Dict, List
 from pydantic import BaseModel
 
@@ -15,7 +20,25 @@ class TestResponse(BaseModel):
     answer: str
     source: str = "test"
 
-app = FastAPI(title="Internal Docs Q&A API")
+# With `gunicorn --preload`, load models in the master so forked workers share them
+if settings.PRELOAD_SERVICES_ON_IMPORT:
+    container.warm_up()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve / and /health immediately; models load in the background (see /ready)
+    warm_up = None
+    if settings.WARM_UP_SERVICES:
+        warm_up = asyncio.create_task(asyncio.to_thread(container.warm_up))
+    yield
+    if warm_up is not None and not warm_up.done():
+        await asyncio.wait([warm_up], timeout=5)
+    await container.shutdown()
+
+app = FastAPI(title="Internal Docs Q&A API", lifespan=lifespan)
+
+# Request latency histograms and Server-Timing headers
+app.add_middleware(MetricsMiddleware)
 
 # Add SessionMiddleware for OAuth
 app.add_middleware(SessionMiddleware, secret_key=settings.SECRET_KEY, same_site='lax', https_only=False)
@@ -33,6 +56,7 @@ app.add_middleware(
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(docs.router, prefix="/docs", tags=["docs"])
 app.include_router(query.router, prefix="/query", tags=["query"])
+app.include_router(slack.router, prefix="/slack", tags=["slack"])
 
 @app.get("/")
 async def root():
@@ -46,6 +70,21 @@ async def health_check():
         "environment": "development"
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Report per-component readiness; 503 until every service is loaded"""
+    components = container.readiness()
+    ready = all(component["status"] == "ready" for component in components.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "starting", "components": components}
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics in text exposition format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/test/query", response_model=TestResponse)
 async def test_query(query: TestQuery):
     """Test endpoint for question answering"""
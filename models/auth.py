@@ -11,6 +11,8 @@ class UserCreate(UserBase):
 
 class UserResponse(UserBase):
     id: str
+    email: Optional[EmailStr] = None  # Clerk session tokens may not carry one
+    workspace_id: Optional[str] = None  # Clerk organization or Google Workspace domain
 
 class TokenResponse(BaseModel):
     access_token: str
@@ -43,6 +43,13 @@ class IndexingStatus(BaseModel):
     status: str
     documents_processed: int
     errors: Optional[List[str]] = None
+    job_id: Optional[str] = None
+    source_type: Optional[str] = None
+    document_ids: List[str] = Field(default_factory=list)
+    created_at: Optional[float] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    throughput: Optional[float] = None  # documents per second
 
 class DocumentList(BaseModel):
     documents: List[DocumentMetadata]
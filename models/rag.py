@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 from .docs import SourceType, DocumentMetadata
 
 class EmbeddingVector(BaseModel):
@@ -19,6 +19,11 @@ class RAGRequest(BaseModel):
     temperature: float = Field(default=0.7, ge=0, le=1)
     source_types: Optional[List[SourceType]] = None
     num_sources: int = Field(default=3, ge=1, le=5)
+    conversation_id: Optional[str] = None
+
+class RAGBatchRequest(BaseModel):
+    requests: List[RAGRequest] = Field(min_length=1, max_length=5000)
+    concurrency: Optional[int] = Field(default=None, ge=1, le=64)
 
 class RAGResponse(BaseModel):
     answer: str
@@ -34,4 +39,11 @@ class ChunkingConfig(BaseModel):
 class IndexConfig(BaseModel):
     embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
     chunking: ChunkingConfig = ChunkingConfig()
-    similarity_metric: str = "cosine"  # or "euclidean", "dot_product" 
\ No newline at end of file
+    similarity_metric: str = "cosine"  # or "euclidean", "dot_product"
+    # HNSW graph parameters
+    hnsw_m: int = Field(default=16, ge=4, le=64)
+    hnsw_ef_construction: int = Field(default=200, ge=16, le=1000)
+    hnsw_ef_search: int = Field(default=128, ge=10, le=1000)
+    # Compressed vector copy used for candidate scoring, rescored exactly
+    quantization: Literal["none", "int8"] = "none"
+    rescore_multiplier: int = Field(default=4, ge=1, le=20) 
\ No newline at end of file
@@ -1,17 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Optional, List
+from typing import TYPE_CHECKING, Optional, List
 from pydantic import BaseModel
-from services.document import DocumentService
-from services.auth import AuthService
+from services.container import get_auth_service, get_current_user, get_document_service
+from services.jobs import indexing_jobs, JobLimitError
+from services.sharding import tenant_for_user
 from models.auth import UserResponse
+from models.docs import IndexingStatus
 
-router = APIRouter()
-doc_service = DocumentService()
-auth_service = AuthService()
+if TYPE_CHECKING:
+    from services.auth import AuthService
+    from services.document import DocumentService
 
-class IndexResponse(BaseModel):
-    message: str
-    document_ids: List[str]
+router = APIRouter()
 
 class NotionIndexRequest(BaseModel):
     database_id: Optional[str] = None
@@ -26,79 +26,113 @@ class GoogleIndexRequest(BaseModel):
     google_token: str
     document_id: str
 
-@router.post("/index/notion", response_model=IndexResponse)
+def enqueue_indexing_job(user_id: str, source_type: str, work) -> IndexingStatus:
+    """Queue an indexing coroutine factory, mapping limit errors to 429"""
+    try:
+        return indexing_jobs.submit(user_id, source_type, work).to_status()
+    except JobLimitError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e)
+        )
+
+@router.post("/index/notion", response_model=IndexingStatus, status_code=status.HTTP_202_ACCEPTED)
 async def index_notion_docs(
     request: NotionIndexRequest,
-    current_user: UserResponse = Depends(auth_service.get_current_user)
+    current_user: UserResponse = Depends(get_current_user),
+    auth_service: "AuthService" = Depends(get_auth_service),
+    doc_service: "DocumentService" = Depends(get_document_service)
 ):
-    """Index Notion documents for the authenticated user"""
-    try:
-        # Get Notion token
-        token = auth_service.get_notion_token(current_user.id)
-        if not token:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Notion token not found. Please connect Notion first."
-            )
-        # Process Notion pages
-        doc_ids = await doc_service.process_notion_pages(
-            token=token,
-            database_id=request.database_id
-        )
-        return IndexResponse(
-            message="Successfully indexed Notion documents",
-            document_ids=doc_ids
-        )
-    except Exception as e:
+    """Queue indexing of Notion documents for the authenticated user"""
+    # Get Notion token
+    token = await auth_service.aget_notion_token(current_user.id)
+    if not token:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Notion token not found. Please connect Notion first."
+        )
+    return enqueue_indexing_job(
+        current_user.id,
+        "notion",
+        lambda job: doc_service.process_notion_pages(
+            token=token,
+            database_id=request.database_id,
+            tenant_id=tenant_for_user(current_user),
+            job=job
         )
+    )
 
-@router.post("/index/google", response_model=IndexResponse)
+@router.post("/index/google", response_model=IndexingStatus, status_code=status.HTTP_202_ACCEPTED)
 async def index_google_docs(
-    request: GoogleIndexRequest
+    request: GoogleIndexRequest,
+    current_user: UserResponse = Depends(get_current_user),
+    doc_service: "DocumentService" = Depends(get_document_service)
 ):
-    """Index a specific Google Doc by token and document ID (for prototyping/testing)"""
-    try:
-        credentials_dict = {
-            "token": request.google_token,
-            "refresh_token": "",  # Add your real refresh token if available
-            "token_uri": "https://oauth2.googleapis.com/token",
-            "client_id": "YOUR_GOOGLE_CLIENT_ID",  # Replace with your real client_id
-            "client_secret": "YOUR_GOOGLE_CLIENT_SECRET",  # Replace with your real client_secret
-            "scopes": ["https://www.googleapis.com/auth/documents.readonly"]
-        }
-        doc_ids = await doc_service.process_google_doc(credentials_dict, request.document_id)
-        return IndexResponse(
-            message="Successfully indexed Google Doc",
-            document_ids=doc_ids
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
+    """Queue indexing of a specific Google Doc by token and document ID (for prototyping/testing)"""
+    credentials_dict = {
+        "token": request.google_token,
+        "refresh_token": "",  # Add your real refresh token if available
+        "token_uri": "https://oauth2.googleapis.com/token",
+        "client_id": "YOUR_GOOGLE_CLIENT_ID",  # Replace with your real client_id
+        "client_secret": "YOUR_GOOGLE_CLIENT_SECRET",  # Replace with your real client_secret
+        "scopes": ["https://www.googleapis.com/auth/documents.readonly"]
+    }
+    return enqueue_indexing_job(
+        current_user.id,
+        "google_docs",
+        lambda job: doc_service.process_google_doc(
+            credentials_dict,
+            request.document_id,
+            tenant_id=tenant_for_user(current_user),
+            job=job
         )
+    )
 
-@router.post("/index/confluence", response_model=IndexResponse)
+@router.post("/index/confluence", response_model=IndexingStatus, status_code=status.HTTP_202_ACCEPTED)
 async def index_confluence_docs(
     request: ConfluenceIndexRequest,
-    current_user: UserResponse = Depends(auth_service.get_current_user)
+    current_user: UserResponse = Depends(get_current_user),
+    doc_service: "DocumentService" = Depends(get_document_service)
 ):
-    """Index Confluence documents for the authenticated user"""
-    try:
-        doc_ids = await doc_service.process_confluence_docs(
+    """Queue indexing of Confluence documents for the authenticated user"""
+    return enqueue_indexing_job(
+        current_user.id,
+        "confluence",
+        lambda job: doc_service.process_confluence_docs(
             base_url=request.base_url,
             username=request.username,
             api_token=request.api_token,
-            space_key=request.space_key
+            space_key=request.space_key,
+            tenant_id=tenant_for_user(current_user),
+            job=job
         )
-        return IndexResponse(
-            message="Successfully indexed Confluence documents",
-            document_ids=doc_ids
+    )
+
+@router.get("/jobs/{job_id}", response_model=IndexingStatus)
+async def get_indexing_job(
+    job_id: str,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Get progress of one of the caller's background indexing jobs"""
+    # Other users' jobs are reported as missing rather than forbidden, so ids can't be probed
+    job = indexing_jobs.get(job_id, user_id=current_user.id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Indexing job not found"
         )
-    except Exception as e:
+    return job.to_status()
+
+@router.delete("/jobs/{job_id}", response_model=IndexingStatus)
+async def cancel_indexing_job(
+    job_id: str,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Cancel one of the caller's queued or running indexing jobs"""
+    job = indexing_jobs.cancel(job_id, user_id=current_user.id)
+    if job is None:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
-        ) 
\ No newline at end of file
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Indexing job not found"
+        )
+    return job.to_status() 
\ No newline at end of file
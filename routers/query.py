@@ -1,49 +1,112 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Dict, Any
-from models.rag import RAGRequest, RAGResponse, SearchResult
-from models.auth import UserResponse
-from services.rag import RAGService
-from services.auth import AuthService
-
-router = APIRouter()
-rag_service = RAGService()
-auth_service = AuthService()
-
-@router.post("", response_model=RAGResponse)
-async def query_docs(
-    request: RAGRequest,
-    # Temporarily commenting out authentication for testing
-    # current_user: UserResponse = Depends(auth_service.get_current_user)
-):
-    """Query indexed documents"""
-    try:
-        return await rag_service.query(request)
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
-        )
-
-@router.get("/similar", response_model=List[SearchResult])
-async def get_similar_questions(
-    question: str,
-    k: int = 5,
-    # Temporarily commenting out authentication for testing
-    # current_user: UserResponse = Depends(auth_service.get_current_user)
-):
-    """Get similar questions from indexed documents"""
-    try:
-        return await rag_service.similar_questions(question, k)
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
-        )
-
-@router.get("/stats")
-async def get_index_stats(
-    # Temporarily commenting out authentication for testing
-    # current_user: UserResponse = Depends(auth_service.get_current_user)
-) -> Dict[str, Any]:
-    """Get statistics about the vector store"""
-    return rag_service.get_stats() 
\ No newline at end of file
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
+from models.rag import RAGBatchRequest, RAGRequest, RAGResponse, SearchResult
+from models.auth import UserResponse
+from core.admission import BATCH, INTERACTIVE, OverloadedError, llm_gate, overloaded_exception, rate_limit
+from services.container import get_current_user, get_optional_user, get_rag_service
+from services.conversation import conversation_store
+from services.streaming import ndjson_batch_results, sse_from_rag_events
+from core.config import settings
+
+if TYPE_CHECKING:
+    from services.rag import RAGService
+
+router = APIRouter()
+
+@router.post("", response_model=RAGResponse, dependencies=[Depends(rate_limit("query"))])
+async def query_docs(
+    request: RAGRequest,
+    rag_service: "RAGService" = Depends(get_rag_service),
+    # Anonymous queries are still allowed for testing; signed-in callers own their conversations
+    current_user: Optional[UserResponse] = Depends(get_optional_user)
+):
+    """Query indexed documents"""
+    try:
+        return await rag_service.query(request, current_user, priority=INTERACTIVE)
+    except OverloadedError as e:
+        raise overloaded_exception(e)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+@router.post("/stream", dependencies=[Depends(rate_limit("query"))])
+async def stream_query_docs(
+    request: RAGRequest,
+    rag_service: "RAGService" = Depends(get_rag_service),
+    # Anonymous queries are still allowed for testing; signed-in callers own their conversations
+    current_user: Optional[UserResponse] = Depends(get_optional_user)
+):
+    """Query indexed documents, streaming sources, answer tokens and timings as SSE.
+
+    Generation waits for a slot after the sources are sent; if none frees up
+    in time the stream ends with an ``error`` event carrying ``retry_after``.
+    """
+    return StreamingResponse(
+        sse_from_rag_events(rag_service.stream_query(request, current_user, priority=INTERACTIVE)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/batch", dependencies=[Depends(rate_limit("batch"))])
+async def batch_query_docs(
+    batch: RAGBatchRequest,
+    rag_service: "RAGService" = Depends(get_rag_service),
+    # Temporarily commenting out authentication for testing
+    # current_user: UserResponse = Depends(get_current_user)
+):
+    """Run many queries at once, streaming NDJSON results in completion order.
+
+    All questions are embedded in one batched call before the searches start.
+    """
+    return StreamingResponse(
+        ndjson_batch_results(
+            lambda request, vector: rag_service.query(request, priority=BATCH, vector=vector),
+            batch.requests,
+            batch.concurrency or settings.BATCH_QUERY_CONCURRENCY,
+            rag_service.embed_questions
+        ),
+        media_type="application/x-ndjson"
+    )
+
+@router.get("/similar", response_model=List[SearchResult], dependencies=[Depends(rate_limit("similar"))])
+async def get_similar_questions(
+    question: str,
+    k: int = 5,
+    rag_service: "RAGService" = Depends(get_rag_service),
+    # Anonymous lookups are still allowed for testing; signed-in callers search their own shards
+    current_user: Optional[UserResponse] = Depends(get_optional_user)
+):
+    """Get similar questions from indexed documents"""
+    try:
+        return await rag_service.similar_questions(question, k, current_user)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+@router.get("/stats")
+async def get_index_stats(
+    rag_service: "RAGService" = Depends(get_rag_service),
+    # Temporarily commenting out authentication for testing
+    # current_user: UserResponse = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Get statistics about the vector store and the retrieval pipeline"""
+    stats = rag_service.get_stats()
+    stats["llm_gate"] = llm_gate.stats()
+    return stats
+
+@router.delete("/conversations/{conversation_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def end_conversation(
+    conversation_id: str,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """End one of the caller's conversations and drop its cached context"""
+    if not await conversation_store.adelete(conversation_id, user_id=current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found"
+        ) 
\ No newline at end of file
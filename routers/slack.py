@@ -1,91 +1,91 @@
-from fastapi import APIRouter, HTTPException, status, Request
-from typing import Dict, Any
-from services.rag import RAGService
-import json
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from typing import TYPE_CHECKING, Callable, Dict, Any
+from urllib.parse import parse_qs
+from services.container import get_rag_service_provider
+from services.slack import slack_responder
+from core.admission import check_rate_limits
 import hmac
 import hashlib
 import time
 from core.config import settings
 
+if TYPE_CHECKING:
+    from services.rag import RAGService
+
 router = APIRouter()
-rag_service = RAGService()
 
-def verify_slack_signature(request: Request) -> bool:
-    """Verify that the request came from Slack"""
+def verify_slack_signature(headers, body: bytes) -> bool:
+    """Verify that the raw request body was signed by Slack"""
+    if not settings.SLACK_SIGNING_SECRET:
+        return False
     slack_signing_secret = settings.SLACK_SIGNING_SECRET.encode('utf-8')
-    slack_signature = request.headers.get('X-Slack-Signature', '')
-    slack_timestamp = request.headers.get('X-Slack-Request-Timestamp', '')
+    slack_signature = headers.get('X-Slack-Signature', '')
+    slack_timestamp = headers.get('X-Slack-Request-Timestamp', '')
     
-    if abs(time.time() - int(slack_timestamp)) > 60 * 5:
+    try:
+        if abs(time.time() - int(slack_timestamp)) > 60 * 5:
+            return False
+    except ValueError:
         return False
         
-    sig_basestring = f"v0:{slack_timestamp}:{request.body.decode('utf-8')}"
+    sig_basestring = b"v0:" + slack_timestamp.encode('utf-8') + b":" + body
     my_signature = 'v0=' + hmac.new(
         slack_signing_secret,
-        sig_basestring.encode('utf-8'),
+        sig_basestring,
         hashlib.sha256
     ).hexdigest()
     
     return hmac.compare_digest(my_signature, slack_signature)
 
 @router.post("/query")
-async def slack_query(request: Request) -> Dict[str, Any]:
-    """Handle Slack slash command queries"""
-    try:
-        # Verify request is from Slack
-        if not verify_slack_signature(request):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid Slack signature"
-            )
-        
-        # Parse request body
-        form_data = await request.form()
-        question = form_data.get('text', '')
-        
-        if not question:
-            return {
-                "response_type": "ephemeral",
-                "text": "Please provide a question after the slash command."
-            }
-        
-        # Query RAG system
-        result = await rag_service.query(question)
-        
-        # Format response for Slack
-        blocks = [
-            {
-                "type": "section",
-                "text": {
-                    "type": "mrkdwn",
-                    "text": result["answer"]
-                }
-            }
-        ]
-        
-        # Add sources if available
-        if result.get("sources"):
-            source_text = "*Sources:*\n"
-            for source in result["sources"]:
-                source_text += f"• <{source['url']}|{source['title']}> ({source['source_type']})\n"
-            
-            blocks.append({
-                "type": "context",
-                "elements": [
-                    {
-                        "type": "mrkdwn",
-                        "text": source_text
-                    }
-                ]
-            })
-        
+async def slack_query(
+    request: Request,
+    # Resolved by the background worker, so the ack never waits for the models to load
+    get_rag_service: Callable[[], "RAGService"] = Depends(get_rag_service_provider)
+) -> Dict[str, Any]:
+    """Acknowledge a Slack slash command and answer it via response_url"""
+    body = await request.body()
+    
+    # Verify request is from Slack
+    if not verify_slack_signature(request.headers, body):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid Slack signature"
+        )
+    
+    # Parse the signed form body
+    form_data = parse_qs(body.decode('utf-8'))
+    question = form_data.get('text', [''])[0].strip()
+    response_url = form_data.get('response_url', [''])[0]
+    
+    if not question:
         return {
-            "response_type": "in_channel",
-            "blocks": blocks
+            "response_type": "ephemeral",
+            "text": "Please provide a question after the slash command."
         }
-        
-    except Exception as e:
+    if not response_url:
+        return {
+            "response_type": "ephemeral",
+            "text": "Missing response_url in the Slack request."
+        }
+    
+    # Slack shows non-200 replies as a generic failure, so limits are reported in the message
+    slack_user = f"{form_data.get('team_id', [''])[0]}:{form_data.get('user_id', [''])[0]}"
+    retry_after = check_rate_limits("slack", slack_user)
+    if retry_after is not None:
         return {
             "response_type": "ephemeral",
-            "text": f"Error processing your request: {str(e)}"
-        } 
\ No newline at end of file
+            "text": f"You're asking questions faster than I can answer, please try again in {max(1, int(retry_after + 0.999))}s."
+        }
+    
+    # Slack drops commands not acknowledged within 3 seconds, so answer later
+    if not slack_responder.submit(question, response_url, get_rag_service):
+        return {
+            "response_type": "ephemeral",
+            "text": "Too many questions are being answered right now, please try again shortly."
+        }
+    
+    return {
+        "response_type": "ephemeral",
+        "text": f"Looking that up: _{question}_"
+    }
\ No newline at end of file
@@ -0,0 +1,218 @@
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.config import settings
+from models.rag import IndexConfig
+
+# IndexConfig.similarity_metric -> Chroma/hnswlib space
+HNSW_SPACES = {
+    "cosine": "cosine",
+    "euclidean": "l2",
+    "dot_product": "ip",
+}
+
+
+def hnsw_collection_metadata(config: IndexConfig) -> Dict[str, Any]:
+    """Collection metadata that configures Chroma's HNSW segment.
+
+    Pass as ``metadata=`` (or LangChain's ``collection_metadata=``) when the
+    collection is created; M and ef_construction only apply to new indexes.
+    """
+    if config.similarity_metric not in HNSW_SPACES:
+        raise ValueError(f"Unknown similarity_metric: {config.similarity_metric}")
+    return {
+        "hnsw:space": HNSW_SPACES[config.similarity_metric],
+        "hnsw:M": config.hnsw_m,
+        "hnsw:construction_ef": config.hnsw_ef_construction,
+        "hnsw:search_ef": config.hnsw_ef_search,
+    }
+
+
+def default_index_config() -> IndexConfig:
+    """IndexConfig with the ANN parameters from settings"""
+    return IndexConfig(
+        similarity_metric=settings.SIMILARITY_METRIC,
+        hnsw_m=settings.HNSW_M,
+        hnsw_ef_construction=settings.HNSW_EF_CONSTRUCTION,
+        hnsw_ef_search=settings.HNSW_EF_SEARCH,
+    )
+
+
+def open_collection(client: Any, name: str, config: Optional[IndexConfig] = None) -> Any:
+    """Get or create a collection with the config's HNSW parameters.
+
+    Chroma ignores the metadata of a collection that already exists, so its
+    graph keeps the M and ef_construction it was built with; ef_search is a
+    query-time setting and is updated in place. Chroma reads it when the
+    segment is loaded, so open collections before querying them.
+    """
+    config = config or default_index_config()
+    collection = client.get_or_create_collection(name, metadata=hnsw_collection_metadata(config))
+    try:
+        ef_search = ((collection.configuration or {}).get("hnsw") or {}).get("ef_search")
+    except AttributeError:
+        return collection
+    if ef_search is not None and ef_search != config.hnsw_ef_search:
+        collection.modify(configuration={"hnsw": {"ef_search": config.hnsw_ef_search}})
+    return collection
+
+
+def collection_space(collection: Any) -> str:
+    """Distance function of a Chroma collection ("l2" unless it was created with another space)"""
+    try:
+        space = (collection.configuration or {}).get("hnsw", {}).get("space")
+    except AttributeError:
+        space = None
+    return space or (collection.metadata or {}).get("hnsw:space") or "l2"
+
+
+def similarity_from_distance(distance: float, space: str) -> float:
+    """Map a Chroma distance to a [0, 1] similarity, higher is better.
+
+    Cosine and inner-product distances are ``1 - similarity``; squared L2
+    between unit vectors is ``2 - 2 * cosine``, so it is halved first.
+    """
+    if space == "l2":
+        similarity = 1.0 - float(distance) / 2
+    else:
+        similarity = 1.0 - float(distance)
+    return min(1.0, max(0.0, similarity))
+
+
+_client: Any = None
+_client_lock = threading.Lock()
+
+
+def get_chroma_client() -> Any:
+    """Process-wide persistent Chroma client; collections opened from it share one segment cache"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            import chromadb
+            from chromadb.config import Settings as ChromaSettings
+            _client = chromadb.PersistentClient(
+                path=settings.CHROMA_PERSIST_DIRECTORY,
+                settings=ChromaSettings(
+                    anonymized_telemetry=False,
+                    chroma_segment_cache_policy="LRU",
+                    chroma_memory_limit_bytes=settings.SHARD_MEMORY_BUDGET_MB * 1024 * 1024,
+                ),
+            )
+        return _client
+
+
+class Int8VectorIndex:
+    """Exhaustive search over int8-quantized vectors with exact rescoring.
+
+    Each vector is scaled symmetrically into int8 (4x smaller than float32) and
+    scored approximately; the best ``k * rescore_multiplier`` candidates are
+    then rescored against the float32 originals. Saved files can be opened
+    with ``mmap=True`` so every worker maps the same read-only pages instead
+    of holding a private copy.
+    """
+
+    def __init__(
+        self,
+        ids: List[str],
+        codes: np.ndarray,
+        scales: np.ndarray,
+        vectors: Optional[np.ndarray] = None,
+        metric: str = "cosine",
+        rescore_multiplier: int = 4,
+    ):
+        if metric not in HNSW_SPACES:
+            raise ValueError(f"Unknown similarity_metric: {metric}")
+        self.ids = ids
+        self.codes = codes
+        self.scales = scales
+        self.vectors = vectors
+        self.metric = metric
+        self.rescore_multiplier = rescore_multiplier
+        self._sq_norms = None
+        self._approx_sq_norms = None
+        if metric == "euclidean":
+            if vectors is not None:
+                self._sq_norms = np.einsum("ij,ij->i", vectors, vectors)
+            self._approx_sq_norms = self._blocked(lambda block: np.einsum("ij,ij->i", block, block)) * self.scales ** 2
+
+    @classmethod
+    def build(
+        cls,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        metric: str = "cosine",
+        rescore_multiplier: int = 4,
+    ) -> "Int8VectorIndex":
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if metric == "cosine":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.round(vectors / scales[:, None]).astype(np.int8)
+        return cls(list(ids), codes, scales.astype(np.float32), vectors, metric, rescore_multiplier)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scales.nbytes
+
+    def search(self, query: np.ndarray, k: int = 10) -> List[Tuple[str, float]]:
+        """Top-k ids with similarity (higher is better; negative distance for euclidean)"""
+        if not len(self.ids):
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        if self.metric == "cosine":
+            query = query / max(float(np.linalg.norm(query)), 1e-12)
+        approx = self._blocked(lambda block: block @ query) * self.scales
+        if self.metric == "euclidean":
+            approx = 2 * approx - self._approx_sq_norms
+        n_candidates = min(len(self.ids), k * self.rescore_multiplier)
+        candidates = np.argpartition(-approx, n_candidates - 1)[:n_candidates]
+        if self.vectors is not None:
+            exact = self.vectors[candidates] @ query
+            if self.metric == "euclidean":
+                exact = 2 * exact - self._sq_norms[candidates] - float(query @ query)
+        else:
+            exact = approx[candidates]
+        order = np.argsort(-exact)[:k]
+        return [(self.ids[candidates[i]], float(exact[i])) for i in order]
+
+    def _blocked(self, fn, block_rows: int = 8192) -> np.ndarray:
+        """Apply ``fn`` to float32 views of code blocks, bounding the temporary copy"""
+        out = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), block_rows):
+            block = self.codes[start:start + block_rows].astype(np.float32)
+            out[start:start + block_rows] = fn(block)
+        return out
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "codes.npy"), self.codes)
+        np.save(os.path.join(directory, "scales.npy"), self.scales)
+        if self.vectors is not None:
+            np.save(os.path.join(directory, "vectors.npy"), self.vectors)
+        with open(os.path.join(directory, "ids.json"), "w", encoding="utf-8") as f:
+            json.dump({"metric": self.metric, "ids": self.ids}, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True, rescore_multiplier: int = 4) -> "Int8VectorIndex":
+        """Open a saved index; with ``mmap`` the arrays are shared read-only page-cache maps"""
+        mode = "r" if mmap else None
+        with open(os.path.join(directory, "ids.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        vectors_path = os.path.join(directory, "vectors.npy")
+        return cls(
+            meta["ids"],
+            np.load(os.path.join(directory, "codes.npy"), mmap_mode=mode),
+            np.load(os.path.join(directory, "scales.npy"), mmap_mode=mode),
+            np.load(vectors_path, mmap_mode=mode) if os.path.exists(vectors_path) else None,
+            meta["metric"],
+            rescore_multiplier,
+        )
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, Request, status
+from jose import JWTError, jwt
+
+from clerk_auth import ClerkAuthError, verify_clerk_token
+from core.config import settings
+from models.auth import UserResponse
+from services.token_store import GOOGLE, NOTION, TokenStore, token_store
+
+ALGORITHM = "HS256"
+
+
+def bearer_token(request: Request) -> Optional[str]:
+    authorization = request.headers.get("Authorization", "")
+    if authorization[:7].lower() != "bearer ":
+        return None
+    return authorization[7:].strip() or None
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"}
+    )
+
+
+class AuthService:
+    """Issues and verifies API access tokens and keeps users' integration tokens.
+
+    Bearer tokens are either our own HS256 access tokens, issued after Google
+    sign-in, or Clerk session tokens (RS256, verified against Clerk's JWKS).
+    Google and Notion tokens live in the shared encrypted ``TokenStore``, so
+    every router and worker process sees the same tokens.
+    """
+
+    def __init__(
+        self,
+        store: TokenStore = token_store,
+        secret_key: str = settings.SECRET_KEY,
+        expire_minutes: int = settings.ACCESS_TOKEN_EXPIRE_MINUTES,
+    ):
+        self.store = store
+        self.secret_key = secret_key
+        self.expire_minutes = expire_minutes
+
+    def create_access_token(self, user: Dict[str, Any]) -> str:
+        """Access token for a user from Google's ID token claims, identified by email"""
+        claims = {
+            "sub": user["email"],
+            "email": user["email"],
+            "name": user.get("name") or user["email"],
+            "picture": user.get("picture"),
+            # Google only sets the hosted domain for Workspace accounts, never for gmail.com
+            "org_id": user.get("hd"),
+            "exp": datetime.now(timezone.utc) + timedelta(minutes=self.expire_minutes),
+        }
+        return jwt.encode(claims, self.secret_key, algorithm=ALGORITHM)
+
+    async def verify_token(self, token: str) -> UserResponse:
+        try:
+            if jwt.get_unverified_header(token).get("alg") == ALGORITHM:
+                claims = jwt.decode(token, self.secret_key, algorithms=[ALGORITHM])
+            else:
+                claims = await verify_clerk_token(token)
+        except (JWTError, ClerkAuthError) as e:
+            raise _unauthorized(f"Invalid authentication credentials: {e}")
+        if not claims.get("sub"):
+            raise _unauthorized("Invalid authentication credentials: token has no subject")
+        return UserResponse(
+            id=claims["sub"],
+            email=claims.get("email"),
+            name=claims.get("name") or claims.get("email") or claims["sub"],
+            avatar=claims.get("picture"),
+            workspace_id=claims.get("org_id") or (claims.get("o") or {}).get("id"),
+        )
+
+    async def get_current_user(self, request: Request) -> UserResponse:
+        token = bearer_token(request)
+        if token is None:
+            raise _unauthorized("Not authenticated")
+        return await self.verify_token(token)
+
+    async def get_optional_user(self, request: Request) -> Optional[UserResponse]:
+        """The caller if a bearer token was sent (401 if it is invalid), otherwise None"""
+        token = bearer_token(request)
+        return await self.verify_token(token) if token is not None else None
+
+    def store_google_token(self, user_id: str, token: Dict[str, Any]) -> None:
+        self.store.set(GOOGLE, user_id, dict(token))
+
+    def get_google_token(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(GOOGLE, user_id)
+
+    def store_notion_token(self, user_id: str, token: str) -> None:
+        self.store.set(NOTION, user_id, token)
+
+    def get_notion_token(self, user_id: str) -> Optional[str]:
+        return self.store.get(NOTION, user_id)
+
+    async def astore_google_token(self, user_id: str, token: Dict[str, Any]) -> None:
+        await self.store.aset(GOOGLE, user_id, dict(token))
+
+    async def aget_google_token(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return await self.store.aget(GOOGLE, user_id)
+
+    async def astore_notion_token(self, user_id: str, token: str) -> None:
+        await self.store.aset(NOTION, user_id, token)
+
+    async def aget_notion_token(self, user_id: str) -> Optional[str]:
+        return await self.store.aget(NOTION, user_id)
@@ -0,0 +1,112 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from core.config import settings
+from core.metrics import registry, span
+from services.embeddings import embedding_engine
+
+EmbedBatchFn = Callable[[List[str]], Sequence[Any]]
+
+
+class EmbeddingMicroBatcher:
+    """Coalesces concurrent query embeddings into single forward passes.
+
+    Callers await ``embed(text)``. Texts arriving within ``max_wait_ms`` of the
+    first pending one (or until ``max_batch_size`` is reached) are embedded
+    together on a dedicated worker thread, so the event loop never runs model
+    inference and only one forward pass is in flight at a time.
+    """
+
+    def __init__(
+        self,
+        embed_batch: EmbedBatchFn,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        self.embed_batch = embed_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()  # the loop only keeps weak references to tasks
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed-batcher")
+        self._batches = 0
+        self._items = 0
+
+    async def embed(self, text: str) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        with span("embed_query"):
+            return await future
+
+    async def embed_many(self, texts: Sequence[str]) -> List[Any]:
+        """Embed a whole list in one call on the worker thread, without waiting for a batch window"""
+        unique = list(dict.fromkeys(texts))
+        loop = asyncio.get_running_loop()
+        with span("embed_query"):
+            vectors = await loop.run_in_executor(
+                self._executor, contextvars.copy_context().run, self.embed_batch, unique
+            )
+        self._batches += 1
+        self._items += len(texts)
+        by_text = dict(zip(unique, vectors))
+        return [by_text[text] for text in texts]
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self._batches,
+            "items": self._items,
+            "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+            "pending": len(self._pending),
+            "running_batches": len(self._tasks),
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        batch = [(text, future) for text, future in batch if not future.cancelled()]
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        # Identical questions in one window share a single row of the batch
+        unique = list(dict.fromkeys(text for text, _ in batch))
+        loop = asyncio.get_running_loop()
+        try:
+            # Copy the context so the embed span lands in this request's Server-Timing
+            vectors = await loop.run_in_executor(
+                self._executor, contextvars.copy_context().run, self.embed_batch, unique
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self._batches += 1
+        self._items += len(batch)
+        by_text = dict(zip(unique, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+
+query_embedder = EmbeddingMicroBatcher(
+    embedding_engine.embed,
+    max_batch_size=settings.QUERY_EMBED_MAX_BATCH_SIZE,
+    max_wait_ms=settings.QUERY_EMBED_MAX_WAIT_MS,
+)
+registry.register_gauges("rag_query_embedder", "Query embedding micro-batcher state", query_embedder.stats)
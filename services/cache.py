@@ -0,0 +1,198 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from core.config import settings
+from core.metrics import CACHE_LOOKUPS, registry, span
+from models.rag import RAGRequest, RAGResponse
+
+
+@dataclass
+class _CacheEntry:
+    params: Tuple
+    response: RAGResponse
+    sources: Set[Tuple[str, str]]
+    expires_at: float
+    hits: int = 0
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+    size: int = 0
+    max_entries: int = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "size": self.size,
+            "max_entries": self.max_entries,
+        }
+
+
+def _unit(vector: Sequence[float]) -> Optional[np.ndarray]:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else None
+
+
+def _request_params(request: RAGRequest, scope: str = "") -> Tuple:
+    """Parameters that must match exactly for a cached answer to be reused"""
+    source_types = tuple(sorted(s.value for s in request.source_types or []))
+    # Follow-ups depend on the conversation history, so never share answers across conversations
+    return (
+        source_types,
+        request.num_sources,
+        round(request.temperature, 3),
+        request.context or "",
+        request.conversation_id,
+        scope,  # the shards the answer was retrieved from, so tenants never see each other's answers
+    )
+
+
+class SemanticCache:
+    """Answer cache keyed on question embeddings with LRU and TTL eviction.
+
+    A lookup hits when a cached question with identical request parameters lies
+    within ``max_distance`` cosine distance of the incoming question. Cached
+    questions are unit rows of one preallocated matrix, so a lookup is a
+    single matrix-vector product however many entries are cached.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600,
+        max_distance: float = 0.08,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self._entries: "OrderedDict[int, _CacheEntry]" = OrderedDict()  # matrix row -> entry, LRU first
+        self._matrix: Optional[np.ndarray] = None  # (max_entries, dim); free rows are zero
+        self._free: List[int] = []
+        self._lock = threading.Lock()
+        self._stats = CacheStats(max_entries=max_entries)
+
+    def get(self, embedding: Sequence[float], request: RAGRequest, scope: str = "") -> Optional[RAGResponse]:
+        """Return the closest cached response from the same ``scope``, or None on a miss"""
+        params = _request_params(request, scope)
+        query = _unit(embedding)
+        now = time.monotonic()
+        with span("cache_lookup"), self._lock:
+            self._expire(now)
+            best_row, best_distance = None, None
+            if query is not None and self._entries and self._matrix.shape[1] == len(query):
+                similarities = self._matrix @ query
+                candidates = np.flatnonzero(similarities >= 1.0 - self.max_distance)
+                for row in candidates[np.argsort(-similarities[candidates])]:
+                    entry = self._entries.get(int(row))
+                    if entry is not None and entry.params == params:
+                        best_row, best_distance = int(row), 1.0 - float(similarities[row])
+                        break
+            if best_row is None:
+                self._stats.misses += 1
+                CACHE_LOOKUPS.inc(1, "answer", "miss")
+                return None
+            entry = self._entries[best_row]
+            self._entries.move_to_end(best_row)
+            entry.hits += 1
+            self._stats.hits += 1
+            CACHE_LOOKUPS.inc(1, "answer", "hit")
+        response = entry.response.model_copy(deep=True)
+        response.metadata["cache"] = {"hit": True, "distance": round(max(0.0, best_distance), 4)}
+        return response
+
+    def put(self, embedding: Sequence[float], request: RAGRequest, response: RAGResponse, scope: str = "") -> None:
+        """Store a freshly generated response"""
+        vector = _unit(embedding)
+        if vector is None:
+            return
+        sources = {
+            (result.metadata.source_type.value, result.metadata.source_id)
+            for result in response.sources
+        }
+        entry = _CacheEntry(
+            params=_request_params(request, scope),
+            response=response.model_copy(deep=True),
+            sources=sources,
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != len(vector):
+                # First entry, or the embedding model changed: start over at the new width
+                self._matrix = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+                self._free = list(range(self.max_entries - 1, -1, -1))
+                self._entries.clear()
+            if not self._free:
+                self._remove(next(iter(self._entries)))
+                self._stats.evictions += 1
+            row = self._free.pop()
+            self._matrix[row] = vector
+            self._entries[row] = entry
+
+    def invalidate_source(self, source_type: str, source_id: Optional[str] = None) -> int:
+        """Drop answers built from a source that has been re-indexed.
+
+        With no ``source_id`` every answer that cites ``source_type`` is dropped,
+        as are answers whose request was restricted to that source type (they may
+        now be answerable with the new chunks).
+        """
+        source_type = getattr(source_type, "value", source_type)
+        with self._lock:
+            stale = []
+            for row, entry in self._entries.items():
+                if source_id is None:
+                    if source_type in entry.params[0] or any(s[0] == source_type for s in entry.sources):
+                        stale.append(row)
+                elif (source_type, source_id) in entry.sources:
+                    stale.append(row)
+            for row in stale:
+                self._remove(row)
+            self._stats.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.invalidations += len(self._entries)
+            for row in list(self._entries):
+                self._remove(row)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            self._expire(time.monotonic())
+            self._stats.size = len(self._entries)
+            return self._stats.as_dict()
+
+    def _remove(self, row: int) -> None:
+        del self._entries[row]
+        self._matrix[row] = 0
+        self._free.append(row)
+
+    def _expire(self, now: float) -> None:
+        expired = [row for row, entry in self._entries.items() if entry.expires_at <= now]
+        for row in expired:
+            self._remove(row)
+        self._stats.expirations += len(expired)
+
+
+answer_cache = SemanticCache(
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+    max_distance=settings.ANSWER_CACHE_MAX_DISTANCE,
+)
+registry.register_gauges("rag_answer_cache", "Semantic answer cache state", answer_cache.stats)
@@ -0,0 +1,163 @@
+import re
+from bisect import bisect_left
+from functools import lru_cache
+from typing import List, Optional, Pattern, Tuple
+
+from core.config import settings
+from models.docs import Document
+from models.rag import ChunkingConfig
+from services.manifest import chunk_id, content_hash
+
+Span = Tuple[int, int]
+
+# Tried in order until every piece fits: headings, paragraphs, lines, sentences, words
+_SEPARATORS: List[Pattern] = [
+    re.compile(r"(?m)^(?=#{1,6}\s)"),
+    re.compile(r"\n[ \t]*\n\s*"),
+    re.compile(r"\n\s*"),
+    re.compile(r"(?<=[.!?])\s+"),
+    re.compile(r"\s+"),
+]
+
+# sentence-transformers truncates all-MiniLM-L6-v2 inputs at 256 word pieces
+DEFAULT_MAX_SEQ_TOKENS = 256
+# [CLS] and [SEP], added by the embedder inside that window
+_SPECIAL_TOKENS = 2
+
+
+@lru_cache(maxsize=4)
+def load_tokenizer(model_name: str = settings.EMBEDDING_MODEL_NAME):
+    """Fast (Rust) tokenizer of the embedding model, loaded once per process"""
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(model_name, use_fast=True)
+
+
+def default_chunker() -> "TextChunker":
+    """TextChunker with the chunking settings, counting tokens with the embedding model's tokenizer"""
+    config = ChunkingConfig(
+        chunk_size=settings.CHUNK_SIZE,
+        chunk_overlap=settings.CHUNK_OVERLAP,
+        length_function=settings.CHUNK_LENGTH_FUNCTION,
+    )
+    tokenizer = load_tokenizer(settings.EMBEDDING_MODEL_NAME) if config.length_function == "token" else None
+    return TextChunker(config, tokenizer=tokenizer)
+
+
+class _Lengths:
+    """Length of any span of one text, in characters or in tokens.
+
+    In token mode the text is tokenized once; a span's length is the number of
+    tokens starting inside it, found by bisecting the token start offsets.
+    """
+
+    def __init__(self, text: str, tokenizer=None):
+        self.text = text
+        self.starts: Optional[List[int]] = None
+        if tokenizer is not None:
+            encoding = tokenizer(
+                text,
+                add_special_tokens=False,
+                return_offsets_mapping=True,
+                return_attention_mask=False,
+                verbose=False,
+            )
+            self.starts = [start for start, end in encoding["offset_mapping"] if end > start]
+
+    def __call__(self, start: int, end: int) -> int:
+        if self.starts is None:
+            return end - start
+        return bisect_left(self.starts, end) - bisect_left(self.starts, start)
+
+    def cut(self, start: int, end: int, size: int) -> List[Span]:
+        """Hard split of a span into pieces of at most ``size``"""
+        if self.starts is None:
+            return [(i, min(i + size, end)) for i in range(start, end, size)]
+        first, last = bisect_left(self.starts, start), bisect_left(self.starts, end)
+        bounds = [self.starts[i] for i in range(first, last, size)][1:]
+        edges = [start] + bounds + [end]
+        return [(a, b) for a, b in zip(edges, edges[1:]) if b > a]
+
+
+class TextChunker:
+    """Splits documents into overlapping chunks per ``ChunkingConfig``.
+
+    ``length_function="token"`` measures ``chunk_size`` and ``chunk_overlap`` in
+    embedding-model tokens and, with the special tokens, never exceeds
+    ``max_tokens``, so chunks are not silently truncated by the embedder.
+    """
+
+    def __init__(
+        self,
+        config: Optional[ChunkingConfig] = None,
+        tokenizer=None,
+        max_tokens: int = DEFAULT_MAX_SEQ_TOKENS,
+    ):
+        self.config = config or ChunkingConfig()
+        if self.config.length_function not in ("char", "token"):
+            raise ValueError(f"Unknown length_function: {self.config.length_function}")
+        self.tokenizer = None
+        self.chunk_size = self.config.chunk_size
+        if self.config.length_function == "token":
+            self.tokenizer = tokenizer or load_tokenizer()
+            self.chunk_size = min(self.chunk_size, max_tokens - _SPECIAL_TOKENS)
+        self.chunk_overlap = min(self.config.chunk_overlap, self.chunk_size // 2)
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def split_spans(self, text: str) -> List[Span]:
+        """Chunk boundaries as (start, end) offsets into ``text``"""
+        if not text.strip():
+            return []
+        length = _Lengths(text, self.tokenizer)
+        pieces = self._split(length, 0, len(text), 0)
+        return self._merge(length, pieces)
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """Chunks as Documents with the manifest's content-hash ids; repeated chunk text is kept once"""
+        chunks = []
+        for document in documents:
+            seen = set()
+            for text in self.split_text(document.content):
+                digest = content_hash(text)
+                if digest in seen:
+                    continue
+                seen.add(digest)
+                chunks.append(Document(
+                    id=chunk_id(document.metadata.source_type.value, document.metadata.source_id, digest),
+                    content=text,
+                    metadata=document.metadata,
+                ))
+        return chunks
+
+    def _split(self, length: _Lengths, start: int, end: int, level: int) -> List[Span]:
+        if length(start, end) <= self.chunk_size:
+            return [(start, end)] if length.text[start:end].strip() else []
+        if level == len(_SEPARATORS):
+            return length.cut(start, end, self.chunk_size)
+        pieces: List[Span] = []
+        piece_start = start
+        for match in _SEPARATORS[level].finditer(length.text, start, end):
+            if match.start() > piece_start:
+                pieces.extend(self._split(length, piece_start, match.start(), level + 1))
+            piece_start = max(piece_start, match.end())
+        if piece_start < end:
+            pieces.extend(self._split(length, piece_start, end, level + 1))
+        return pieces
+
+    def _merge(self, length: _Lengths, pieces: List[Span]) -> List[Span]:
+        chunks: List[Span] = []
+        current: List[Span] = []
+        for piece in pieces:
+            if current and length(current[0][0], piece[1]) > self.chunk_size:
+                chunks.append((current[0][0], current[-1][1]))
+                # Carry trailing pieces forward as overlap while they still leave room
+                while current and (
+                    length(current[0][0], current[-1][1]) > self.chunk_overlap
+                    or length(current[0][0], piece[1]) > self.chunk_size
+                ):
+                    current.pop(0)
+            current.append(piece)
+        if current:
+            chunks.append((current[0][0], current[-1][1]))
+        return chunks
@@ -0,0 +1,162 @@
+import asyncio
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Optional
+
+from fastapi import Depends, Request
+
+from models.auth import UserResponse
+
+if TYPE_CHECKING:
+    from services.auth import AuthService
+    from services.document import DocumentService
+    from services.rag import RAGService
+
+
+def _shard_router():
+    from core.config import settings
+    from services.sharding import get_shard_router
+    return get_shard_router() if settings.SHARD_BY != "none" else None
+
+
+def _build_rag_service():
+    from core.config import settings
+    from services.rag import RAGService
+    from services.rerank import reranker
+    service = RAGService(reranker=reranker if settings.RERANK_ENABLED else None, shards=_shard_router())
+    service.warm_up()
+    return service
+
+
+def _build_document_service():
+    from services.chunking import default_chunker
+    from services.document import DocumentService
+    return DocumentService(chunker=default_chunker(), shards=_shard_router())
+
+
+def _build_auth_service():
+    from services.auth import AuthService
+    return AuthService()
+
+
+class ServiceContainer:
+    """Builds each heavy service once per process and shares it across routers.
+
+    Services are created on first use, or up front by ``warm_up()``. When the
+    app is imported by a ``gunicorn --preload`` master, warming up before the
+    fork lets every worker share the model pages copy-on-write.
+    """
+
+    def __init__(self, factories: Dict[str, Callable[[], Any]]):
+        self._factories = factories
+        self._instances: Dict[str, Any] = {}
+        self._errors: Dict[str, str] = {}
+        self._locks = {name: threading.Lock() for name in factories}
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._locks[name]:
+                instance = self._instances.get(name)
+                if instance is None:
+                    try:
+                        instance = self._instances[name] = self._factories[name]()
+                    except Exception as e:
+                        self._errors[name] = str(e)
+                        raise
+                    self._errors.pop(name, None)
+        return instance
+
+    def is_ready(self, name: str) -> bool:
+        return name in self._instances
+
+    def readiness(self) -> Dict[str, Dict[str, Any]]:
+        """Per-service state: ready, loading (not built yet) or failed"""
+        report = {}
+        for name in self._factories:
+            if name in self._instances:
+                report[name] = {"status": "ready"}
+            elif name in self._errors:
+                report[name] = {"status": "failed", "error": self._errors[name]}
+            else:
+                report[name] = {"status": "loading"}
+        return report
+
+    def warm_up(self, names: Iterable[str] = ("rag", "document", "auth")) -> None:
+        """Build services up front; failures are recorded for /ready and retried on use"""
+        for name in names:
+            try:
+                self.get(name)
+            except Exception:
+                continue
+
+    @property
+    def rag_service(self) -> "RAGService":
+        return self.get("rag")
+
+    @property
+    def document_service(self) -> "DocumentService":
+        return self.get("document")
+
+    @property
+    def auth_service(self) -> "AuthService":
+        return self.get("auth")
+
+    async def shutdown(self) -> None:
+        """Stop background workers and release pooled resources"""
+        from services.batching import query_embedder
+        from services.conversation import conversation_store
+        from services.embeddings import embedding_engine
+        from services import http_fetch
+        from services.jobs import indexing_jobs
+        from services.slack import slack_responder
+        from services.token_store import token_store
+
+        await indexing_jobs.shutdown()
+        await slack_responder.aclose()
+        query_embedder.close()
+        await asyncio.to_thread(embedding_engine.close)
+        token_store.close()
+        conversation_store.close()
+        if http_fetch.connector_fetcher is not None:
+            await http_fetch.connector_fetcher.aclose()
+            http_fetch.connector_fetcher = None
+
+
+container = ServiceContainer({
+    "rag": _build_rag_service,
+    "document": _build_document_service,
+    "auth": _build_auth_service,
+})
+
+
+def get_rag_service() -> "RAGService":
+    return container.rag_service
+
+
+def get_rag_service_provider() -> Callable[[], "RAGService"]:
+    """Resolves the RAGService when called, for handlers that must reply before it is built"""
+    return get_rag_service
+
+
+def get_document_service() -> "DocumentService":
+    return container.document_service
+
+
+def get_auth_service() -> "AuthService":
+    return container.auth_service
+
+
+async def get_current_user(
+    request: Request,
+    auth_service: "AuthService" = Depends(get_auth_service)
+) -> UserResponse:
+    """The authenticated caller; 401 without a valid bearer token"""
+    return await auth_service.get_current_user(request)
+
+
+async def get_optional_user(
+    request: Request,
+    auth_service: "AuthService" = Depends(get_auth_service)
+) -> Optional[UserResponse]:
+    """The caller if a bearer token was sent, otherwise None"""
+    return await auth_service.get_optional_user(request)
@@ -0,0 +1,219 @@
+import hashlib
+import math
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.config import settings
+from core.metrics import span
+from models.rag import RAGRequest, SearchResult
+
+TokenCounter = Callable[[str], int]
+
+_WORD = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=1)
+def default_token_counter() -> TokenCounter:
+    """tiktoken's cl100k_base when installed, otherwise a 4-chars-per-token estimate"""
+    try:
+        import tiktoken
+    except ImportError:
+        return lambda text: math.ceil(len(text) / 4)
+    encoding = tiktoken.get_encoding("cl100k_base")
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def context_budget(request: RAGRequest) -> int:
+    """Prompt tokens available for retrieved context once the answer is reserved"""
+    available = settings.LLM_CONTEXT_WINDOW - request.max_tokens - settings.PROMPT_OVERHEAD_TOKENS
+    return max(0, min(settings.CONTEXT_TOKEN_BUDGET, available))
+
+
+def simhash(text: str, shingle: int = 3) -> int:
+    """64-bit SimHash over word shingles"""
+    words = _WORD.findall(text.lower())
+    features = [" ".join(words[i:i + shingle]) for i in range(max(1, len(words) - shingle + 1))]
+    weights = [0] * 64
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def merge_overlap(first: str, second: str, min_overlap: int = 20, max_overlap: int = 1000) -> Optional[str]:
+    """``first`` + ``second`` if a suffix of ``first`` is a prefix of ``second``"""
+    probe = second[:min_overlap]
+    if len(probe) < min_overlap:
+        return None
+    pos = first.find(probe, max(0, len(first) - max_overlap))
+    while pos != -1:
+        if second.startswith(first[pos:]):
+            return first + second[len(first) - pos:]
+        pos = first.find(probe, pos + 1)
+    return None
+
+
+@dataclass
+class PackedContext:
+    text: str
+    sources: List[SearchResult]
+    tokens_used: int
+    tokens_unpacked: int
+    budget: int
+    chunks_in: int = 0
+    chunks_merged: int = 0
+    duplicates_removed: int = 0
+    chunks_dropped: int = 0
+    chunks_truncated: int = 0
+
+    def metadata(self) -> Dict[str, Any]:
+        """Summary for RAGResponse.metadata["context"]"""
+        return {
+            "budget_tokens": self.budget,
+            "tokens_used": self.tokens_used,
+            "tokens_unpacked": self.tokens_unpacked,
+            "tokens_saved": max(0, self.tokens_unpacked - self.tokens_used),
+            "chunks_in": self.chunks_in,
+            "chunks_merged": self.chunks_merged,
+            "duplicates_removed": self.duplicates_removed,
+            "chunks_dropped": self.chunks_dropped,
+            "chunks_truncated": self.chunks_truncated,
+        }
+
+
+@dataclass
+class _Passage:
+    text: str
+    result: SearchResult
+    score: float
+    fingerprint: int = 0
+
+
+class ContextPacker:
+    """Builds the LLM context from retrieved chunks within a token budget.
+
+    Chunks from the same source whose text overlaps (the ``chunk_overlap``
+    region) are stitched into one passage, near-duplicate passages are dropped
+    by SimHash distance, and passages are added best-score first until the
+    budget is exactly filled, truncating the last one at a word boundary.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Optional[TokenCounter] = None,
+        separator: str = "\n\n---\n\n",
+        max_hamming_distance: int = 3,
+        min_truncated_tokens: int = 32,
+    ):
+        self.count_tokens = count_tokens or default_token_counter()
+        self.separator = separator
+        self.max_hamming_distance = max_hamming_distance
+        self.min_truncated_tokens = min_truncated_tokens
+
+    def pack(self, results: List[SearchResult], budget: int) -> PackedContext:
+        with span("pack"):
+            return self._pack(results, budget)
+
+    def _pack(self, results: List[SearchResult], budget: int) -> PackedContext:
+        naive = self.separator.join(self._render(result.text, result) for result in results)
+        passages, merged = self._merge(results)
+        passages, duplicates = self._dedupe(passages)
+        packed = PackedContext(
+            text="",
+            sources=[],
+            tokens_used=0,
+            tokens_unpacked=self.count_tokens(naive) if results else 0,
+            budget=budget,
+            chunks_in=len(results),
+            chunks_merged=merged,
+            duplicates_removed=duplicates,
+        )
+        parts: List[str] = []
+        for passage in passages:
+            rendered = self._render(passage.text, passage.result)
+            candidate = self.separator.join(parts + [rendered])
+            if self.count_tokens(candidate) <= budget:
+                parts.append(rendered)
+                packed.sources.append(passage.result.model_copy(update={"text": passage.text}))
+                continue
+            truncated = self._truncate(parts, passage, budget)
+            if truncated is None:
+                packed.chunks_dropped += 1
+                continue
+            parts.append(self._render(truncated, passage.result))
+            packed.sources.append(passage.result.model_copy(update={"text": truncated}))
+            packed.chunks_truncated += 1
+        packed.text = self.separator.join(parts)
+        packed.tokens_used = self.count_tokens(packed.text) if parts else 0
+        return packed
+
+    @staticmethod
+    def _render(text: str, result: SearchResult) -> str:
+        return f"[{result.metadata.title}]\n{text}"
+
+    def _merge(self, results: List[SearchResult]) -> Tuple[List[_Passage], int]:
+        groups: Dict[Tuple[str, str], List[_Passage]] = {}
+        for result in results:
+            key = (result.metadata.source_type.value, result.metadata.source_id)
+            groups.setdefault(key, []).append(_Passage(result.text, result, result.score))
+        merged_count = 0
+        passages: List[_Passage] = []
+        for group in groups.values():
+            merged = True
+            while merged and len(group) > 1:
+                merged = False
+                for i in range(len(group)):
+                    for j in range(len(group)):
+                        if i == j:
+                            continue
+                        text = merge_overlap(group[i].text, group[j].text)
+                        if text is None:
+                            continue
+                        best = group[i] if group[i].score >= group[j].score else group[j]
+                        group[i] = _Passage(text, best.result, max(group[i].score, group[j].score))
+                        del group[j]
+                        merged_count += 1
+                        merged = True
+                        break
+                    if merged:
+                        break
+            passages.extend(group)
+        passages.sort(key=lambda passage: passage.score, reverse=True)
+        return passages, merged_count
+
+    def _dedupe(self, passages: List[_Passage]) -> Tuple[List[_Passage], int]:
+        kept: List[_Passage] = []
+        for passage in passages:
+            passage.fingerprint = simhash(passage.text)
+            if any(bin(passage.fingerprint ^ other.fingerprint).count("1") <= self.max_hamming_distance for other in kept):
+                continue
+            kept.append(passage)
+        return kept, len(passages) - len(kept)
+
+    def _truncate(self, parts: List[str], passage: _Passage, budget: int) -> Optional[str]:
+        """Longest word-boundary prefix of the passage that still fits the budget"""
+        words = [m.end() for m in re.finditer(r"\S+", passage.text)]
+
+        def fits(n: int) -> bool:
+            text = passage.text[:words[n - 1]] + " …"
+            return self.count_tokens(self.separator.join(parts + [self._render(text, passage.result)])) <= budget
+
+        low, high = 0, len(words)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if fits(mid):
+                low = mid
+            else:
+                high = mid - 1
+        if low == 0:
+            return None
+        text = passage.text[:words[low - 1]] + " …"
+        if self.count_tokens(text) < self.min_truncated_tokens:
+            return None
+        return text
+
+
+context_packer = ContextPacker()
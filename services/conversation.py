@@ -0,0 +1,286 @@
+import asyncio
+import base64
+import hashlib
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from core.config import settings
+from models.rag import SearchResult
+from services.context import TokenCounter, default_token_counter
+from services.sqlite_pool import SQLitePool
+
+# Folds the existing summary and the turns being dropped into a new summary
+Summarizer = Callable[[str, List[Dict[str, str]]], str]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    user_id TEXT,
+    state TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+)
+"""
+
+
+def _encode_vector(vector: Sequence[float]) -> str:
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def _decode_vector(value: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(value), dtype=np.float32)
+
+
+def chunk_set_key(chunk_ids: Sequence[str]) -> str:
+    """Identity of an ordered chunk set, used to tell whether a packed prefix is still valid"""
+    return hashlib.sha1("\x1f".join(chunk_ids).encode("utf-8")).hexdigest()
+
+
+def extractive_summary(
+    summary: str,
+    turns: List[Dict[str, str]],
+    max_chars: int = 200,
+    max_total_chars: int = 2000,
+) -> str:
+    """Summarizer that needs no LLM call: the start of each question and answer, newest kept"""
+    lines = summary.split("\n") if summary else []
+    for turn in turns:
+        lines.append(f"Q: {turn['question'][:max_chars]}")
+        lines.append(f"A: {turn['answer'][:max_chars]}")
+    kept, total = [], 0
+    for line in reversed(lines):
+        total += len(line) + 1
+        if total > max_total_chars:
+            break
+        kept.append(line)
+    return "\n".join(reversed(kept))
+
+
+@dataclass
+class CachedChunk:
+    id: str
+    vector: np.ndarray
+    result: SearchResult
+
+
+@dataclass
+class Conversation:
+    id: str
+    user_id: Optional[str] = None
+    summary: str = ""
+    turns: List[Dict[str, str]] = field(default_factory=list)
+    chunks: List[CachedChunk] = field(default_factory=list)
+    prefix: Optional[str] = None
+    prefix_key: Optional[str] = None
+
+    def history_messages(self) -> List[Dict[str, str]]:
+        """Chat messages for the summary and recent turns, placed after the cached context prefix"""
+        messages = []
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        for turn in self.turns:
+            messages.append({"role": "user", "content": turn["question"]})
+            messages.append({"role": "assistant", "content": turn["answer"]})
+        return messages
+
+    def to_state(self) -> str:
+        return json.dumps({
+            "summary": self.summary,
+            "turns": self.turns,
+            "chunks": [
+                {"id": c.id, "vector": _encode_vector(c.vector), "result": c.result.model_dump(mode="json")}
+                for c in self.chunks
+            ],
+            "prefix": self.prefix,
+            "prefix_key": self.prefix_key,
+        })
+
+    @classmethod
+    def from_state(cls, conversation_id: str, user_id: Optional[str], state: str) -> "Conversation":
+        data = json.loads(state)
+        return cls(
+            id=conversation_id,
+            user_id=user_id,
+            summary=data["summary"],
+            turns=data["turns"],
+            chunks=[
+                CachedChunk(c["id"], _decode_vector(c["vector"]), SearchResult.model_validate(c["result"]))
+                for c in data["chunks"]
+            ],
+            prefix=data["prefix"],
+            prefix_key=data["prefix_key"],
+        )
+
+
+@dataclass
+class RetrievalPlan:
+    reused: List[CachedChunk]
+    fetch_k: int  # chunks still to retrieve; 0 means the vector search can be skipped
+
+
+class ConversationStore:
+    """Server-side chat sessions so follow-up questions reuse earlier work.
+
+    Each conversation keeps the chunks retrieved so far (with their vectors),
+    the packed context prefix built from them, and the chat history. Cached
+    chunks that are still close to a follow-up question are reused and only
+    the remainder is retrieved; an unchanged chunk set reuses the packed
+    prefix verbatim, which also keeps the prompt prefix stable for provider
+    prompt caching. Once the history passes ``history_token_limit`` the
+    older turns are folded into a summary, so prompt size stays flat.
+    Sessions live in SQLite and expire ``ttl_seconds`` after last use.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float = 60 * 60,
+        min_similarity: float = 0.5,
+        history_token_limit: int = 1000,
+        keep_turns: int = 2,
+        summarizer: Summarizer = extractive_summary,
+        token_counter: Optional[TokenCounter] = None,
+        pool_size: int = 4,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.min_similarity = min_similarity
+        self.history_token_limit = history_token_limit
+        self.keep_turns = keep_turns
+        self.summarizer = summarizer
+        self._count_tokens = token_counter
+        self._pool = SQLitePool(path, pool_size)
+        self._last_purge = 0.0
+        with self._pool.connection() as conn:
+            conn.execute(_SCHEMA)
+            conn.execute("CREATE INDEX IF NOT EXISTS conversations_expires_at ON conversations (expires_at)")
+
+    def start(self, user_id: Optional[str] = None) -> Conversation:
+        return Conversation(id=uuid.uuid4().hex, user_id=user_id)
+
+    def get(self, conversation_id: str, user_id: Optional[str] = None) -> Optional[Conversation]:
+        """The live conversation, or None if unknown, expired, or owned by another user"""
+        with self._pool.connection() as conn:
+            row = conn.execute(
+                "SELECT user_id, state FROM conversations WHERE id = ? AND expires_at > ?",
+                (conversation_id, time.time()),
+            ).fetchone()
+        if row is None or (row[0] is not None and row[0] != user_id):
+            return None
+        return Conversation.from_state(conversation_id, row[0], row[1])
+
+    def get_or_start(self, conversation_id: Optional[str], user_id: Optional[str] = None) -> Conversation:
+        conversation = self.get(conversation_id, user_id) if conversation_id else None
+        return conversation or self.start(user_id)
+
+    def plan_retrieval(self, conversation: Conversation, question_vector: Sequence[float], k: int) -> RetrievalPlan:
+        """Cached chunks still relevant to the question, best first, and how many more to fetch"""
+        if not conversation.chunks:
+            return RetrievalPlan([], k)
+        query = np.asarray(question_vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        vectors = np.stack([c.vector for c in conversation.chunks])
+        similarities = vectors @ query / np.maximum(np.linalg.norm(vectors, axis=1), 1e-12)
+        order = [i for i in np.argsort(-similarities) if similarities[i] >= self.min_similarity][:k]
+        reused = [conversation.chunks[i] for i in order]
+        return RetrievalPlan(reused, k - len(reused))
+
+    def merge_chunks(self, plan: RetrievalPlan, fetched: Sequence[CachedChunk]) -> List[CachedChunk]:
+        """Reused chunks followed by newly fetched ones, without duplicates"""
+        seen = {c.id for c in plan.reused}
+        merged = list(plan.reused)
+        for chunk in fetched:
+            if chunk.id not in seen:
+                seen.add(chunk.id)
+                merged.append(chunk)
+        return merged
+
+    def cached_prefix(self, conversation: Conversation, chunks: Sequence[CachedChunk]) -> Optional[str]:
+        """The packed context from the previous turn if it was built from exactly these chunks"""
+        if conversation.prefix is not None and conversation.prefix_key == chunk_set_key([c.id for c in chunks]):
+            return conversation.prefix
+        return None
+
+    def record_turn(
+        self,
+        conversation: Conversation,
+        question: str,
+        answer: str,
+        chunks: Sequence[CachedChunk],
+        prefix: str,
+    ) -> None:
+        """Store the turn, the chunk set and its packed prefix, summarising old turns if needed"""
+        conversation.turns.append({"question": question, "answer": answer})
+        conversation.chunks = list(chunks)
+        conversation.prefix = prefix
+        conversation.prefix_key = chunk_set_key([c.id for c in chunks])
+        self._maybe_summarize(conversation)
+        self.save(conversation)
+
+    def save(self, conversation: Conversation) -> None:
+        now = time.time()
+        with self._pool.connection() as conn:
+            conn.execute(
+                "INSERT INTO conversations (id, user_id, state, updated_at, expires_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET state = excluded.state, "
+                "updated_at = excluded.updated_at, expires_at = excluded.expires_at",
+                (conversation.id, conversation.user_id, conversation.to_state(), now, now + self.ttl_seconds),
+            )
+            if now - self._last_purge > 60:
+                self._last_purge = now
+                conn.execute("DELETE FROM conversations WHERE expires_at <= ?", (now,))
+
+    def delete(self, conversation_id: str, user_id: Optional[str] = None) -> bool:
+        """Delete a conversation owned by ``user_id`` (None matches anonymous conversations only)"""
+        with self._pool.connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM conversations WHERE id = ? AND user_id IS ?",
+                (conversation_id, user_id),
+            )
+        return cursor.rowcount > 0
+
+    async def aget_or_start(self, conversation_id: Optional[str], user_id: Optional[str] = None) -> Conversation:
+        return await asyncio.to_thread(self.get_or_start, conversation_id, user_id)
+
+    async def arecord_turn(
+        self,
+        conversation: Conversation,
+        question: str,
+        answer: str,
+        chunks: Sequence[CachedChunk],
+        prefix: str,
+    ) -> None:
+        await asyncio.to_thread(self.record_turn, conversation, question, answer, chunks, prefix)
+
+    async def adelete(self, conversation_id: str, user_id: Optional[str] = None) -> bool:
+        return await asyncio.to_thread(self.delete, conversation_id, user_id)
+
+    def close(self) -> None:
+        self._pool.close()
+
+    def history_tokens(self, conversation: Conversation) -> int:
+        count = self._count_tokens or default_token_counter()
+        return sum(count(message["content"]) for message in conversation.history_messages())
+
+    def _maybe_summarize(self, conversation: Conversation) -> None:
+        if len(conversation.turns) <= self.keep_turns:
+            return
+        if self.history_tokens(conversation) <= self.history_token_limit:
+            return
+        older = conversation.turns[:-self.keep_turns] if self.keep_turns else conversation.turns
+        conversation.summary = self.summarizer(conversation.summary, older)
+        conversation.turns = conversation.turns[len(older):]
+
+
+conversation_store = ConversationStore(
+    settings.CONVERSATION_STORE_PATH,
+    ttl_seconds=settings.CONVERSATION_TTL_SECONDS,
+    min_similarity=settings.CONVERSATION_REUSE_MIN_SIMILARITY,
+    history_token_limit=settings.CONVERSATION_HISTORY_TOKEN_LIMIT,
+    keep_turns=settings.CONVERSATION_KEEP_TURNS,
+)
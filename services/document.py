@@ -0,0 +1,325 @@
+import asyncio
+import html
+import os
+import re
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from core.config import settings
+from models.docs import Document, DocumentMetadata, SourceType
+from services.ann import get_chroma_client, open_collection
+from services.cache import SemanticCache, answer_cache
+from services.chunking import TextChunker
+from services.embeddings import EmbeddingEngine, embedding_engine
+from services.http_fetch import (
+    AsyncFetcher,
+    get_connector_fetcher,
+    iter_confluence_pages,
+    iter_notion_blocks,
+    iter_notion_pages,
+)
+from services.keyword_index import KeywordIndex, keyword_index
+from services.manifest import IndexManifest, index_manifest
+from services.jobs import IndexingJob
+from services.pipeline import build_document_pipeline
+from services.sharding import ShardRouter, tenant_collection_name
+
+GOOGLE_DOCS_API = "https://docs.googleapis.com/v1"
+
+_TAG = re.compile(r"<[^>]+>")
+_BLOCK_END = re.compile(r"</(p|h[1-6]|li|tr|div|pre|blockquote)>|<br\s*/?>", re.IGNORECASE)
+
+NotionPage = Tuple[Dict[str, Any], List[Dict[str, Any]]]
+
+
+def _plain_text(rich_text: List[Dict[str, Any]]) -> str:
+    return "".join(part.get("plain_text", "") for part in rich_text or [])
+
+
+def notion_document(item: NotionPage) -> Optional[Document]:
+    """Document from a Notion page and its blocks; None if the page has no text"""
+    page, blocks = item
+    title = next(
+        (_plain_text(prop.get("title")) for prop in page.get("properties", {}).values() if prop.get("type") == "title"),
+        "",
+    )
+    lines = []
+    for block in blocks:
+        body = block.get(block.get("type"), {})
+        text = _plain_text(body.get("rich_text")) if isinstance(body, dict) else ""
+        if text:
+            lines.append(text)
+    if not lines:
+        return None
+    return Document(
+        id=page["id"],
+        content="\n".join(lines),
+        metadata=DocumentMetadata(
+            source_type=SourceType.notion,
+            source_id=page["id"],
+            title=title or "Untitled",
+            url=page.get("url"),
+            last_updated=page.get("last_edited_time"),
+            author=(page.get("created_by") or {}).get("id"),
+        ),
+    )
+
+
+def confluence_document(page: Dict[str, Any], base_url: str) -> Optional[Document]:
+    """Document from a Confluence page with an expanded storage-format body"""
+    storage = page.get("body", {}).get("storage", {}).get("value", "")
+    content = html.unescape(_TAG.sub("", _BLOCK_END.sub("\n", storage))).strip()
+    if not content:
+        return None
+    webui = page.get("_links", {}).get("webui")
+    return Document(
+        id=page["id"],
+        content=content,
+        metadata=DocumentMetadata(
+            source_type=SourceType.confluence,
+            source_id=page["id"],
+            title=page.get("title") or "Untitled",
+            url=f"{base_url.rstrip('/')}{webui}" if webui else None,
+            last_updated=(page.get("version") or {}).get("when"),
+            author=((page.get("history") or {}).get("createdBy") or {}).get("displayName"),
+        ),
+    )
+
+
+def google_document(data: Dict[str, Any]) -> Optional[Document]:
+    """Document from a Google Docs API ``documents.get`` response"""
+    parts = []
+    for element in data.get("body", {}).get("content", []):
+        for run in element.get("paragraph", {}).get("elements", []):
+            parts.append(run.get("textRun", {}).get("content", ""))
+    content = "".join(parts).strip()
+    if not content:
+        return None
+    return Document(
+        id=data["documentId"],
+        content=content,
+        metadata=DocumentMetadata(
+            source_type=SourceType.google_docs,
+            source_id=data["documentId"],
+            title=data.get("title") or "Untitled",
+            url=f"https://docs.google.com/document/d/{data['documentId']}",
+        ),
+    )
+
+
+class DocumentService:
+    """Crawls connected sources into the shared Chroma collection.
+
+    Every connector goes through the shared ``AsyncFetcher`` (per-host rate
+    limits, Retry-After, backoff) and the staged ingestion pipeline, so
+    pages are chunked and embedded while the crawl is still running. Chunks
+    also go into the BM25 keyword index, saved next to the Chroma files
+    after each crawl. The index manifest lets re-crawls skip pages whose
+    content is unchanged, and a crawl of a whole workspace or site deletes
+    the chunks of pages that are gone from it. With a shard router, a ``tenant_id`` sends the
+    crawl into that tenant's own collection and keyword index, tracked by a
+    manifest of its own.
+    Each ``process_*`` method returns the ids of the documents it processed;
+    given a ``job``, it also adds each document to ``job.document_ids`` as
+    soon as its chunks are written and copies per-document errors into
+    ``job.errors``.
+    """
+
+    def __init__(
+        self,
+        collection: Any = None,
+        engine: EmbeddingEngine = embedding_engine,
+        chunker: Optional[TextChunker] = None,
+        fetcher: Optional[Callable[[], AsyncFetcher]] = None,
+        cache: Optional[SemanticCache] = answer_cache,
+        manifest: Optional[IndexManifest] = index_manifest,
+        keyword_index: Optional[KeywordIndex] = keyword_index,
+        shards: Optional[ShardRouter] = None,
+    ):
+        self._collection = collection
+        self._collection_lock = threading.Lock()
+        self.engine = engine
+        self.chunker = chunker or TextChunker()
+        self.get_fetcher = fetcher or get_connector_fetcher
+        self.cache = cache
+        self.manifest = manifest
+        self.keyword_index = keyword_index
+        self.shards = shards
+        self._tenant_manifests: Dict[str, IndexManifest] = {}
+
+    @property
+    def collection(self) -> Any:
+        if self._collection is None:
+            with self._collection_lock:
+                if self._collection is None:
+                    self._collection = open_collection(get_chroma_client(), settings.CHROMA_COLLECTION_NAME)
+        return self._collection
+
+    async def process_notion_pages(
+        self,
+        token: str,
+        database_id: Optional[str] = None,
+        tenant_id: Optional[str] = None,
+        job: Optional[IndexingJob] = None,
+    ) -> List[str]:
+        fetcher = self.get_fetcher()
+        manifest = self._manifest_for(tenant_id)
+
+        async def fetch(page: Dict[str, Any]) -> Optional[NotionPage]:
+            if manifest is not None and not manifest.needs_fetch(
+                SourceType.notion, page["id"], page.get("last_edited_time")
+            ):
+                return None  # not edited since it was indexed, so don't walk its blocks
+            return page, [block async for block in iter_notion_blocks(fetcher, token, page["id"])]
+
+        return await self._index(
+            iter_notion_pages(fetcher, token, database_id),
+            notion_document,
+            fetch,
+            tenant_id,
+            full_crawl=SourceType.notion if database_id is None else None,
+            job=job,
+        )
+
+    async def process_confluence_docs(
+        self,
+        base_url: str,
+        username: str,
+        api_token: str,
+        space_key: Optional[str] = None,
+        tenant_id: Optional[str] = None,
+        job: Optional[IndexingJob] = None,
+    ) -> List[str]:
+        pages = iter_confluence_pages(self.get_fetcher(), base_url, username, api_token, space_key)
+        return await self._index(
+            pages,
+            lambda page: confluence_document(page, base_url),
+            tenant_id=tenant_id,
+            full_crawl=SourceType.confluence if space_key is None else None,
+            job=job,
+        )
+
+    async def process_google_doc(
+        self,
+        credentials: Dict[str, Any],
+        document_id: str,
+        tenant_id: Optional[str] = None,
+        job: Optional[IndexingJob] = None,
+    ) -> List[str]:
+        fetcher = self.get_fetcher()
+
+        async def one_document() -> AsyncIterator[Dict[str, Any]]:
+            yield await fetcher.get_json(
+                f"{GOOGLE_DOCS_API}/documents/{document_id}",
+                headers={"Authorization": f"Bearer {credentials['token']}"},
+            )
+
+        return await self._index(one_document(), google_document, tenant_id=tenant_id, job=job)
+
+    async def index_documents(self, documents: AsyncIterator[Document], tenant_id: Optional[str] = None) -> List[str]:
+        """Index documents that are already parsed, e.g. an export or a benchmark corpus"""
+        return await self._index(documents, lambda document: document, tenant_id=tenant_id)
+
+    def _sharded(self, tenant_id: Optional[str]) -> bool:
+        return self.shards is not None and tenant_id is not None
+
+    def _manifest_for(self, tenant_id: Optional[str]) -> Optional[IndexManifest]:
+        """The shared manifest, or the tenant's own so one tenant's crawl never skips pages for another"""
+        if self.manifest is None or not self._sharded(tenant_id):
+            return self.manifest
+        with self._collection_lock:
+            manifest = self._tenant_manifests.get(tenant_id)
+            if manifest is None:
+                path = os.path.join(
+                    os.path.dirname(self.manifest.path),
+                    f"manifest_{tenant_collection_name(tenant_id)}.json",
+                )
+                manifest = self._tenant_manifests[tenant_id] = IndexManifest(path)
+        return manifest
+
+    async def _index(
+        self,
+        items: AsyncIterator[Any],
+        parse: Callable[[Any], Optional[Document]],
+        fetch: Optional[Callable[[Any], Any]] = None,
+        tenant_id: Optional[str] = None,
+        full_crawl: Optional[SourceType] = None,
+        job: Optional[IndexingJob] = None,
+    ) -> List[str]:
+        """Run the ingestion pipeline over ``items``.
+
+        ``full_crawl`` says that ``items`` list every page of that source type,
+        keyed by ``item["id"]``; indexed pages missing from the listing are
+        then removed once the crawl has finished.
+        """
+        indexed: List[str] = []
+        seen: List[str] = []
+        manifest = self._manifest_for(tenant_id)
+        shard = None
+        keyword_index = self.keyword_index
+        if self._sharded(tenant_id):
+            shard = await asyncio.to_thread(self.shards.shard, tenant_id, True)
+            collection = shard.collection
+            if keyword_index is not None:
+                keyword_index = shard.keyword_index
+        else:
+            collection = self.collection
+
+        def finished(document: Document) -> None:
+            indexed.append(document.id)
+            if job is not None:
+                job.document_ids.append(document.id)
+
+        async def listed() -> AsyncIterator[Any]:
+            async for item in items:
+                seen.append(item["id"])
+                yield item
+
+        pipeline = build_document_pipeline(
+            collection,
+            parse,
+            fetch=fetch,
+            chunker=self.chunker,
+            engine=self.engine,
+            keyword_index=keyword_index,
+            answer_cache=self.cache,
+            manifest=manifest,
+            fetch_concurrency=settings.CONNECTOR_PER_HOST_CONCURRENCY,
+            embed_batch_size=settings.EMBEDDING_BATCH_SIZE,
+            on_document=finished,
+        )
+        try:
+            report = await pipeline.run(listed() if full_crawl is not None else items)
+            if full_crawl is not None and manifest is not None:
+                await asyncio.to_thread(self._remove_missing, collection, keyword_index, manifest, full_crawl, seen)
+        finally:
+            if manifest is not None:
+                await asyncio.to_thread(manifest.save)
+            if shard is not None:
+                self.shards.refresh_size(tenant_id, shard)
+            if keyword_index is not None:
+                await asyncio.to_thread(keyword_index.save)
+        errors = [error for stage in report["stages"].values() for error in stage["recent_errors"]]
+        if job is not None:
+            job.errors.extend(errors)
+        if errors and not indexed:
+            raise RuntimeError(f"Indexing failed: {errors[0]}")
+        return indexed
+
+    def _remove_missing(
+        self,
+        collection: Any,
+        keyword_index: Optional[KeywordIndex],
+        manifest: IndexManifest,
+        source_type: SourceType,
+        seen: List[str],
+    ) -> None:
+        """Delete the chunks of pages a full crawl no longer lists"""
+        for source_id, chunk_ids in manifest.removed_sources(source_type, seen):
+            if chunk_ids:
+                collection.delete(ids=chunk_ids)
+                if keyword_index is not None:
+                    keyword_index.remove(chunk_ids)
+            manifest.forget(source_type, source_id)
+            if self.cache is not None:
+                self.cache.invalidate_source(source_type.value, source_id)
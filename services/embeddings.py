@@ -0,0 +1,138 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from core.config import settings
+from core.metrics import span
+
+# Per-process models by name, loaded by the pool initializer (or lazily in-process)
+_worker_models: Dict[str, Any] = {}
+
+
+def _load_model(model_name: str):
+    model = _worker_models.get(model_name)
+    if model is None:
+        from sentence_transformers import SentenceTransformer
+        model = _worker_models[model_name] = SentenceTransformer(model_name, device="cpu")
+    return model
+
+
+def _init_worker(model_name: str, num_threads: int) -> None:
+    import torch
+    torch.set_num_threads(num_threads)
+    _load_model(model_name)
+
+
+def _encode_batch(texts: List[str], normalize: bool, model_name: str) -> np.ndarray:
+    model = _load_model(model_name)
+    vectors = model.encode(
+        texts,
+        batch_size=len(texts),
+        convert_to_numpy=True,
+        normalize_embeddings=normalize,
+        show_progress_bar=False,
+    )
+    return vectors.astype(np.float32, copy=False)
+
+
+class EmbeddingEngine:
+    """Batched sentence-transformers embedding with an optional process pool.
+
+    Texts from any number of documents are sorted by length and cut into
+    batches of ``batch_size`` so each forward pass pads to a similar length.
+    With ``workers > 0`` batches are spread across worker processes, each
+    holding its own model copy and ``cpu_count // workers`` torch threads.
+    """
+
+    def __init__(
+        self,
+        model_name: str = settings.EMBEDDING_MODEL_NAME,
+        batch_size: int = 64,
+        workers: int = 0,
+        normalize: bool = True,
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.workers = workers
+        self.normalize = normalize
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts, returning a float32 array of shape (len(texts), dim) in input order"""
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = [
+            [texts[i] for i in order[start:start + self.batch_size]]
+            for start in range(0, len(order), self.batch_size)
+        ]
+        with span("embed_batch"):
+            if self.workers > 0 and len(batches) > 1:
+                pool = self._get_pool()
+                results = list(pool.map(
+                    _encode_batch,
+                    batches,
+                    [self.normalize] * len(batches),
+                    [self.model_name] * len(batches),
+                ))
+            else:
+                results = [_encode_batch(batch, self.normalize, self.model_name) for batch in batches]
+        sorted_vectors = np.concatenate(results, axis=0)
+        vectors = np.empty_like(sorted_vectors)
+        vectors[np.asarray(order)] = sorted_vectors
+        return vectors
+
+    async def aembed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed without blocking the event loop"""
+        return await asyncio.to_thread(self.embed, texts)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return _encode_batch([text], self.normalize, self.model_name)[0]
+
+    @property
+    def dimension(self) -> int:
+        return _load_model(self.model_name).get_sentence_embedding_dimension()
+
+    def bulk_upsert(
+        self,
+        collection: Any,
+        ids: Sequence[str],
+        texts: Sequence[str],
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+        upsert_batch_size: int = 1000,
+    ) -> int:
+        """Embed chunks in one pass and write them to a Chroma collection in slices"""
+        vectors = self.embed(texts)
+        for start in range(0, len(ids), upsert_batch_size):
+            end = start + upsert_batch_size
+            collection.upsert(
+                ids=list(ids[start:end]),
+                embeddings=vectors[start:end],
+                documents=list(texts[start:end]),
+                metadatas=list(metadatas[start:end]) if metadatas is not None else None,
+            )
+        return len(ids)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.model_name, threads),
+            )
+        return self._pool
+
+
+embedding_engine = EmbeddingEngine(
+    batch_size=settings.EMBEDDING_BATCH_SIZE,
+    workers=settings.EMBEDDING_WORKERS,
+)
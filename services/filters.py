@@ -0,0 +1,95 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from models.docs import DocumentMetadata, SourceType
+from models.rag import RAGRequest
+
+MetadataValue = Union[str, int, float, bool]
+
+
+def _value(item: Any) -> Any:
+    return getattr(item, "value", item)
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[int]:
+    """ISO-8601 timestamp (as returned by Notion/Confluence/Google) to epoch seconds"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def chunk_metadata(metadata: DocumentMetadata, **extra: MetadataValue) -> Dict[str, MetadataValue]:
+    """Flat, filterable metadata for one chunk.
+
+    Chroma indexes scalar metadata only and rejects None, so optional fields
+    are omitted and ``last_updated`` is also stored as ``last_updated_ts``
+    (epoch seconds) for range filters.
+    """
+    values: Dict[str, MetadataValue] = {
+        "source_type": _value(metadata.source_type),
+        "source_id": metadata.source_id,
+        "title": metadata.title,
+    }
+    if metadata.url:
+        values["url"] = metadata.url
+    if metadata.author:
+        values["author"] = metadata.author
+    if metadata.last_updated:
+        values["last_updated"] = metadata.last_updated
+        timestamp = parse_timestamp(metadata.last_updated)
+        if timestamp is not None:
+            values["last_updated_ts"] = timestamp
+    values.update(extra)
+    return values
+
+
+def _membership(field: str, values: Optional[Iterable[Any]]) -> Optional[Dict[str, Any]]:
+    values = sorted({_value(v) for v in values or []})
+    if not values:
+        return None
+    if len(values) == 1:
+        return {field: values[0]}
+    return {field: {"$in": values}}
+
+
+def build_where(
+    source_types: Optional[Iterable[SourceType]] = None,
+    source_ids: Optional[Iterable[str]] = None,
+    authors: Optional[Iterable[str]] = None,
+    updated_after: Optional[str] = None,
+    updated_before: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """Chroma ``where`` clause applied inside the vector search.
+
+    Passing this to ``collection.query(where=...)`` (or LangChain's
+    ``similarity_search(filter=...)``) restricts the candidate set before the
+    top-k cut, so a filtered request still gets its full k results.
+    """
+    clauses: List[Dict[str, Any]] = []
+    for clause in (
+        _membership("source_type", source_types),
+        _membership("source_id", source_ids),
+        _membership("author", authors),
+    ):
+        if clause:
+            clauses.append(clause)
+    after, before = parse_timestamp(updated_after), parse_timestamp(updated_before)
+    if after is not None:
+        clauses.append({"last_updated_ts": {"$gte": after}})
+    if before is not None:
+        clauses.append({"last_updated_ts": {"$lt": before}})
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
+
+
+def where_for_request(request: RAGRequest) -> Optional[Dict[str, Any]]:
+    return build_where(source_types=request.source_types)
@@ -0,0 +1,251 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set, TypeVar
+from urllib.parse import urljoin, urlsplit
+
+import httpx
+
+from core.config import settings
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+NOTION_API = "https://api.notion.com/v1"
+NOTION_VERSION = "2022-06-28"
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Async token bucket; ``pause`` empties it until a server-imposed deadline"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        # A negative balance delays every waiter until the deadline has passed
+        self._tokens = min(self._tokens, -seconds * self.rate)
+        self._updated = time.monotonic()
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AsyncFetcher:
+    """Pooled keep-alive HTTP client shared by the Notion and Confluence connectors.
+
+    Requests to one host are limited both in concurrency and in rate (token
+    bucket). 429 and 5xx responses are retried with backoff; a Retry-After
+    header pauses the whole host, not just the request that received it.
+    """
+
+    def __init__(
+        self,
+        per_host_concurrency: int = 4,
+        rate_limits: Optional[Dict[str, float]] = None,
+        default_rate: float = 10.0,
+        max_retries: int = 5,
+        timeout: float = 30,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.per_host_concurrency = per_host_concurrency
+        self.rate_limits = rate_limits or {}
+        self.default_rate = default_rate
+        self.max_retries = max_retries
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            transport=transport,
+        )
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        host = urlsplit(url).netloc
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.per_host_concurrency))
+        bucket = self._buckets.setdefault(host, TokenBucket(self.rate_limits.get(host, self.default_rate)))
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            async with semaphore:
+                try:
+                    response = await self._client.request(method, url, **kwargs)
+                except httpx.TransportError:
+                    if attempt == self.max_retries:
+                        raise
+                    response = None
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                response.raise_for_status()
+                return response
+            if attempt == self.max_retries:
+                response.raise_for_status()
+            delay = _retry_after(response) if response is not None else None
+            if delay is not None:
+                # The drained bucket makes the next acquire() wait out the deadline
+                bucket.pause(delay)
+            else:
+                await asyncio.sleep(min(30.0, 0.5 * 2 ** attempt) * (0.5 + random.random()))
+        raise RuntimeError("unreachable")
+
+    async def get_json(self, url: str, **kwargs: Any) -> Any:
+        return (await self.request("GET", url, **kwargs)).json()
+
+    async def post_json(self, url: str, **kwargs: Any) -> Any:
+        return (await self.request("POST", url, **kwargs)).json()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+async def map_concurrent(
+    items: AsyncIterator[T],
+    fn: Callable[[T], Awaitable[R]],
+    concurrency: int,
+) -> AsyncIterator[R]:
+    """Apply ``fn`` to items as they stream in, yielding results in completion order.
+
+    At most ``concurrency`` calls are in flight, and the source iterator is only
+    advanced when a slot frees up, so memory stays bounded.
+    """
+    pending: Set[asyncio.Task] = set()
+    iterator = items.__aiter__()
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < concurrency:
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                pending.add(asyncio.create_task(fn(item)))
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def _notion_headers(token: str) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {token}", "Notion-Version": NOTION_VERSION}
+
+
+async def iter_notion_pages(
+    fetcher: AsyncFetcher,
+    token: str,
+    database_id: Optional[str] = None,
+    api_base: str = NOTION_API,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Pages of a database (or every page shared with the integration), following start_cursor"""
+    if database_id:
+        url, body = f"{api_base}/databases/{database_id}/query", {"page_size": 100}
+    else:
+        url, body = f"{api_base}/search", {"page_size": 100, "filter": {"property": "object", "value": "page"}}
+    cursor = None
+    while True:
+        if cursor:
+            body["start_cursor"] = cursor
+        data = await fetcher.post_json(url, json=body, headers=_notion_headers(token))
+        for page in data.get("results", []):
+            yield page
+        cursor = data.get("next_cursor")
+        if not data.get("has_more") or not cursor:
+            return
+
+
+async def iter_notion_blocks(
+    fetcher: AsyncFetcher,
+    token: str,
+    block_id: str,
+    api_base: str = NOTION_API,
+) -> AsyncIterator[Dict[str, Any]]:
+    """All blocks under ``block_id`` depth-first, following start_cursor at every level"""
+    cursor = None
+    while True:
+        params = {"page_size": 100}
+        if cursor:
+            params["start_cursor"] = cursor
+        data = await fetcher.get_json(
+            f"{api_base}/blocks/{block_id}/children", params=params, headers=_notion_headers(token)
+        )
+        for block in data.get("results", []):
+            yield block
+            if block.get("has_children"):
+                async for child in iter_notion_blocks(fetcher, token, block["id"], api_base):
+                    yield child
+        cursor = data.get("next_cursor")
+        if not data.get("has_more") or not cursor:
+            return
+
+
+async def iter_confluence_pages(
+    fetcher: AsyncFetcher,
+    base_url: str,
+    username: str,
+    api_token: str,
+    space_key: Optional[str] = None,
+    limit: int = 50,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Pages with their storage-format bodies, following the ``_links.next`` cursor"""
+    base_url = base_url.rstrip("/")
+    params: Optional[Dict[str, Any]] = {
+        "type": "page",
+        "limit": limit,
+        "expand": "body.storage,version,history",
+    }
+    if space_key:
+        params["spaceKey"] = space_key
+    url = f"{base_url}/rest/api/content"
+    while url:
+        data = await fetcher.get_json(url, params=params, auth=(username, api_token))
+        for page in data.get("results", []):
+            yield page
+        next_link = data.get("_links", {}).get("next")
+        # The next link already carries the query string (including the cursor)
+        url = urljoin(data.get("_links", {}).get("base", base_url) + "/", next_link.lstrip("/")) if next_link else None
+        params = None
+
+
+connector_fetcher: Optional[AsyncFetcher] = None
+
+
+def get_connector_fetcher() -> AsyncFetcher:
+    """Process-wide fetcher, created inside the running event loop"""
+    global connector_fetcher
+    if connector_fetcher is None:
+        connector_fetcher = AsyncFetcher(
+            per_host_concurrency=settings.CONNECTOR_PER_HOST_CONCURRENCY,
+            rate_limits={"api.notion.com": settings.NOTION_REQUESTS_PER_SECOND},
+            default_rate=settings.CONNECTOR_REQUESTS_PER_SECOND,
+        )
+    return connector_fetcher
@@ -0,0 +1,174 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from core.config import settings
+from core.metrics import registry
+from models.docs import IndexingStatus
+
+# Called with its job, so it can report documents and errors while it runs
+IndexingWork = Callable[["IndexingJob"], Awaitable[Optional[List[str]]]]
+
+ACTIVE_STATES = ("queued", "running")
+
+
+class JobLimitError(Exception):
+    """Raised when a job cannot be accepted because a limit was reached"""
+
+
+@dataclass
+class IndexingJob:
+    id: str
+    user_id: str
+    source_type: str
+    work: IndexingWork
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    document_ids: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    task: Optional[asyncio.Task] = None
+    cancel_requested: bool = False
+
+    def to_status(self) -> IndexingStatus:
+        throughput = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+            if elapsed > 0:
+                throughput = round(len(self.document_ids) / elapsed, 3)
+        return IndexingStatus(
+            job_id=self.id,
+            source_type=self.source_type,
+            status=self.status,
+            documents_processed=len(self.document_ids),
+            document_ids=self.document_ids,
+            errors=self.errors or None,
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            throughput=throughput,
+        )
+
+
+class IndexingJobManager:
+    """Runs indexing jobs on a bounded pool of asyncio workers"""
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_jobs_per_user: int = 2,
+        max_queued_jobs: int = 100,
+        max_finished_jobs: int = 500,
+    ):
+        self.max_workers = max_workers
+        self.max_jobs_per_user = max_jobs_per_user
+        self.max_queued_jobs = max_queued_jobs
+        self.max_finished_jobs = max_finished_jobs
+        self._jobs: "OrderedDict[str, IndexingJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    def submit(self, user_id: str, source_type: str, work: IndexingWork) -> IndexingJob:
+        """Queue an indexing coroutine factory and return its job"""
+        active = [job for job in self._jobs.values() if job.status in ACTIVE_STATES]
+        if len(active) >= self.max_queued_jobs:
+            raise JobLimitError("Indexing queue is full, try again later")
+        if sum(1 for job in active if job.user_id == user_id) >= self.max_jobs_per_user:
+            raise JobLimitError(
+                f"At most {self.max_jobs_per_user} indexing jobs may be active per user"
+            )
+        self._ensure_workers()
+        job = IndexingJob(id=str(uuid.uuid4()), user_id=user_id, source_type=source_type, work=work)
+        self._jobs[job.id] = job
+        self._queue.put_nowait(job)
+        self._prune()
+        return job
+
+    def get(self, job_id: str, user_id: Optional[str] = None) -> Optional[IndexingJob]:
+        """The job, or None if it doesn't exist or (with ``user_id``) belongs to someone else"""
+        job = self._jobs.get(job_id)
+        if job is None or (user_id is not None and job.user_id != user_id):
+            return None
+        return job
+
+    def cancel(self, job_id: str, user_id: Optional[str] = None) -> Optional[IndexingJob]:
+        """Cancel a queued or running job; finished jobs are returned unchanged"""
+        job = self.get(job_id, user_id)
+        if job is None or job.status not in ACTIVE_STATES:
+            return job
+        job.cancel_requested = True
+        if job.task is not None:
+            job.task.cancel()
+        else:
+            self._finish(job, "cancelled")
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        counts["workers"] = len(self._workers)
+        return counts
+
+    async def shutdown(self) -> None:
+        for job in list(self._jobs.values()):
+            self.cancel(job.id)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    def _ensure_workers(self) -> None:
+        # Created lazily so the queue binds to the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        while len(self._workers) < self.max_workers:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status != "queued":
+                    continue
+                job.status = "running"
+                job.started_at = time.time()
+                job.task = asyncio.create_task(job.work(job))
+                try:
+                    document_ids = await job.task
+                    if document_ids is not None:
+                        job.document_ids = list(document_ids)
+                    self._finish(job, "completed")
+                except asyncio.CancelledError:
+                    self._finish(job, "cancelled")
+                    if not job.cancel_requested:
+                        # The worker itself is being shut down
+                        raise
+                except Exception as e:
+                    job.errors.append(str(e))
+                    self._finish(job, "failed")
+            finally:
+                job.task = None
+                self._queue.task_done()
+
+    def _finish(self, job: IndexingJob, status: str) -> None:
+        job.status = status
+        job.finished_at = time.time()
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.status not in ACTIVE_STATES]
+        for job_id in finished[: max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
+
+
+indexing_jobs = IndexingJobManager(
+    max_workers=settings.INDEXING_WORKERS,
+    max_jobs_per_user=settings.INDEXING_MAX_JOBS_PER_USER,
+    max_queued_jobs=settings.INDEXING_MAX_QUEUED_JOBS,
+)
+registry.register_gauges("rag_indexing_jobs", "Background indexing jobs by state", indexing_jobs.stats)
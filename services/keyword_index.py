@@ -0,0 +1,205 @@
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.config import settings
+from core.metrics import span
+
+# Keeps ticket ids, codenames and dotted/underscored identifiers intact
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_.:/][a-z0-9]+)*")
+_PART = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms; compound tokens like ``inc-4211`` also emit their parts"""
+    terms = []
+    for match in _TOKEN.finditer(text.lower()):
+        token = match.group()
+        terms.append(token)
+        parts = _PART.findall(token)
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+class KeywordIndex:
+    """BM25 inverted index over chunks, with postings held in compact arrays.
+
+    Each term maps to two parallel arrays: chunk slots (uint32) and term
+    frequencies (uint16). Updates append postings and tombstone replaced or
+    deleted chunks; the index is compacted once tombstones pass a threshold.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._reset()
+        if path:
+            self.load()
+
+    def _reset(self) -> None:
+        self._chunk_ids: List[str] = []
+        self._slots: Dict[str, int] = {}
+        self._lengths = array("I")
+        self._alive = array("B")
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._total_length = 0
+        self._live_count = 0
+
+    def __len__(self) -> int:
+        return self._live_count
+
+    def add(self, chunk_ids: Sequence[str], texts: Sequence[str]) -> None:
+        """Index chunks, replacing any existing chunk with the same id"""
+        with self._lock:
+            self._tombstone(chunk_ids)
+            for chunk_id, text in zip(chunk_ids, texts):
+                terms = Counter(tokenize(text))
+                slot = len(self._chunk_ids)
+                self._chunk_ids.append(chunk_id)
+                self._slots[chunk_id] = slot
+                length = sum(terms.values())
+                self._lengths.append(length)
+                self._alive.append(1)
+                self._total_length += length
+                self._live_count += 1
+                for term, tf in terms.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = (array("I"), array("H"))
+                    postings[0].append(slot)
+                    postings[1].append(min(tf, 65535))
+            self._maybe_compact()
+
+    def remove(self, chunk_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._tombstone(chunk_ids)
+            self._maybe_compact()
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Top-k chunk ids by BM25 score"""
+        terms = set(tokenize(query))
+        with span("keyword_search"), self._lock:
+            if not terms or not self._live_count:
+                return []
+            lengths = np.frombuffer(self._lengths, dtype=np.uint32).astype(np.float32)
+            alive = np.frombuffer(self._alive, dtype=np.uint8)
+            avg_length = self._total_length / self._live_count
+            norm = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+            scores = np.zeros(len(self._chunk_ids), dtype=np.float32)
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                slots = np.frombuffer(postings[0], dtype=np.uint32)
+                tfs = np.frombuffer(postings[1], dtype=np.uint16).astype(np.float32)
+                df = int(alive[slots].sum())
+                if not df:
+                    continue
+                idf = math.log(1 + (self._live_count - df + 0.5) / (df + 0.5))
+                scores[slots] += idf * tfs * (self.k1 + 1) / (tfs + norm[slots])
+            scores *= alive
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self._chunk_ids[i], float(scores[i])) for i in top if scores[i] > 0]
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            self._compact()
+            terms = list(self._postings)
+            offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            for i, term in enumerate(terms):
+                offsets[i + 1] = offsets[i] + len(self._postings[term][0])
+            slots = np.concatenate([np.frombuffer(self._postings[t][0], dtype=np.uint32) for t in terms]) if terms else np.zeros(0, np.uint32)
+            tfs = np.concatenate([np.frombuffer(self._postings[t][1], dtype=np.uint16) for t in terms]) if terms else np.zeros(0, np.uint16)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(f"{self.path}.json.tmp", "w", encoding="utf-8") as f:
+                json.dump({"chunk_ids": self._chunk_ids, "terms": terms}, f, separators=(",", ":"))
+            with open(f"{self.path}.npz.tmp", "wb") as f:
+                np.savez(f, offsets=offsets, slots=slots, tfs=tfs,
+                         lengths=np.frombuffer(self._lengths, dtype=np.uint32))
+            os.replace(f"{self.path}.npz.tmp", f"{self.path}.npz")
+            os.replace(f"{self.path}.json.tmp", f"{self.path}.json")
+
+    def load(self) -> None:
+        if not (os.path.exists(f"{self.path}.json") and os.path.exists(f"{self.path}.npz")):
+            return
+        with open(f"{self.path}.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        data = np.load(f"{self.path}.npz")
+        offsets, slots, tfs = data["offsets"], data["slots"], data["tfs"]
+        with self._lock:
+            self._reset()
+            self._chunk_ids = meta["chunk_ids"]
+            self._slots = {chunk_id: i for i, chunk_id in enumerate(self._chunk_ids)}
+            self._lengths = array("I", data["lengths"].astype(np.uint32).tobytes())
+            self._alive = array("B", bytes([1]) * len(self._chunk_ids))
+            self._total_length = int(data["lengths"].sum())
+            self._live_count = len(self._chunk_ids)
+            for i, term in enumerate(meta["terms"]):
+                start, end = offsets[i], offsets[i + 1]
+                self._postings[term] = (array("I", slots[start:end].tobytes()), array("H", tfs[start:end].tobytes()))
+
+    def _tombstone(self, chunk_ids: Iterable[str]) -> None:
+        for chunk_id in chunk_ids:
+            slot = self._slots.pop(chunk_id, None)
+            if slot is not None and self._alive[slot]:
+                self._alive[slot] = 0
+                self._total_length -= self._lengths[slot]
+                self._live_count -= 1
+
+    def _maybe_compact(self) -> None:
+        dead = len(self._chunk_ids) - self._live_count
+        if dead > 1000 and dead > len(self._chunk_ids) // 5:
+            self._compact()
+
+    def _compact(self) -> None:
+        if self._live_count == len(self._chunk_ids):
+            return
+        alive = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+        remap = np.cumsum(alive, dtype=np.uint32) - 1
+        chunk_ids = [chunk_id for chunk_id, keep in zip(self._chunk_ids, alive) if keep]
+        lengths = array("I", np.frombuffer(self._lengths, dtype=np.uint32)[alive].tobytes())
+        postings = {}
+        for term, (slots, tfs) in self._postings.items():
+            slots = np.frombuffer(slots, dtype=np.uint32)
+            keep = alive[slots]
+            if keep.any():
+                postings[term] = (
+                    array("I", remap[slots[keep]].tobytes()),
+                    array("H", np.frombuffer(tfs, dtype=np.uint16)[keep].tobytes()),
+                )
+        self._chunk_ids = chunk_ids
+        self._slots = {chunk_id: i for i, chunk_id in enumerate(chunk_ids)}
+        self._lengths = lengths
+        self._alive = array("B", bytes([1]) * len(chunk_ids))
+        self._postings = postings
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[str]],
+    k: int = 60,
+    weights: Optional[Sequence[float]] = None,
+) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists (e.g. vector and BM25 results) by reciprocal rank"""
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + weight / (k + rank + 1)
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
+
+
+keyword_index = KeywordIndex(os.path.join(settings.CHROMA_PERSIST_DIRECTORY, "keyword_index"))
@@ -0,0 +1,50 @@
+from typing import Any, AsyncIterator, Dict, List, Optional, Protocol
+
+from core.config import settings
+
+ChatMessage = Dict[str, str]
+
+
+class ChatModel(Protocol):
+    """Anything that streams a chat completion as text pieces"""
+
+    def astream(self, messages: List[ChatMessage], max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        ...
+
+
+class OpenAIChatModel:
+    """Streaming chat completions from OpenAI; the SDK is imported on first use"""
+
+    def __init__(
+        self,
+        model: str = settings.OPENAI_MODEL,
+        api_key: Optional[str] = settings.OPENAI_API_KEY,
+        timeout: float = 60,
+    ):
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+        self._client: Any = None
+
+    async def astream(self, messages: List[ChatMessage], max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        stream = await self._get_client().chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    def _get_client(self) -> Any:
+        if self._client is None:
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI(api_key=self.api_key, timeout=self.timeout)
+        return self._client
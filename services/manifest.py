@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.config import settings
+
+MANIFEST_VERSION = 1
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(source_type: str, source_id: str, chunk_hash: str) -> str:
+    """Deterministic chunk id, so re-upserting identical text is a no-op"""
+    return f"{source_type}:{source_id}:{chunk_hash[:24]}"
+
+
+@dataclass
+class ChunkPlan:
+    """What has to change in the vector store for one document"""
+    unchanged: bool
+    to_embed: Dict[str, str] = field(default_factory=dict)  # chunk id -> text
+    to_keep: List[str] = field(default_factory=list)
+    to_delete: List[str] = field(default_factory=list)
+
+
+class IndexManifest:
+    """Tracks what has been indexed per (source_type, source_id).
+
+    Each entry records the document content hash, the source's ``last_updated``
+    value and a ``chunk hash -> chunk id`` map, which lets re-indexing skip
+    unchanged documents, embed only new chunks and delete stale ones.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        self._load()
+
+    @staticmethod
+    def _key(source_type: str, source_id: str) -> str:
+        return f"{getattr(source_type, 'value', source_type)}:{source_id}"
+
+    def needs_fetch(self, source_type: str, source_id: str, last_updated: Optional[str]) -> bool:
+        """False when the source reports the same last_updated as the indexed copy"""
+        entry = self._entries.get(self._key(source_type, source_id))
+        if entry is None or last_updated is None:
+            return True
+        return entry.get("last_updated") != last_updated
+
+    def plan(
+        self,
+        source_type: str,
+        source_id: str,
+        content: str,
+        chunks: Iterable[str],
+    ) -> ChunkPlan:
+        """Diff a freshly chunked document against the manifest"""
+        source_type = getattr(source_type, "value", source_type)
+        entry = self._entries.get(self._key(source_type, source_id))
+        previous: Dict[str, str] = entry["chunks"] if entry else {}
+        if entry and entry["content_hash"] == content_hash(content):
+            return ChunkPlan(unchanged=True, to_keep=list(previous.values()))
+
+        plan = ChunkPlan(unchanged=False)
+        current_hashes = set()
+        for text in chunks:
+            digest = content_hash(text)
+            if digest in current_hashes:
+                continue
+            current_hashes.add(digest)
+            if digest in previous:
+                plan.to_keep.append(previous[digest])
+            else:
+                plan.to_embed[chunk_id(source_type, source_id, digest)] = text
+        plan.to_delete = [cid for digest, cid in previous.items() if digest not in current_hashes]
+        return plan
+
+    def record(
+        self,
+        source_type: str,
+        source_id: str,
+        content: str,
+        chunks: Iterable[str],
+        last_updated: Optional[str] = None,
+    ) -> None:
+        """Record a document after its chunks have been written to the vector store"""
+        source_type = getattr(source_type, "value", source_type)
+        chunk_map = {}
+        for text in chunks:
+            digest = content_hash(text)
+            chunk_map[digest] = chunk_id(source_type, source_id, digest)
+        with self._lock:
+            self._entries[self._key(source_type, source_id)] = {
+                "content_hash": content_hash(content),
+                "last_updated": last_updated,
+                "chunks": chunk_map,
+            }
+
+    def removed_sources(self, source_type: str, seen_source_ids: Iterable[str]) -> List[Tuple[str, List[str]]]:
+        """Indexed sources of ``source_type`` missing from a full crawl, with their chunk ids"""
+        source_type = getattr(source_type, "value", source_type)
+        prefix = f"{source_type}:"
+        seen = {self._key(source_type, source_id) for source_id in seen_source_ids}
+        return [
+            (key[len(prefix):], list(entry["chunks"].values()))
+            for key, entry in self._entries.items()
+            if key.startswith(prefix) and key not in seen
+        ]
+
+    def forget(self, source_type: str, source_id: str) -> List[str]:
+        """Remove a source from the manifest and return its chunk ids"""
+        with self._lock:
+            entry = self._entries.pop(self._key(source_type, source_id), None)
+        return list(entry["chunks"].values()) if entry else []
+
+    def save(self) -> None:
+        with self._lock:
+            data = {"version": MANIFEST_VERSION, "entries": self._entries}
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") == MANIFEST_VERSION:
+            self._entries = data.get("entries", {})
+
+
+index_manifest = IndexManifest(os.path.join(settings.CHROMA_PERSIST_DIRECTORY, "manifest.json"))
@@ -0,0 +1,367 @@
+import asyncio
+import contextvars
+import inspect
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, AsyncIterable, Callable, Dict, List, Optional, Tuple
+
+from models.docs import Document
+from services.cache import SemanticCache
+from services.chunking import TextChunker
+from services.embeddings import EmbeddingEngine, embedding_engine
+from services.filters import chunk_metadata
+from services.keyword_index import KeywordIndex
+from services.manifest import IndexManifest, chunk_id, content_hash
+
+_END = object()
+
+
+@dataclass
+class Stage:
+    """One pipeline step.
+
+    ``fn`` takes an item (or a list of up to ``batch_size`` items) and returns a
+    result; with ``flatten`` it returns an iterable whose elements are passed
+    on individually, and ``None`` drops the item. Coroutine functions run on
+    the event loop; plain functions run in a thread pool, or a process pool
+    with ``executor="process"`` (``fn`` must then be picklable).
+    """
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int = 1
+    batch_size: int = 1
+    flatten: bool = False
+    executor: str = "thread"  # or "process"
+    queue_size: int = 64
+
+
+@dataclass
+class StageMetrics:
+    items_in: int = 0
+    items_out: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+    max_queue_depth: int = 0
+    queue_depth: int = 0
+    recent_errors: List[str] = field(default_factory=list)
+
+    def as_dict(self, elapsed: float) -> Dict[str, Any]:
+        return {
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "errors": self.errors,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "throughput_per_sec": round(self.items_in / elapsed, 2) if elapsed else 0.0,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "recent_errors": self.recent_errors,
+        }
+
+
+class IngestionPipeline:
+    """Runs stages concurrently with bounded queues between them.
+
+    Each stage reads from a queue of ``queue_size`` entries, so a slow stage
+    (usually embedding) applies backpressure all the way to the fetcher and
+    memory stays bounded regardless of corpus size, while I/O and CPU stages
+    overlap. Failed items are counted per stage and skipped.
+    """
+
+    def __init__(self, stages: List[Stage], max_recent_errors: int = 20):
+        self.stages = stages
+        self.max_recent_errors = max_recent_errors
+        self.metrics = {stage.name: StageMetrics() for stage in stages}
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+        self._executors: Dict[str, Executor] = {}
+
+    async def run(self, source: AsyncIterable[Any]) -> Dict[str, Any]:
+        self._started = time.perf_counter()
+        queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        queues.append(asyncio.Queue(maxsize=1))  # drained by the sink below
+        tasks = []
+        for i, stage in enumerate(self.stages):
+            remaining = [stage.workers]
+            for _ in range(stage.workers):
+                tasks.append(asyncio.create_task(self._worker(stage, queues[i], queues[i + 1], remaining)))
+        tasks.append(asyncio.create_task(self._sink(queues[-1])))
+        try:
+            async for item in source:
+                await queues[0].put(item)
+                self._observe_depth(self.stages[0], queues[0])
+            await queues[0].put(_END)
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            for executor in self._executors.values():
+                executor.shutdown(wait=False, cancel_futures=True)
+            self._executors.clear()
+            for metrics in self.metrics.values():
+                metrics.queue_depth = 0
+            self._finished = time.perf_counter()
+        return self.report()
+
+    def report(self) -> Dict[str, Any]:
+        end = self._finished or time.perf_counter()
+        elapsed = end - self._started if self._started else 0.0
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "stages": {name: metrics.as_dict(elapsed) for name, metrics in self.metrics.items()},
+        }
+
+    async def _worker(self, stage: Stage, inbox: asyncio.Queue, outbox: asyncio.Queue, remaining: List[int]) -> None:
+        metrics = self.metrics[stage.name]
+        done = False
+        while not done:
+            batch, done = await self._take(stage, inbox)
+            metrics.queue_depth = inbox.qsize()
+            if not batch:
+                continue
+            metrics.items_in += len(batch)
+            started = time.perf_counter()
+            try:
+                result = await self._call(stage, batch if stage.batch_size > 1 else batch[0])
+            except Exception as e:
+                metrics.errors += len(batch)
+                if len(metrics.recent_errors) < self.max_recent_errors:
+                    metrics.recent_errors.append(f"{type(e).__name__}: {e}")
+                continue
+            finally:
+                metrics.busy_seconds += time.perf_counter() - started
+            if result is None:
+                continue
+            for item in (result if stage.flatten else [result]):
+                await outbox.put(item)
+                metrics.items_out += 1
+                next_index = self.stages.index(stage) + 1
+                if next_index < len(self.stages):
+                    self._observe_depth(self.stages[next_index], outbox)
+        remaining[0] -= 1
+        if remaining[0] == 0:
+            await outbox.put(_END)
+
+    async def _take(self, stage: Stage, inbox: asyncio.Queue) -> Tuple[List[Any], bool]:
+        """Wait for one item, then top the batch up with whatever is already queued"""
+        item = await inbox.get()
+        if item is _END:
+            await inbox.put(_END)  # let sibling workers see it too
+            return [], True
+        batch = [item]
+        while len(batch) < stage.batch_size:
+            try:
+                item = inbox.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if item is _END:
+                await inbox.put(_END)
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _call(self, stage: Stage, arg: Any) -> Any:
+        if inspect.iscoroutinefunction(stage.fn):
+            return await stage.fn(arg)
+        loop = asyncio.get_running_loop()
+        if stage.executor == "process":
+            return await loop.run_in_executor(self._executor(stage), stage.fn, arg)
+        # Threads don't inherit context variables, so spans inside the stage would lose the request
+        return await loop.run_in_executor(self._executor(stage), contextvars.copy_context().run, stage.fn, arg)
+
+    def _executor(self, stage: Stage) -> Executor:
+        executor = self._executors.get(stage.name)
+        if executor is None:
+            if stage.executor == "process":
+                executor = ProcessPoolExecutor(max_workers=stage.workers)
+            else:
+                executor = ThreadPoolExecutor(max_workers=stage.workers, thread_name_prefix=f"ingest-{stage.name}")
+            self._executors[stage.name] = executor
+        return executor
+
+    def _observe_depth(self, stage: Stage, queue: asyncio.Queue) -> None:
+        metrics = self.metrics[stage.name]
+        metrics.queue_depth = queue.qsize()
+        metrics.max_queue_depth = max(metrics.max_queue_depth, metrics.queue_depth)
+
+    @staticmethod
+    async def _sink(queue: asyncio.Queue) -> None:
+        while await queue.get() is not _END:
+            pass
+
+
+class ManifestRecorder:
+    """Finishes documents once all of their new chunks are written.
+
+    A document's chunks can be spread over several upsert batches, so the
+    chunk stage registers how many to expect and the upsert stage counts them
+    down. When the last one lands, chunks the new version no longer has are
+    deleted, answers citing the document are dropped from the cache (again:
+    one may have been cached between batches), the document is recorded in
+    the manifest (if there is one) and ``on_finish`` is called with it. Documents that fail part-way are never
+    recorded and get re-indexed on the next run.
+    """
+
+    def __init__(
+        self,
+        manifest: Optional[IndexManifest],
+        collection: Any,
+        keyword_index: Optional[KeywordIndex] = None,
+        on_finish: Optional[Callable[[Document], None]] = None,
+        answer_cache: Optional[SemanticCache] = None,
+    ):
+        self.manifest = manifest
+        self.collection = collection
+        self.keyword_index = keyword_index
+        self.answer_cache = answer_cache
+        self.on_finish = on_finish
+        self._pending: Dict[Tuple[str, str], List[Any]] = {}  # -> [chunks left, document, texts, stale ids]
+        self._lock = threading.Lock()
+
+    def expect(self, document: Document, texts: List[str], count: int, to_delete: List[str]) -> None:
+        if count == 0:
+            self._finish(document, texts, to_delete)
+            return
+        with self._lock:
+            self._pending[_source_key(document)] = [count, document, texts, to_delete]
+
+    def written(self, metadatas: List[Dict[str, Any]]) -> None:
+        completed = []
+        with self._lock:
+            for metadata in metadatas:
+                key = (metadata["source_type"], metadata["source_id"])
+                entry = self._pending.get(key)
+                if entry is None:
+                    continue
+                entry[0] -= 1
+                if entry[0] == 0:
+                    completed.append(self._pending.pop(key))
+        for _, document, texts, to_delete in completed:
+            self._finish(document, texts, to_delete)
+
+    def unchanged(self, document: Document) -> None:
+        """A document the manifest already has in this version; nothing is written"""
+        if self.on_finish is not None:
+            self.on_finish(document)
+
+    def _finish(self, document: Document, texts: List[str], to_delete: List[str]) -> None:
+        if to_delete:
+            self.collection.delete(ids=to_delete)
+            if self.keyword_index is not None:
+                self.keyword_index.remove(to_delete)
+        source_type, source_id = _source_key(document)
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate_source(source_type, source_id)
+        if self.manifest is not None:
+            self.manifest.record(source_type, source_id, document.content, texts, document.metadata.last_updated)
+        if self.on_finish is not None:
+            self.on_finish(document)
+
+
+def _source_key(document: Document) -> Tuple[str, str]:
+    return document.metadata.source_type.value, document.metadata.source_id
+
+
+def _chunk_document(
+    chunker: TextChunker,
+    recorder: Optional[ManifestRecorder],
+    document: Document,
+) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """Chunks to embed for a document: all of them, or with a manifest only the new ones"""
+    source_type, source_id = _source_key(document)
+    texts = chunker.split_text(document.content)
+    plan = None
+    if recorder is not None and recorder.manifest is not None:
+        plan = recorder.manifest.plan(source_type, source_id, document.content, texts)
+        if plan.unchanged:
+            recorder.unchanged(document)
+            return []
+    chunks, seen = [], set()
+    for i, text in enumerate(texts):
+        digest = content_hash(text)
+        if digest in seen:
+            continue
+        seen.add(digest)
+        chunk = chunk_id(source_type, source_id, digest)
+        if plan is None or chunk in plan.to_embed:
+            metadata = chunk_metadata(document.metadata, doc_id=document.id, chunk_index=i)
+            chunks.append((chunk, text, metadata))
+    if recorder is not None:
+        recorder.expect(document, texts, len(chunks), plan.to_delete if plan is not None else [])
+    return chunks
+
+
+def _embed_chunks(engine: EmbeddingEngine, chunks: List[Tuple[str, str, Dict[str, Any]]]):
+    vectors = engine.embed([text for _, text, _ in chunks])
+    return chunks, vectors
+
+
+def _upsert_chunks(
+    collection: Any,
+    keyword_index: Optional[KeywordIndex],
+    answer_cache: Optional[SemanticCache],
+    recorder: Optional[ManifestRecorder],
+    batches,
+) -> int:
+    ids, texts, metadatas, vectors = [], [], [], []
+    for chunks, batch_vectors in batches:
+        for (chunk_id, text, metadata), vector in zip(chunks, batch_vectors):
+            ids.append(chunk_id)
+            texts.append(text)
+            metadatas.append(metadata)
+            vectors.append(vector)
+    collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+    if keyword_index is not None:
+        keyword_index.add(ids, texts)
+    if answer_cache is not None:
+        for source_type, source_id in {(m["source_type"], m["source_id"]) for m in metadatas}:
+            answer_cache.invalidate_source(source_type, source_id)
+    if recorder is not None:
+        recorder.written(metadatas)
+    return len(ids)
+
+
+def build_document_pipeline(
+    collection: Any,
+    parse: Callable[[Any], Optional[Document]],
+    fetch: Optional[Callable[[Any], Any]] = None,
+    chunker: Optional[TextChunker] = None,
+    engine: EmbeddingEngine = embedding_engine,
+    keyword_index: Optional[KeywordIndex] = None,
+    answer_cache: Optional[SemanticCache] = None,
+    manifest: Optional[IndexManifest] = None,
+    fetch_concurrency: int = 8,
+    embed_batch_size: int = 64,
+    upsert_batch_size: int = 8,
+    on_document: Optional[Callable[[Document], None]] = None,
+) -> IngestionPipeline:
+    """fetch -> parse -> chunk -> embed -> upsert for any connector.
+
+    ``fetch`` (usually async, e.g. loading a page's blocks) and ``parse`` (raw
+    payload to ``Document``) are connector specific. Chunks are embedded in
+    batches of ``embed_batch_size`` and written ``upsert_batch_size`` embed
+    batches at a time to Chroma and, if given, the keyword index. Cached
+    answers that cite a re-indexed document are dropped from ``answer_cache``.
+    Chunk ids are content hashes (``services.manifest.chunk_id``). With a
+    ``manifest`` the chunk stage follows its plan: unchanged documents are
+    skipped, only chunks that are new are embedded, and chunks that vanished
+    are deleted once the new ones are written (call ``manifest.save()``
+    after the run). ``on_document`` is called with each document once all of
+    its chunks are written, or straight away if it is unchanged.
+    """
+    chunker = chunker or TextChunker()
+    recorder = None
+    if manifest is not None or on_document is not None:
+        recorder = ManifestRecorder(manifest, collection, keyword_index, on_document, answer_cache)
+    stages = []
+    if fetch is not None:
+        stages.append(Stage("fetch", fetch, workers=fetch_concurrency, queue_size=fetch_concurrency * 2))
+    stages += [
+        Stage("parse", parse, workers=2),
+        Stage("chunk", partial(_chunk_document, chunker, recorder), workers=2, flatten=True),
+        Stage("embed", partial(_embed_chunks, engine), batch_size=embed_batch_size, queue_size=embed_batch_size * 4),
+        Stage("upsert", partial(_upsert_chunks, collection, keyword_index, answer_cache, recorder), batch_size=upsert_batch_size, queue_size=upsert_batch_size * 2),
+    ]
+    return IngestionPipeline(stages)
@@ -0,0 +1,465 @@
+import asyncio
+import threading
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Collection, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.admission import INTERACTIVE, PriorityGate, llm_gate
+from core.config import settings
+from core.metrics import record_tokens, span
+from models.auth import UserResponse
+from models.docs import DocumentMetadata, SourceType
+from models.rag import RAGRequest, RAGResponse, SearchResult
+from services.ann import collection_space, get_chroma_client, open_collection, similarity_from_distance
+from services.batching import query_embedder
+from services.cache import SemanticCache, answer_cache
+from services.context import ContextPacker, context_budget, context_packer, default_token_counter
+from services.conversation import CachedChunk, Conversation, ConversationStore, RetrievalPlan, conversation_store
+from services.embeddings import embedding_engine
+from services.filters import where_for_request
+from services.keyword_index import KeywordIndex, keyword_index, reciprocal_rank_fusion
+from services.rerank import CrossEncoderReranker, reranker
+from services.sharding import ShardHit, ShardRouter, tenants_for_user
+from services.llm import ChatMessage, ChatModel, OpenAIChatModel
+from services.streaming import RAGStreamEvent
+
+QueryEmbedder = Callable[[str], Awaitable[Sequence[float]]]
+BatchQueryEmbedder = Callable[[List[str]], Awaitable[Sequence[Sequence[float]]]]
+
+SYSTEM_PROMPT = (
+    "You answer questions about the company's internal documentation. "
+    "Use only the context below; if it does not contain the answer, say that you don't know. "
+    "Mention the titles of the documents you relied on."
+)
+
+_SOURCE_TYPES = {source_type.value for source_type in SourceType}
+
+
+def search_result(text: Optional[str], metadata: Dict[str, Any], score: float) -> SearchResult:
+    """SearchResult from stored chunk metadata, including chunks written by the LangChain indexer"""
+    source_type = metadata.get("source_type") or metadata.get("source")
+    return SearchResult(
+        text=text or "",
+        metadata=DocumentMetadata(
+            source_type=source_type if source_type in _SOURCE_TYPES else SourceType.unknown,
+            source_id=str(metadata.get("source_id") or metadata.get("doc_id") or ""),
+            title=str(metadata.get("title") or "Untitled"),
+            url=metadata.get("url") or None,
+            last_updated=metadata.get("last_updated") or None,
+            author=metadata.get("author") or None,
+        ),
+        score=min(1.0, max(0.0, score)),
+    )
+
+
+def format_context(results: Sequence[SearchResult]) -> str:
+    return "\n\n".join(f"[{i}] {result.metadata.title}\n{result.text}" for i, result in enumerate(results, 1))
+
+
+class RAGService:
+    """Retrieval-augmented answers over the shared Chroma collection.
+
+    ``stream_query`` yields the retrieved sources, the answer as it is
+    generated and a final metadata event (see ``services.streaming``);
+    ``query`` collects the same events into a ``RAGResponse``. Questions
+    close to one answered before are served from the semantic cache without
+    retrieval or generation. Retrieval fuses vector and BM25 keyword hits by
+    reciprocal rank, so exact ticket ids and error strings are found even
+    when their embeddings aren't close, and with a reranker the over-fetched
+    candidates are reordered by a cross-encoder before ``num_sources`` are
+    kept. The context packer then stitches overlapping chunks of a page
+    together, drops near-duplicates and fits the rest into the token
+    budget; the tokens saved are reported in ``metadata["context"]``.
+    Requests with a ``conversation_id`` continue a server-side conversation
+    instead: still-relevant chunks from earlier turns are reused and the
+    history is sent along. With a shard router, signed-in users' searches
+    are scattered over their tenant shards in parallel and merged into one
+    top-k, and cached answers are only reused within the same shards.
+    Only the LLM call holds a slot of the admission
+    gate, so retrieval never queues behind generation. The collection, chat model, query embedder, keyword
+    index, reranker and packer can be injected, which is how the tests and
+    benchmarks run without Chroma files, models or an API key.
+    """
+
+    def __init__(
+        self,
+        collection: Any = None,
+        llm: Optional[ChatModel] = None,
+        embed_query: Optional[QueryEmbedder] = None,
+        embed_queries: Optional[BatchQueryEmbedder] = None,
+        gate: PriorityGate = llm_gate,
+        cache: Optional[SemanticCache] = answer_cache,
+        conversations: Optional[ConversationStore] = conversation_store,
+        keyword_index: Optional[KeywordIndex] = keyword_index,
+        reranker: Optional[CrossEncoderReranker] = reranker,
+        packer: Optional[ContextPacker] = context_packer,
+        shards: Optional[ShardRouter] = None,
+    ):
+        self._collection = collection
+        self._collection_lock = threading.Lock()
+        self.llm = llm or OpenAIChatModel()
+        self.embed_query = embed_query or query_embedder.embed
+        # An injected single-question embedder is not paired with the default batch one
+        self.embed_queries = embed_queries or (query_embedder.embed_many if embed_query is None else None)
+        self.gate = gate
+        self.cache = cache
+        self.conversations = conversations
+        self.keyword_index = keyword_index
+        self.reranker = reranker
+        self.packer = packer
+        self.shards = shards
+
+    @property
+    def collection(self) -> Any:
+        if self._collection is None:
+            with self._collection_lock:
+                if self._collection is None:
+                    self._collection = open_collection(get_chroma_client(), settings.CHROMA_COLLECTION_NAME)
+        return self._collection
+
+    def warm_up(self) -> None:
+        """Open the collection and load the embedding and reranking models before the first query"""
+        self.collection.count()
+        embedding_engine.dimension
+        if self.reranker is not None:
+            self.reranker.warm_up()
+
+    async def query(
+        self,
+        request: RAGRequest,
+        user: Optional[UserResponse] = None,
+        priority: int = INTERACTIVE,
+        vector: Optional[Sequence[float]] = None,
+    ) -> RAGResponse:
+        """Answer one question; pass ``vector`` when the question was already embedded (see ``embed_questions``)"""
+        sources: List[SearchResult] = []
+        parts: List[str] = []
+        metadata: Dict[str, Any] = {}
+        context = None
+        async with aclosing(self._answer(request, user, priority, vector)) as events:
+            async for event, data in events:
+                if event == "sources":
+                    sources = data
+                elif event == "context":
+                    context = data
+                elif event == "token":
+                    parts.append(data)
+                elif event == "metadata":
+                    metadata = data
+        return RAGResponse(answer="".join(parts), sources=sources, context_used=context, metadata=metadata)
+
+    async def stream_query(
+        self,
+        request: RAGRequest,
+        user: Optional[UserResponse] = None,
+        priority: int = INTERACTIVE,
+    ) -> AsyncIterator[RAGStreamEvent]:
+        """Sources, answer text and metadata events; raises OverloadedError if no generation slot frees up"""
+        # Closing this generator must close the inner one too, which hands back the generation slot
+        async with aclosing(self._answer(request, user, priority)) as events:
+            async for event, data in events:
+                if event != "context":
+                    yield event, data
+
+    async def embed_questions(self, questions: Sequence[str]) -> List[Sequence[float]]:
+        """Embed many questions in one batched call, e.g. for the items of a batch request"""
+        if self.embed_queries is not None:
+            return list(await self.embed_queries(list(questions)))
+        return list(await asyncio.gather(*(self.embed_query(question) for question in questions)))
+
+    async def similar_questions(
+        self,
+        question: str,
+        k: int = 5,
+        user: Optional[UserResponse] = None,
+    ) -> List[SearchResult]:
+        vector = await self.embed_query(question)
+        chunks = await self._search(vector, k, question, tenants=self._tenants(user))
+        return [chunk.result for chunk in chunks]
+
+    def get_stats(self) -> Dict[str, Any]:
+        collection = self.collection
+        return {
+            "collection": collection.name,
+            "total_chunks": collection.count(),
+            "distance": collection_space(collection),
+            "keyword_chunks": len(self.keyword_index) if self.keyword_index is not None else None,
+            "model": getattr(self.llm, "model", None),
+            "answer_cache": self.cache.stats() if self.cache is not None else None,
+            "query_embedder": query_embedder.stats(),
+            "reranker": self.reranker.stats() if self.reranker is not None else None,
+            "shards": self.shards.stats() if self.shards is not None else None,
+        }
+
+    async def _answer(
+        self,
+        request: RAGRequest,
+        user: Optional[UserResponse],
+        priority: int,
+        vector: Optional[Sequence[float]] = None,
+    ) -> AsyncIterator[RAGStreamEvent]:
+        if vector is None:
+            vector = await self.embed_query(request.question)
+        tenants = self._tenants(user)
+        scope = ",".join(tenants or ())
+        conversation = None
+        if request.conversation_id and self.conversations is not None:
+            conversation = await self.conversations.aget_or_start(request.conversation_id, user.id if user else None)
+        # Follow-ups depend on the conversation's history, so they bypass the answer cache
+        cache = self.cache if conversation is None else None
+        if cache is not None:
+            cached = cache.get(vector, request, scope)
+            if cached is not None:
+                yield "sources", cached.sources
+                yield "context", cached.context_used
+                yield "token", cached.answer
+                yield "metadata", cached.metadata
+                return
+
+        with span("retrieve"):
+            chunks, sources, context, retrieval = await self._retrieve(request, vector, conversation, tenants)
+        yield "sources", sources
+        yield "context", context
+
+        parts: List[str] = []
+        messages = self._messages(request, context, conversation)
+        async with self.gate.slot(priority):
+            with span("generate"):
+                async for token in self.llm.astream(messages, request.max_tokens, request.temperature):
+                    parts.append(token)
+                    yield "token", token
+        answer = "".join(parts)
+        count_tokens = self.packer.count_tokens if self.packer is not None else default_token_counter()
+        record_tokens(sum(count_tokens(message["content"]) for message in messages), count_tokens(answer))
+        metadata = {
+            "model": getattr(self.llm, "model", None),
+            "num_sources": len(sources),
+            "chunks_streamed": len(parts),
+            **retrieval,
+        }
+        if conversation is not None:
+            await self.conversations.arecord_turn(conversation, request.question, answer, chunks, context)
+            metadata["conversation_id"] = conversation.id
+        elif cache is not None:
+            # Only answers that were generated to the end are cached
+            response = RAGResponse(answer=answer, sources=sources, context_used=context, metadata=metadata)
+            cache.put(vector, request, response, scope)
+        yield "metadata", metadata
+
+    async def _retrieve(
+        self,
+        request: RAGRequest,
+        vector: Sequence[float],
+        conversation: Optional[Conversation],
+        tenants: Optional[List[str]] = None,
+    ) -> Tuple[List[CachedChunk], List[SearchResult], str, Dict[str, Any]]:
+        """Chunks for the question, the sources and context sent to the LLM, and metadata for the response"""
+        where = where_for_request(request)
+        if conversation is None:
+            chunks, retrieval = await self._candidates(request, vector, request.num_sources, where, tenants=tenants)
+            sources, context, packing = await asyncio.to_thread(self._pack, request, chunks)
+            return chunks, sources, context, {**retrieval, **packing}
+        plan = self.conversations.plan_retrieval(conversation, vector, request.num_sources)
+        if request.source_types:
+            # Earlier turns may have searched other sources
+            kept = [chunk for chunk in plan.reused if chunk.result.metadata.source_type in request.source_types]
+            plan = RetrievalPlan(kept, plan.fetch_k + len(plan.reused) - len(kept))
+        fetched: List[CachedChunk] = []
+        retrieval: Dict[str, Any] = {}
+        if plan.fetch_k:
+            reused_ids = {chunk.id for chunk in plan.reused}
+            fetched, retrieval = await self._candidates(request, vector, plan.fetch_k, where, reused_ids, tenants)
+        chunks = self.conversations.merge_chunks(plan, fetched)[:request.num_sources]
+        # Chunks seen in earlier turns keep their order, so an unchanged set reuses the packed prefix
+        position = {chunk.id: i for i, chunk in enumerate(conversation.chunks)}
+        chunks.sort(key=lambda chunk: position.get(chunk.id, len(position)))
+        context = self.conversations.cached_prefix(conversation, chunks)
+        if context is None:
+            sources, context, packing = await asyncio.to_thread(self._pack, request, chunks)
+        else:
+            sources, packing = [chunk.result for chunk in chunks], {"context": {"prefix_reused": True}}
+        return chunks, sources, context, {**retrieval, **packing, "reused_chunks": len(plan.reused)}
+
+    def _pack(
+        self,
+        request: RAGRequest,
+        chunks: Sequence[CachedChunk],
+    ) -> Tuple[List[SearchResult], str, Dict[str, Any]]:
+        results = [chunk.result for chunk in chunks]
+        if self.packer is None:
+            return results, format_context(results), {}
+        packed = self.packer.pack(results, context_budget(request))
+        return packed.sources, packed.text, {"context": packed.metadata()}
+
+    async def _candidates(
+        self,
+        request: RAGRequest,
+        vector: Sequence[float],
+        k: int,
+        where: Optional[Dict[str, Any]],
+        exclude: Collection[str] = (),
+        tenants: Optional[List[str]] = None,
+    ) -> Tuple[List[CachedChunk], Dict[str, Any]]:
+        """The k best new chunks; with a reranker, RERANK_CANDIDATES are fetched and reordered first"""
+        fetch_k = max(k, settings.RERANK_CANDIDATES) if self.reranker is not None else k
+        # Excluded chunks can come back from the search, so fetch enough to fill k without them
+        chunks = await self._search(vector, fetch_k + len(exclude), request.question, where, tenants)
+        chunks = [chunk for chunk in chunks if chunk.id not in exclude]
+        if self.reranker is None:
+            return chunks[:k], {}
+        texts = [chunk.result.text for chunk in chunks]
+        ranking, info = await asyncio.to_thread(self.reranker.rank, request.question, texts, k)
+        if ranking is None:
+            return chunks[:k], {"rerank": info}
+        reranked = [
+            CachedChunk(chunks[i].id, chunks[i].vector, chunks[i].result.model_copy(update={"score": score}))
+            for i, score in ranking
+        ]
+        return reranked, {"rerank": info}
+
+    def _messages(
+        self,
+        request: RAGRequest,
+        context: str,
+        conversation: Optional[Conversation] = None,
+    ) -> List[ChatMessage]:
+        # The context goes first and history after it, so the prompt prefix stays stable across turns
+        system = f"{SYSTEM_PROMPT}\n\nContext:\n{context or '(no matching documents)'}"
+        if request.context:
+            system += f"\n\nAdditional context from the user:\n{request.context}"
+        messages: List[ChatMessage] = [{"role": "system", "content": system}]
+        if conversation is not None:
+            messages += conversation.history_messages()
+        messages.append({"role": "user", "content": request.question})
+        return messages
+
+    def _tenants(self, user: Optional[UserResponse]) -> Optional[List[str]]:
+        """Shards to search for a signed-in user; None searches the shared collection"""
+        if self.shards is None or user is None:
+            return None
+        return tenants_for_user(user)
+
+    async def _search(
+        self,
+        vector: Sequence[float],
+        k: int,
+        question: Optional[str] = None,
+        where: Optional[Dict[str, Any]] = None,
+        tenants: Optional[List[str]] = None,
+    ) -> List[CachedChunk]:
+        """Top-k chunks for the question, fusing vector and BM25 ranks when there is a keyword index.
+
+        ``where`` (see ``services.filters``) is applied inside the vector
+        search, so a filtered request still gets its full k results; keyword
+        hits outside the filter are dropped when their chunks are loaded.
+        With ``tenants`` both searches are scattered over their shards, each
+        with its own keyword index, so other tenants' chunks neither surface
+        nor crowd out the caller's keyword hits.
+        """
+        hybrid = question is not None and self.keyword_index is not None
+        if hybrid and not tenants:
+            hybrid = len(self.keyword_index) > 0
+        fetch_k = max(k, settings.HYBRID_CANDIDATES) if hybrid else k
+        if tenants:
+            chunks = _shard_chunks(await self.shards.asearch(vector, tenants, fetch_k, where))
+        else:
+            chunks = await asyncio.to_thread(self._vector_search, vector, fetch_k, where)
+        if not hybrid:
+            return chunks
+        return await asyncio.to_thread(self._fuse, chunks, vector, k, question, where, tenants)
+
+    def _fuse(
+        self,
+        chunks: List[CachedChunk],
+        vector: Sequence[float],
+        k: int,
+        question: str,
+        where: Optional[Dict[str, Any]],
+        tenants: Optional[List[str]],
+    ) -> List[CachedChunk]:
+        by_id = {chunk.id: chunk for chunk in chunks}
+        if tenants:
+            hits = self.shards.keyword_search(question, tenants, settings.HYBRID_CANDIDATES)
+            keyword_ids = [hit.id for hit in hits]
+            for tenant_id in dict.fromkeys(hit.tenant_id for hit in hits):
+                missing = [hit.id for hit in hits if hit.tenant_id == tenant_id and hit.id not in by_id]
+                shard = self.shards.shard(tenant_id) if missing else None
+                if shard is not None:
+                    for chunk in self._get_chunks(missing, vector, where, shard.collection):
+                        by_id.setdefault(chunk.id, chunk)
+        else:
+            keyword_ids = [chunk_id for chunk_id, _ in self.keyword_index.search(question, settings.HYBRID_CANDIDATES)]
+            missing = [chunk_id for chunk_id in keyword_ids if chunk_id not in by_id]
+            if missing:
+                for chunk in self._get_chunks(missing, vector, where):
+                    by_id.setdefault(chunk.id, chunk)
+        fused = reciprocal_rank_fusion([[chunk.id for chunk in chunks], keyword_ids])
+        # Keyword hits whose chunk is gone from the collection or filtered out are skipped
+        return [by_id[chunk_id] for chunk_id, _ in fused if chunk_id in by_id][:k]
+
+    def _vector_search(
+        self,
+        vector: Sequence[float],
+        k: int,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[CachedChunk]:
+        collection = self.collection
+        result = collection.query(
+            query_embeddings=[np.asarray(vector, dtype=np.float32)],
+            n_results=k,
+            where=where,
+            include=["documents", "metadatas", "distances", "embeddings"],
+        )
+        space = collection_space(collection)
+        return [
+            CachedChunk(
+                chunk_id,
+                np.asarray(embedding, dtype=np.float32),
+                search_result(text, metadata or {}, similarity_from_distance(distance, space)),
+            )
+            for chunk_id, text, metadata, distance, embedding in zip(
+                result["ids"][0],
+                result["documents"][0],
+                result["metadatas"][0],
+                result["distances"][0],
+                result["embeddings"][0],
+            )
+        ]
+
+    def _get_chunks(
+        self,
+        chunk_ids: Sequence[str],
+        vector: Sequence[float],
+        where: Optional[Dict[str, Any]] = None,
+        collection: Any = None,
+    ) -> List[CachedChunk]:
+        """Chunks found only by keyword, scored by cosine similarity to the question"""
+        result = (collection if collection is not None else self.collection).get(
+            ids=list(chunk_ids),
+            where=where,
+            include=["documents", "metadatas", "embeddings"],
+        )
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        chunks = []
+        for chunk_id, text, metadata, embedding in zip(
+            result["ids"], result["documents"], result["metadatas"], result["embeddings"]
+        ):
+            embedding = np.asarray(embedding, dtype=np.float32)
+            similarity = float(embedding @ query) / max(float(np.linalg.norm(embedding)), 1e-12)
+            chunks.append(CachedChunk(chunk_id, embedding, search_result(text, metadata or {}, similarity)))
+        return chunks
+
+
+def _shard_chunks(hits: Sequence[ShardHit]) -> List[CachedChunk]:
+    """Merged shard hits as chunks, best first; a chunk indexed into two of the user's shards is kept once"""
+    chunks: Dict[str, CachedChunk] = {}
+    for hit in hits:
+        if hit.id not in chunks:
+            chunks[hit.id] = CachedChunk(
+                hit.id,
+                np.asarray(hit.embedding, dtype=np.float32),
+                search_result(hit.text, hit.metadata, hit.score),
+            )
+    return list(chunks.values())
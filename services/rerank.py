@@ -0,0 +1,168 @@
+import asyncio
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from core.config import settings
+from core.metrics import CACHE_LOOKUPS, registry, span
+from models.rag import SearchResult
+
+
+def _sigmoid(x: float) -> float:
+    return 1 / (1 + math.exp(-x))
+
+
+class CrossEncoderReranker:
+    """Reranks over-fetched vector candidates with a small CPU cross-encoder.
+
+    All (question, candidate) pairs are scored in one batched forward pass.
+    Orderings are cached per (question, candidate set). If the expected cost,
+    from a running average of per-pair latency, would exceed the latency
+    budget, the vector-store ordering is returned unchanged. Once the last
+    measurement is ``reprobe_seconds`` old, one request is reranked anyway to
+    measure again, so a single slow call can't switch reranking off for good.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        budget_ms: float = 150,
+        min_score: float = 0.0,
+        cache_size: int = 2048,
+        reprobe_seconds: float = 30,
+        model: Any = None,
+    ):
+        self.model_name = model_name
+        self.budget_ms = budget_ms
+        self.min_score = min_score
+        self.cache_size = cache_size
+        self.reprobe_seconds = reprobe_seconds
+        self._model = model  # anything with CrossEncoder.predict; loaded on first use if None
+        self._model_lock = threading.Lock()
+        self._cache: "OrderedDict[str, List[Tuple[int, float]]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._ms_per_pair: Optional[float] = None
+        self._measured_at = 0.0
+        self._stats = {"reranked": 0, "cache_hits": 0, "budget_fallbacks": 0, "probes": 0}
+
+    def warm_up(self) -> None:
+        """Load the model and run one pair through it, so neither counts against a request's budget"""
+        self._load_model().predict([("warm up", "warm up")], show_progress_bar=False)
+
+    def rank(
+        self,
+        question: str,
+        texts: Sequence[str],
+        top_n: int,
+        budget_ms: Optional[float] = None,
+    ) -> Tuple[Optional[List[Tuple[int, float]]], Dict[str, Any]]:
+        """Indices and scores of the best ``top_n`` texts, or None to keep the given order.
+
+        Texts scoring below ``min_score`` are dropped, but the best one is
+        always kept. The second value is metadata describing what happened.
+        """
+        if len(texts) <= 1:
+            return None, {"reranked": False, "reason": "too_few_candidates"}
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        key = self._cache_key(question, texts)
+        with self._cache_lock:
+            ranking = self._cache.get(key)
+            if ranking is not None:
+                self._cache.move_to_end(key)
+                self._stats["cache_hits"] += 1
+        CACHE_LOOKUPS.inc(1, "rerank", "hit" if ranking is not None else "miss")
+        info: Dict[str, Any] = {"reranked": True, "candidates": len(texts), "cached": ranking is not None}
+        if ranking is None:
+            probe = False
+            if self._ms_per_pair is not None and self._ms_per_pair * len(texts) > budget_ms:
+                if time.monotonic() - self._measured_at < self.reprobe_seconds:
+                    self._stats["budget_fallbacks"] += 1
+                    return None, {"reranked": False, "reason": "latency_budget"}
+                probe = True
+                self._stats["probes"] += 1
+            model = self._load_model()
+            started = time.perf_counter()
+            with span("rerank"):
+                ranking = self._score(model, question, texts)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._observe(elapsed_ms / len(texts), reset=probe)
+            info["rerank_ms"] = round(elapsed_ms, 1)
+            self._stats["reranked"] += 1
+            with self._cache_lock:
+                self._cache[key] = ranking
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        kept = []
+        for index, score in ranking[:top_n]:
+            if kept and score < self.min_score:
+                break
+            kept.append((index, score))
+        return kept, info
+
+    def rerank(
+        self,
+        question: str,
+        candidates: List[SearchResult],
+        top_n: int,
+        budget_ms: Optional[float] = None,
+    ) -> Tuple[List[SearchResult], Dict[str, Any]]:
+        """Return the best ``top_n`` candidates and metadata describing what happened"""
+        ranking, info = self.rank(question, [candidate.text for candidate in candidates], top_n, budget_ms)
+        if ranking is None:
+            return candidates[:top_n], info
+        return [candidates[index].model_copy(update={"score": score}) for index, score in ranking], info
+
+    async def arerank(
+        self,
+        question: str,
+        candidates: List[SearchResult],
+        top_n: int,
+        budget_ms: Optional[float] = None,
+    ) -> Tuple[List[SearchResult], Dict[str, Any]]:
+        return await asyncio.to_thread(self.rerank, question, candidates, top_n, budget_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "cache_size": len(self._cache),
+            "ms_per_pair": round(self._ms_per_pair, 3) if self._ms_per_pair is not None else None,
+        }
+
+    def _score(self, model: Any, question: str, texts: Sequence[str]) -> List[Tuple[int, float]]:
+        pairs = [(question, text) for text in texts]
+        logits = model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+        scores = [_sigmoid(float(logit)) for logit in logits]
+        return sorted(enumerate(scores), key=lambda pair: pair[1], reverse=True)
+
+    def _observe(self, ms_per_pair: float, reset: bool = False) -> None:
+        if self._ms_per_pair is None or reset:
+            self._ms_per_pair = ms_per_pair
+        else:
+            self._ms_per_pair = 0.8 * self._ms_per_pair + 0.2 * ms_per_pair
+        self._measured_at = time.monotonic()
+
+    def _load_model(self):
+        with self._model_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+                self._model = CrossEncoder(self.model_name, device="cpu")
+            return self._model
+
+    @staticmethod
+    def _cache_key(question: str, texts: Sequence[str]) -> str:
+        digest = hashlib.sha1(question.strip().lower().encode("utf-8"))
+        for text in texts:
+            digest.update(b"\0")
+            digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+
+reranker = CrossEncoderReranker(
+    model_name=settings.RERANK_MODEL_NAME,
+    budget_ms=settings.RERANK_BUDGET_MS,
+    min_score=settings.RERANK_MIN_SCORE,
+)
+registry.register_gauges("rag_reranker", "Cross-encoder reranker state", reranker.stats)
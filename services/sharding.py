@@ -0,0 +1,328 @@
+import asyncio
+import hashlib
+import heapq
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from core.config import settings
+from core.metrics import registry, span
+from models.auth import UserResponse
+from models.rag import IndexConfig
+from services.ann import collection_space, default_index_config, get_chroma_client, open_collection, similarity_from_distance
+from services.keyword_index import KeywordIndex
+
+logger = logging.getLogger(__name__)
+
+_UNSAFE = re.compile(r"[^a-z0-9]+")
+
+# Rough resident size of one HNSW entry beyond its float32 vector (links, ids, metadata)
+_HNSW_OVERHEAD = 1.5
+
+# Shard opens are serialized per tenant on one of these, so the lock table stays bounded
+_OPEN_LOCK_STRIPES = 64
+
+# Anyone can sign up with these, so a domain from this list never names a workspace
+PUBLIC_MAIL_DOMAINS = frozenset({
+    "gmail.com", "googlemail.com", "outlook.com", "hotmail.com", "live.com", "msn.com",
+    "yahoo.com", "ymail.com", "icloud.com", "me.com", "mac.com", "aol.com",
+    "proton.me", "protonmail.com", "gmx.com", "gmx.de", "mail.com", "yandex.com", "zoho.com",
+})
+
+
+class ShardHit(NamedTuple):
+    tenant_id: str
+    id: str
+    score: float  # similarity, higher is better
+    text: str
+    metadata: Dict[str, Any]
+    embedding: Optional[Any] = None
+
+
+def tenant_for_user(user: UserResponse, shard_by: Optional[str] = None) -> str:
+    """Shard a user's documents are written to.
+
+    When sharding by workspace this is the explicit workspace id from the
+    token (Clerk organization, Google Workspace domain), never the email
+    domain; users without one, or whose "workspace" is a public mail domain,
+    get a shard of their own.
+    """
+    shard_by = shard_by or settings.SHARD_BY
+    if shard_by == "workspace":
+        workspace = (user.workspace_id or "").strip().lower()
+        if workspace and workspace not in PUBLIC_MAIL_DOMAINS:
+            return f"workspace:{workspace}"
+    return user.id
+
+
+def tenants_for_user(user: UserResponse, shard_by: Optional[str] = None) -> List[str]:
+    """Shards a user's searches cover: the one they write to, plus their own from before they joined a workspace"""
+    return list(dict.fromkeys([tenant_for_user(user, shard_by), user.id]))
+
+
+def tenant_collection_name(tenant_id: str) -> str:
+    """Chroma-safe collection name (3-63 chars of [a-z0-9_]) that is unique per tenant"""
+    slug = _UNSAFE.sub("_", tenant_id.lower()).strip("_")[:40] or "tenant"
+    digest = hashlib.sha1(tenant_id.encode("utf-8")).hexdigest()[:8]
+    return f"tenant_{slug}_{digest}"
+
+
+class ChromaShard:
+    """One tenant's Chroma collection, queried with a precomputed embedding, and its BM25 index"""
+
+    def __init__(self, tenant_id: str, collection: Any, dim: int = 384, keyword_index: Optional[KeywordIndex] = None):
+        self.tenant_id = tenant_id
+        self.collection = collection
+        self.dim = dim
+        self.space = collection_space(collection)
+        self.keyword_index = keyword_index if keyword_index is not None else KeywordIndex()
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.collection.count() * self.dim * 4 * _HNSW_OVERHEAD)
+
+    def search(self, vector: Sequence[float], k: int, where: Optional[Dict[str, Any]] = None) -> List[ShardHit]:
+        result = self.collection.query(
+            query_embeddings=[list(map(float, vector))],
+            n_results=k,
+            where=where,
+            include=["documents", "metadatas", "distances", "embeddings"],
+        )
+        return [
+            ShardHit(
+                self.tenant_id,
+                chunk_id,
+                similarity_from_distance(distance, self.space),
+                text or "",
+                metadata or {},
+                embedding,
+            )
+            for chunk_id, text, metadata, distance, embedding in zip(
+                result["ids"][0],
+                result["documents"][0],
+                result["metadatas"][0],
+                result["distances"][0],
+                result["embeddings"][0],
+            )
+        ]
+
+
+def chroma_shard_opener(
+    index_config: Optional[IndexConfig] = None,
+    client: Any = None,
+    keyword_dir: Optional[str] = None,
+) -> Callable[[str, bool], Optional[ChromaShard]]:
+    """Shard factory with a collection and a keyword index per tenant, on the process-wide Chroma client by default.
+
+    That client's segment cache is LRU under ``SHARD_MEMORY_BUDGET_MB``, so
+    HNSW segments of shards the router evicts are unloaded by Chroma as well.
+    Keyword indexes are saved under ``keyword_dir`` (the Chroma directory for
+    the process-wide client); without one they only live in memory.
+    """
+    if client is None:
+        client = get_chroma_client()
+        keyword_dir = keyword_dir or settings.CHROMA_PERSIST_DIRECTORY
+    index_config = index_config or default_index_config()
+
+    def open_shard(tenant_id: str, create: bool) -> Optional[ChromaShard]:
+        name = tenant_collection_name(tenant_id)
+        if create:
+            collection = open_collection(client, name, index_config)
+        else:
+            try:
+                collection = client.get_collection(name)
+            except Exception:
+                return None
+        keyword_path = os.path.join(keyword_dir, f"keyword_index_{name}") if keyword_dir else None
+        return ChromaShard(tenant_id, collection, keyword_index=KeywordIndex(keyword_path))
+
+    return open_shard
+
+
+class ShardRouter:
+    """Routes reads and writes to per-tenant shards and keeps hot shards open.
+
+    Open shards are held in LRU order and the least recently used ones are
+    dropped once their estimated resident size exceeds the memory budget; the
+    shard being used is never evicted. Searches over several tenants fan out
+    in parallel and the per-shard top-k lists are merged into a global top-k.
+    Keyword searches run on each shard's own BM25 index, so their cost and
+    results depend only on the tenants searched.
+    """
+
+    def __init__(
+        self,
+        open_shard: Callable[[str, bool], Optional[Any]],
+        memory_budget_bytes: int,
+        max_concurrency: int = 8,
+    ):
+        self._open_shard = open_shard
+        self.memory_budget_bytes = memory_budget_bytes
+        self.max_concurrency = max_concurrency
+        self._shards: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._open_locks = [threading.Lock() for _ in range(_OPEN_LOCK_STRIPES)]
+        self._opened = 0
+        self._evicted = 0
+
+    def shard(self, tenant_id: str, create: bool = False) -> Optional[Any]:
+        """The tenant's shard, opening it if needed; None if it doesn't exist and ``create`` is False"""
+        with self._lock:
+            shard = self._shards.get(tenant_id)
+            if shard is not None:
+                self._shards.move_to_end(tenant_id)
+                return shard
+        with self._open_locks[hash(tenant_id) % len(self._open_locks)]:
+            with self._lock:
+                shard = self._shards.get(tenant_id)
+            if shard is None:
+                shard = self._open_shard(tenant_id, create)
+                if shard is None:
+                    return None
+                self._admit(tenant_id, shard)
+            return shard
+
+    def refresh_size(self, tenant_id: str, shard: Optional[Any] = None) -> None:
+        """Re-estimate a shard's size after writes and evict others if over budget.
+
+        Passing the ``shard`` that was written to re-admits it, in case it was
+        evicted meanwhile and readers reopened a copy without the new keywords.
+        """
+        if shard is None:
+            with self._lock:
+                shard = self._shards.get(tenant_id)
+        if shard is not None:
+            self._admit(tenant_id, shard)
+
+    def upsert(
+        self,
+        tenant_id: str,
+        engine: Any,
+        ids: Sequence[str],
+        texts: Sequence[str],
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> int:
+        """Embed and write chunks into the tenant's own collection, creating it on first write"""
+        shard = self.shard(tenant_id, create=True)
+        written = engine.bulk_upsert(shard.collection, ids, texts, metadatas)
+        shard.keyword_index.add(ids, texts)
+        self.refresh_size(tenant_id, shard)
+        return written
+
+    def evict(self, tenant_id: str) -> None:
+        with self._lock:
+            if self._shards.pop(tenant_id, None) is not None:
+                self._sizes.pop(tenant_id, None)
+                self._evicted += 1
+
+    def search(
+        self,
+        vector: Sequence[float],
+        tenant_ids: Iterable[str],
+        k: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[ShardHit]:
+        hits = [self._search_shard(tenant_id, vector, k, where) for tenant_id in dict.fromkeys(tenant_ids)]
+        return merge_top_k(hits, k)
+
+    async def asearch(
+        self,
+        vector: Sequence[float],
+        tenant_ids: Iterable[str],
+        k: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[ShardHit]:
+        """Scatter the query to each tenant's shard in parallel and gather the global top-k"""
+        tenant_ids = list(dict.fromkeys(tenant_ids))
+        if len(tenant_ids) == 1:
+            return await asyncio.to_thread(self.search, vector, tenant_ids, k, where)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def one(tenant_id: str) -> List[ShardHit]:
+            async with semaphore:
+                return await asyncio.to_thread(self._search_shard, tenant_id, vector, k, where)
+
+        with span("shard_search"):
+            hits = await asyncio.gather(*(one(tenant_id) for tenant_id in tenant_ids))
+        return merge_top_k(hits, k)
+
+    def keyword_search(self, question: str, tenant_ids: Iterable[str], k: int = 10) -> List[ShardHit]:
+        """Global BM25 top-k over the tenants' own keyword indexes; hits carry ids and scores only"""
+        hits = []
+        for tenant_id in dict.fromkeys(tenant_ids):
+            shard = self.shard(tenant_id)
+            if shard is None:
+                continue
+            hits.append([
+                ShardHit(tenant_id, chunk_id, score, "", {})
+                for chunk_id, score in shard.keyword_index.search(question, k)
+            ])
+        return merge_top_k(hits, k)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "open_shards": len(self._shards),
+                "resident_bytes": sum(self._sizes.values()),
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "opened": self._opened,
+                "evicted": self._evicted,
+            }
+
+    def _search_shard(
+        self,
+        tenant_id: str,
+        vector: Sequence[float],
+        k: int,
+        where: Optional[Dict[str, Any]],
+    ) -> List[ShardHit]:
+        shard = self.shard(tenant_id)
+        if shard is None:
+            return []
+        try:
+            return shard.search(vector, k, where)
+        except Exception:
+            # One unavailable shard degrades the answer instead of failing it
+            logger.exception("Search failed on shard %s", tenant_id)
+            return []
+
+    def _admit(self, tenant_id: str, shard: Any) -> None:
+        size = int(getattr(shard, "nbytes", 0))
+        with self._lock:
+            if tenant_id not in self._shards:
+                self._opened += 1
+            self._shards[tenant_id] = shard
+            self._shards.move_to_end(tenant_id)
+            self._sizes[tenant_id] = size
+            while len(self._shards) > 1 and sum(self._sizes.values()) > self.memory_budget_bytes:
+                cold, _ = self._shards.popitem(last=False)
+                self._sizes.pop(cold, None)
+                self._evicted += 1
+
+
+def merge_top_k(hit_lists: Iterable[List[ShardHit]], k: int) -> List[ShardHit]:
+    """Global top-k by score across per-shard result lists"""
+    return heapq.nlargest(k, (hit for hits in hit_lists for hit in hits), key=lambda hit: hit.score)
+
+
+_shard_router: Optional[ShardRouter] = None
+_shard_router_lock = threading.Lock()
+
+
+def get_shard_router() -> ShardRouter:
+    """Process-wide router over the persistent Chroma store, created on first use"""
+    global _shard_router
+    with _shard_router_lock:
+        if _shard_router is None:
+            budget = settings.SHARD_MEMORY_BUDGET_MB * 1024 * 1024
+            _shard_router = ShardRouter(
+                chroma_shard_opener(),
+                memory_budget_bytes=budget,
+                max_concurrency=settings.SHARD_SEARCH_CONCURRENCY,
+            )
+            registry.register_gauges("rag_shards", "Per-tenant index shards", _shard_router.stats)
+        return _shard_router
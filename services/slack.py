@@ -0,0 +1,168 @@
+import asyncio
+import random
+import re
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set
+
+import httpx
+
+from core.admission import SLACK
+from core.config import settings
+from core.metrics import registry
+from models.rag import RAGRequest, RAGResponse
+
+if TYPE_CHECKING:
+    from services.rag import RAGService
+
+_WORD = re.compile(r"\w+")
+
+
+def format_blocks(result: RAGResponse) -> List[Dict[str, Any]]:
+    """Block Kit message for a RAG answer and its sources"""
+    blocks: List[Dict[str, Any]] = [
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": result.answer
+            }
+        }
+    ]
+    if result.sources:
+        source_text = "*Sources:*\n"
+        for source in result.sources:
+            metadata = source.metadata
+            title = f"<{metadata.url}|{metadata.title}>" if metadata.url else metadata.title
+            source_text += f"• {title} ({metadata.source_type.value})\n"
+        blocks.append({
+            "type": "context",
+            "elements": [
+                {
+                    "type": "mrkdwn",
+                    "text": source_text
+                }
+            ]
+        })
+    return blocks
+
+
+class SlackResponder:
+    """Answers slash commands in the background and posts to their response_url.
+
+    At most ``max_concurrency`` RAG queries run at once and ``max_pending``
+    commands may wait. In-flight questions with the same words (ignoring
+    case, whitespace and punctuation) share one query; paraphrases are not
+    merged here but hit the semantic answer cache once the first is answered.
+    The RAG service is resolved in the background, so commands are
+    acknowledged even while it is still loading. Replies go through a
+    pooled keep-alive client with retries, honouring Retry-After.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        max_pending: int = 100,
+        max_attempts: int = 4,
+        timeout: float = 10,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._deliveries: Set[asyncio.Task] = set()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._stats = {"accepted": 0, "rejected": 0, "deduplicated": 0, "delivered": 0, "delivery_failures": 0}
+
+    def submit(self, question: str, response_url: str, get_rag_service: Callable[[], "RAGService"]) -> bool:
+        """Schedule an answer; False when the backlog is full"""
+        if len(self._deliveries) >= self.max_pending:
+            self._stats["rejected"] += 1
+            return False
+        key = " ".join(_WORD.findall(question.lower()))
+        query = self._inflight.get(key)
+        if query is None:
+            query = asyncio.create_task(self._run_query(question, get_rag_service))
+            self._inflight[key] = query
+            query.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self._stats["deduplicated"] += 1
+        delivery = asyncio.create_task(self._deliver(query, response_url))
+        self._deliveries.add(delivery)
+        delivery.add_done_callback(self._deliveries.discard)
+        self._stats["accepted"] += 1
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "pending": len(self._deliveries), "inflight_queries": len(self._inflight)}
+
+    async def aclose(self) -> None:
+        tasks = [*self._inflight.values(), *self._deliveries]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._semaphore = None  # bound to this event loop
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _run_query(self, question: str, get_rag_service: Callable[[], "RAGService"]) -> RAGResponse:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            # The first command after startup may have to wait for the models to load
+            rag_service = await asyncio.to_thread(get_rag_service)
+            return await rag_service.query(RAGRequest(question=question), priority=SLACK)
+
+    async def _deliver(self, query: asyncio.Task, response_url: str) -> None:
+        try:
+            result = await asyncio.shield(query)
+            payload = {
+                "response_type": "in_channel",
+                "replace_original": False,
+                "text": result.answer,
+                "blocks": format_blocks(result)
+            }
+        except Exception as e:
+            payload = {
+                "response_type": "ephemeral",
+                "text": f"Error processing your request: {str(e)}"
+            }
+        if await self._post(response_url, payload):
+            self._stats["delivered"] += 1
+        else:
+            self._stats["delivery_failures"] += 1
+
+    async def _post(self, url: str, payload: Dict[str, Any]) -> bool:
+        client = self._get_client()
+        for attempt in range(self.max_attempts):
+            delay = min(0.5 * 2 ** attempt, 8) * (0.5 + random.random())
+            try:
+                resp = await client.post(url, json=payload)
+                if resp.status_code < 400:
+                    return True
+                if resp.status_code != 429 and resp.status_code < 500:
+                    return False
+                retry_after = resp.headers.get("Retry-After")
+                if retry_after and retry_after.isdigit():
+                    delay = float(retry_after)
+            except httpx.TransportError:
+                pass
+            if attempt + 1 < self.max_attempts:
+                await asyncio.sleep(delay)
+        return False
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+            )
+        return self._client
+
+
+slack_responder = SlackResponder(
+    max_concurrency=settings.SLACK_MAX_CONCURRENT_QUERIES,
+    max_pending=settings.SLACK_MAX_PENDING_COMMANDS,
+)
+registry.register_gauges("rag_slack", "Slack command responder state", slack_responder.stats)
@@ -0,0 +1,56 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class SQLitePool:
+    """Bounded pool of SQLite connections in WAL mode, shared by the on-disk stores.
+
+    At most ``size`` connections are opened; further callers wait for one to
+    be returned. A connection is used by one caller at a time, from whichever
+    thread holds it, and ``connection()`` commits on success or rolls back on
+    error. Async callers go through ``asyncio.to_thread``.
+    """
+
+    def __init__(self, path: str, size: int = 4, timeout: float = 10):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            conn = self._connect() if can_create else self._idle.get()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        """Close the idle connections"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._created -= 1
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        return conn
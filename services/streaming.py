@@ -0,0 +1,113 @@
+import asyncio
+import json
+import math
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from core.admission import OverloadedError
+from models.rag import RAGRequest, RAGResponse
+
+# Events yielded by RAGService.stream_query, in order:
+#   ("sources", List[SearchResult])  once, as soon as retrieval finishes
+#   ("token", str)                   for every chunk of answer text
+#   ("metadata", Dict[str, Any])     once, after generation completes
+RAGStreamEvent = Tuple[str, Any]
+
+
+def _to_jsonable(data: Any) -> Any:
+    if isinstance(data, BaseModel):
+        return data.model_dump(mode="json")
+    if isinstance(data, (list, tuple)):
+        return [_to_jsonable(item) for item in data]
+    return data
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode a single Server-Sent Events frame"""
+    payload = json.dumps(_to_jsonable(data), separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def sse_from_rag_events(events: AsyncIterator[RAGStreamEvent]) -> AsyncIterator[str]:
+    """Turn RAG stream events into SSE frames, adding timings to the final frame"""
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+    metadata: Dict[str, Any] = {}
+    try:
+        async for event, data in events:
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+            if event == "sources":
+                timings["retrieval_ms"] = elapsed_ms
+            elif event == "token":
+                timings.setdefault("first_token_ms", elapsed_ms)
+            elif event == "metadata":
+                metadata.update(data or {})
+                continue
+            yield format_sse(event, data)
+    except OverloadedError as e:
+        yield format_sse("error", {"detail": str(e), "retry_after": max(1, math.ceil(e.retry_after))})
+        return
+    except Exception as e:
+        yield format_sse("error", {"detail": str(e)})
+        return
+    finally:
+        # Close the source as soon as the client disconnects, so its generation slot is freed
+        aclose = getattr(events, "aclose", None)
+        if aclose is not None:
+            await aclose()
+    timings["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    metadata["timings"] = {**metadata.get("timings", {}), **timings}
+    yield format_sse("metadata", metadata)
+
+
+async def ndjson_batch_results(
+    run: Callable[[RAGRequest, Any], Awaitable[RAGResponse]],
+    requests: List[RAGRequest],
+    concurrency: int,
+    embed: Callable[[List[str]], Awaitable[Sequence[Any]]],
+) -> AsyncIterator[str]:
+    """Embed every question in one call, then run the queries with bounded concurrency.
+
+    ``run(request, vector)`` gets the precomputed question vector; one NDJSON
+    line is yielded per item as it completes, errors included.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+    try:
+        vectors = await embed([request.question for request in requests])
+    except Exception as e:
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        for index in range(len(requests)):
+            line = {"index": index, "status": "error", "elapsed_ms": elapsed_ms, "error": str(e)}
+            yield json.dumps(line, separators=(",", ":")) + "\n"
+        return
+
+    async def run_one(index: int, request: RAGRequest) -> Dict[str, Any]:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await run(request, vectors[index])
+            except Exception as e:
+                return {
+                    "index": index,
+                    "status": "error",
+                    "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                    "error": str(e),
+                }
+            return {
+                "index": index,
+                "status": "ok",
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                "response": response.model_dump(mode="json"),
+            }
+
+    tasks = [asyncio.create_task(run_one(i, request)) for i, request in enumerate(requests)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield json.dumps(await next_done, separators=(",", ":")) + "\n"
+    finally:
+        # Client went away: stop the remaining work
+        for task in tasks:
+            task.cancel()
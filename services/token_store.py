@@ -0,0 +1,108 @@
+import asyncio
+import base64
+import hashlib
+import json
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from core.config import settings
+from services.sqlite_pool import SQLitePool
+
+GOOGLE = "google"
+NOTION = "notion"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tokens (
+    kind TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    value BLOB NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (kind, user_id)
+)
+"""
+
+
+def _fernet(secret_key: str) -> Fernet:
+    """Fernet cipher keyed by a SHA-256 digest of SECRET_KEY"""
+    digest = hashlib.sha256(secret_key.encode("utf-8")).digest()
+    return Fernet(base64.urlsafe_b64encode(digest))
+
+
+class TokenStore:
+    """Encrypted OAuth/integration token store shared by all routers and workers.
+
+    Tokens live in SQLite (WAL mode, so readers never block the writer) and are
+    encrypted with a key derived from ``SECRET_KEY``. Connections come from a
+    small pool; reads go through an in-process cache whose short TTL bounds
+    staleness when another worker updates a token.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        secret_key: str,
+        pool_size: int = 4,
+        cache_ttl: float = 30,
+    ):
+        self.path = path
+        self.cache_ttl = cache_ttl
+        self._cipher = _fernet(secret_key)
+        self._pool = SQLitePool(path, pool_size)
+        self._cache: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+        with self._pool.connection() as conn:
+            conn.execute(_SCHEMA)
+
+    def get(self, kind: str, user_id: str) -> Optional[Any]:
+        key = (kind, user_id)
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        with self._pool.connection() as conn:
+            row = conn.execute(
+                "SELECT value FROM tokens WHERE kind = ? AND user_id = ?", key
+            ).fetchone()
+        value = self._decrypt(row[0]) if row else None
+        self._cache[key] = (time.monotonic() + self.cache_ttl, value)
+        return value
+
+    def set(self, kind: str, user_id: str, value: Any) -> None:
+        encrypted = self._cipher.encrypt(json.dumps(value).encode("utf-8"))
+        with self._pool.connection() as conn:
+            conn.execute(
+                "INSERT INTO tokens (kind, user_id, value, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (kind, user_id) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                (kind, user_id, encrypted, time.time()),
+            )
+        self._cache[(kind, user_id)] = (time.monotonic() + self.cache_ttl, value)
+
+    def delete(self, kind: str, user_id: str) -> None:
+        with self._pool.connection() as conn:
+            conn.execute("DELETE FROM tokens WHERE kind = ? AND user_id = ?", (kind, user_id))
+        self._cache.pop((kind, user_id), None)
+
+    async def aget(self, kind: str, user_id: str) -> Optional[Any]:
+        cached = self._cache.get((kind, user_id))
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        return await asyncio.to_thread(self.get, kind, user_id)
+
+    async def aset(self, kind: str, user_id: str, value: Any) -> None:
+        await asyncio.to_thread(self.set, kind, user_id, value)
+
+    async def adelete(self, kind: str, user_id: str) -> None:
+        await asyncio.to_thread(self.delete, kind, user_id)
+
+    def close(self) -> None:
+        self._pool.close()
+
+    def _decrypt(self, value: bytes) -> Optional[Any]:
+        try:
+            return json.loads(self._cipher.decrypt(value))
+        except InvalidToken:
+            # Written under a different SECRET_KEY; treat as missing so the user reconnects
+            return None
+
+
+token_store = TokenStore(settings.TOKEN_STORE_PATH, settings.SECRET_KEY)
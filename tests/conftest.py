@@ -0,0 +1,119 @@
+import os
+import re
+import sys
+import tempfile
+import uuid
+from typing import List
+
+# Settings are read at import time, so point every on-disk store at a scratch directory first
+_STATE_DIR = tempfile.mkdtemp(prefix="docs-qa-tests-")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "test-client-id")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "test-client-secret")
+os.environ.setdefault("WARM_UP_SERVICES", "false")
+os.environ.setdefault("TOKEN_STORE_PATH", os.path.join(_STATE_DIR, "token_store.sqlite3"))
+os.environ.setdefault("CONVERSATION_STORE_PATH", os.path.join(_STATE_DIR, "conversations.sqlite3"))
+os.environ.setdefault("CHROMA_PERSIST_DIRECTORY", os.path.join(_STATE_DIR, "chroma_index"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from benchmarks.corpus import HashingEmbedder
+
+
+class FakeChatModel:
+    """Streams a canned answer word by word and records the prompts it was sent"""
+
+    model = "fake-chat-model"
+
+    def __init__(self, answer: str = "Up to five vacation days carry over into the next year."):
+        self.answer = answer
+        self.calls: List[list] = []
+
+    async def astream(self, messages, max_tokens, temperature):
+        self.calls.append(messages)
+        for piece in re.findall(r"\S+\s*", self.answer):
+            yield piece
+
+
+@pytest.fixture
+def embedder():
+    return HashingEmbedder()
+
+
+@pytest.fixture
+def chat_model():
+    return FakeChatModel()
+
+
+@pytest.fixture
+def collection():
+    import chromadb
+    client = chromadb.EphemeralClient()
+    name = f"test_{uuid.uuid4().hex[:12]}"
+    yield client.get_or_create_collection(name, metadata={"hnsw:space": "cosine"})
+    client.delete_collection(name)
+
+
+@pytest.fixture
+def keyword_index():
+    from services.keyword_index import KeywordIndex
+    return KeywordIndex()
+
+
+@pytest.fixture
+def add_chunks(collection, embedder, keyword_index):
+    """Write chunks into the test collection and keyword index: add_chunks([(id, text, metadata), ...])"""
+
+    def add(chunks):
+        ids, texts, metadatas = zip(*chunks)
+        collection.upsert(
+            ids=list(ids),
+            embeddings=embedder.embed(list(texts)),
+            documents=list(texts),
+            metadatas=list(metadatas),
+        )
+        keyword_index.add(ids, texts)
+
+    return add
+
+
+@pytest.fixture
+def make_rag_service(collection, chat_model, embedder, keyword_index):
+    """RAGService over the test collection, fake chat model and hashing embedder; keywords override parts"""
+    from services.cache import SemanticCache
+    from services.rag import RAGService
+
+    async def embed_query(text):
+        return embedder.embed_query(text)
+
+    def make(**overrides):
+        components = {
+            "collection": collection,
+            "llm": chat_model,
+            "embed_query": embed_query,
+            "cache": SemanticCache(),
+            "keyword_index": keyword_index,
+            "reranker": None,
+            **overrides,
+        }
+        return RAGService(**components)
+
+    return make
+
+
+@pytest.fixture
+def rag_service(make_rag_service):
+    return make_rag_service()
+
+
+@pytest.fixture
+def client(rag_service):
+    from fastapi.testclient import TestClient
+
+    from main import app
+    from services.container import get_rag_service
+
+    app.dependency_overrides[get_rag_service] = lambda: rag_service
+    yield TestClient(app)
+    app.dependency_overrides.clear()
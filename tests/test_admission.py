@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from core import admission
+from core.admission import INTERACTIVE, OverloadedError, PriorityGate, client_address, client_key
+from models.auth import UserResponse
+from models.rag import RAGRequest
+
+
+def _gate():
+    return PriorityGate(max_concurrency=1, max_queued=1, deadlines={INTERACTIVE: 0.05})
+
+
+def _request(peer, forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "headers": headers, "client": (peer, 1234)})
+
+
+def test_failed_generation_releases_the_slot(make_rag_service, chat_model, add_chunks):
+    add_chunks([("a:0", "Vacation days carry over.", {"title": "Handbook"})])
+
+    async def failing(messages, max_tokens, temperature):
+        raise RuntimeError("model unavailable")
+        yield
+
+    chat_model.astream = failing
+    gate = _gate()
+    service = make_rag_service(gate=gate)
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await service.query(RAGRequest(question="vacation"))
+
+    asyncio.run(run())
+    assert gate.stats()["active"] == 0
+
+
+def test_abandoned_stream_releases_the_slot(make_rag_service, add_chunks):
+    add_chunks([("a:0", "Vacation days carry over.", {"title": "Handbook"})])
+    gate = _gate()
+    service = make_rag_service(gate=gate)
+
+    async def run():
+        never_started = service.stream_query(RAGRequest(question="vacation"))
+        stream = service.stream_query(RAGRequest(question="vacation"))
+        assert (await stream.__anext__())[0] == "sources"
+        assert (await stream.__anext__())[0] == "token"
+        assert gate.stats()["active"] == 1
+        await stream.aclose()
+        del never_started
+
+    asyncio.run(run())
+    assert gate.stats()["active"] == 0
+
+
+def test_retrieval_does_not_wait_for_a_generation_slot(make_rag_service, add_chunks):
+    add_chunks([("a:0", "Vacation days carry over.", {"title": "Handbook"})])
+    gate = _gate()
+    service = make_rag_service(gate=gate)
+
+    async def run():
+        await gate.acquire(INTERACTIVE)  # every slot busy
+        stream = service.stream_query(RAGRequest(question="vacation"))
+        assert (await stream.__anext__())[0] == "sources"
+        with pytest.raises(OverloadedError):
+            await stream.__anext__()
+        gate.release()
+
+    asyncio.run(run())
+    assert gate.stats()["active"] == 0
+
+
+def test_client_key_prefers_the_verified_user():
+    user = UserResponse(id="user_123", email="a@example.com", name="A")
+    assert client_key(_request("10.0.0.5"), user) == "user:user_123"
+    assert client_key(_request("10.0.0.5")) == "ip:10.0.0.5"
+
+
+def test_forwarded_for_is_only_trusted_from_known_proxies(monkeypatch):
+    monkeypatch.setattr(admission, "_trusted_proxies", admission._networks(["10.0.0.0/8"]))
+
+    assert client_address(_request("203.0.113.9", "198.51.100.1")) == "203.0.113.9"
+    assert client_address(_request("10.0.0.2", "198.51.100.1")) == "198.51.100.1"
+    # A client-supplied hop to the left of the real one is ignored
+    assert client_address(_request("10.0.0.2", "1.2.3.4, 198.51.100.1, 10.0.0.3")) == "198.51.100.1"
+
+
+def test_rate_limit_rejects_unverified_bearer_tokens(client):
+    response = client.post("/query", json={"question": "vacation"}, headers={"Authorization": "Bearer not-a-jwt"})
+    assert response.status_code == 401
@@ -0,0 +1,28 @@
+import uuid
+
+import chromadb
+import pytest
+from pydantic import ValidationError
+
+from models.rag import IndexConfig
+from services.ann import open_collection
+
+
+def test_collections_are_created_with_the_configured_hnsw_parameters():
+    client = chromadb.EphemeralClient()
+    name = f"ann_{uuid.uuid4().hex[:12]}"
+    config = IndexConfig(similarity_metric="dot_product", hnsw_m=32, hnsw_ef_construction=120, hnsw_ef_search=20)
+
+    hnsw = open_collection(client, name, config).configuration["hnsw"]
+    assert (hnsw["space"], hnsw["max_neighbors"], hnsw["ef_construction"], hnsw["ef_search"]) == ("ip", 32, 120, 20)
+
+    # Reopening keeps the built graph's parameters but applies the new ef_search
+    reopened = open_collection(client, name, config.model_copy(update={"hnsw_m": 8, "hnsw_ef_search": 80}))
+    hnsw = client.get_collection(reopened.name).configuration["hnsw"]
+    assert (hnsw["max_neighbors"], hnsw["ef_search"]) == (32, 80)
+
+
+def test_unknown_quantization_is_rejected():
+    assert IndexConfig(quantization="int8").quantization == "int8"
+    with pytest.raises(ValidationError):
+        IndexConfig(quantization="pq")
@@ -0,0 +1,101 @@
+import asyncio
+
+import numpy as np
+
+from models.docs import DocumentMetadata, SourceType
+from models.rag import RAGRequest, RAGResponse, SearchResult
+from services.cache import SemanticCache
+from services.pipeline import _upsert_chunks
+
+HANDBOOK = [("handbook:0", "Vacation days: up to five unused vacation days carry over into the next year.",
+             {"source_type": "notion", "source_id": "handbook", "title": "Employee Handbook"})]
+
+
+def _response(source_id):
+    metadata = DocumentMetadata(source_type=SourceType.notion, source_id=source_id, title=source_id)
+    return RAGResponse(answer=source_id, sources=[SearchResult(text="", metadata=metadata, score=0.5)])
+
+
+def test_repeated_question_is_answered_from_the_cache(rag_service, chat_model, add_chunks):
+    add_chunks(HANDBOOK)
+    request = RAGRequest(question="How many vacation days carry over?")
+
+    first = asyncio.run(rag_service.query(request))
+    second = asyncio.run(rag_service.query(request))
+
+    assert len(chat_model.calls) == 1
+    assert second.answer == first.answer
+    assert second.sources == first.sources
+    assert second.metadata["cache"]["hit"] is True
+
+
+def test_reindexing_a_document_invalidates_answers_citing_it(rag_service, chat_model, add_chunks, collection):
+    add_chunks(HANDBOOK)
+    request = RAGRequest(question="How many vacation days carry over?", num_sources=1)
+    asyncio.run(rag_service.query(request))
+
+    _upsert_chunks(collection, None, rag_service.cache, None, [([HANDBOOK[0]], np.ones((1, 384), dtype=np.float32))])
+    asyncio.run(rag_service.query(request))
+
+    assert len(chat_model.calls) == 2
+
+
+def test_edits_that_only_remove_text_invalidate_answers(rag_service, chat_model, collection, keyword_index, embedder, tmp_path):
+    from models.docs import Document
+    from services.manifest import IndexManifest
+    from services.pipeline import build_document_pipeline
+
+    manifest = IndexManifest(str(tmp_path / "manifest.json"))
+
+    def ingest(*paragraphs):
+        document = Document(
+            id="handbook",
+            content="\n\n".join(paragraphs),
+            metadata=DocumentMetadata(source_type=SourceType.notion, source_id="handbook", title="Employee Handbook"),
+        )
+
+        async def source():
+            yield document
+
+        pipeline = build_document_pipeline(
+            collection, lambda item: item, engine=embedder, keyword_index=keyword_index,
+            answer_cache=rag_service.cache, manifest=manifest,
+        )
+        return asyncio.run(pipeline.run(source()))["stages"]["upsert"]["items_in"]
+
+    vacation = "Vacation days: up to five unused vacation days carry over into the next year. " * 8
+    sick = "Sick leave does not carry over and is not paid out when you leave. " * 8
+    ingest(vacation, sick)
+    request = RAGRequest(question="Does sick leave carry over?")
+    asyncio.run(rag_service.query(request))
+
+    assert ingest(vacation) == 0  # nothing new to write, only stale chunks to delete
+    asyncio.run(rag_service.query(request))
+
+    assert len(chat_model.calls) == 2
+
+
+def test_lookup_matches_the_closest_entry_with_the_same_parameters():
+    cache = SemanticCache(max_entries=4, max_distance=0.1)
+    request = RAGRequest(question="q")
+    cache.put([1.0, 0.0], request, _response("a"))
+    cache.put([0.99, 0.14], request, _response("b"))
+    cache.put([1.0, 0.0], RAGRequest(question="q", num_sources=5), _response("c"))
+
+    assert cache.get([0.98, 0.2], request).answer == "b"
+    assert cache.get([1.0, 0.01], request).answer == "a"
+    assert cache.get([0.0, 1.0], request) is None
+
+
+def test_eviction_reuses_rows_in_lru_order():
+    cache = SemanticCache(max_entries=2, max_distance=0.01)
+    request = RAGRequest(question="q")
+    cache.put([1.0, 0.0, 0.0], request, _response("a"))
+    cache.put([0.0, 1.0, 0.0], request, _response("b"))
+    cache.get([1.0, 0.0, 0.0], request)  # "a" is now the most recently used
+    cache.put([0.0, 0.0, 1.0], request, _response("c"))
+
+    assert cache.get([0.0, 1.0, 0.0], request) is None
+    assert cache.get([1.0, 0.0, 0.0], request).answer == "a"
+    assert cache.get([0.0, 0.0, 1.0], request).answer == "c"
+    assert cache.stats()["evictions"] == 1
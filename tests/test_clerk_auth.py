@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+import clerk_auth
+from clerk_auth import CLERK_AUDIENCE, CLERK_ISSUER, ClerkAuthError, JWKSProvider, set_jwks_provider, verify_clerk_token
+
+
+class SigningKey:
+    """Local RSA key standing in for one of Clerk's signing keys"""
+
+    def __init__(self, kid):
+        self.kid = kid
+        private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.pem = private.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ).decode()
+        public_pem = private.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode()
+        self.public_jwk = {**jwk.construct(public_pem, "RS256").to_dict(), "kid": kid, "use": "sig"}
+
+    def sign(self, subject="user_1", expires_in=300):
+        now = int(time.time())
+        claims = {"sub": subject, "iss": CLERK_ISSUER, "aud": CLERK_AUDIENCE, "iat": now, "exp": now + expires_in}
+        return jwt.encode(claims, self.pem, algorithm="RS256", headers={"kid": self.kid})
+
+
+class FakeJWKS:
+    """Fetcher serving whichever keys Clerk currently publishes; counts the fetches"""
+
+    def __init__(self, *keys):
+        self.keys = list(keys)
+        self.fetches = 0
+
+    async def __call__(self):
+        self.fetches += 1
+        return {"keys": [key.public_jwk for key in self.keys]}
+
+
+@pytest.fixture(scope="module")
+def keys():
+    return SigningKey("key-1"), SigningKey("key-2")
+
+
+@pytest.fixture
+def use_jwks():
+    def install(fetcher, **kwargs):
+        set_jwks_provider(JWKSProvider(fetcher=fetcher, **kwargs))
+        return fetcher
+
+    original = clerk_auth._jwks_provider
+    yield install
+    set_jwks_provider(original)
+
+
+def test_verified_tokens_are_served_from_the_cache(keys, use_jwks):
+    fetcher = use_jwks(FakeJWKS(keys[0]))
+    token = keys[0].sign()
+
+    first = asyncio.run(verify_clerk_token(token))
+    second = asyncio.run(verify_clerk_token(token))
+
+    assert first["sub"] == second["sub"] == "user_1"
+    assert fetcher.fetches == 1
+
+
+def test_rotated_key_is_fetched_when_a_token_names_an_unknown_kid(keys, use_jwks):
+    old, new = keys
+    fetcher = use_jwks(FakeJWKS(old), min_refresh_interval=0)
+    assert asyncio.run(verify_clerk_token(old.sign()))["sub"] == "user_1"
+
+    # Clerk rotates: the new key is published before tokens are signed with it
+    fetcher.keys = [old, new]
+    assert asyncio.run(verify_clerk_token(new.sign(subject="user_2")))["sub"] == "user_2"
+    assert fetcher.fetches == 2
+
+
+def test_unknown_kid_refetches_are_throttled(keys, use_jwks):
+    known, unpublished = keys
+    fetcher = use_jwks(FakeJWKS(known), min_refresh_interval=60)
+    asyncio.run(verify_clerk_token(known.sign()))
+
+    for _ in range(3):
+        with pytest.raises(ClerkAuthError, match="unknown signing key"):
+            asyncio.run(verify_clerk_token(unpublished.sign()))
+
+    assert fetcher.fetches == 1
+
+
+def test_jwks_is_refetched_after_its_ttl(keys, use_jwks):
+    fetcher = use_jwks(FakeJWKS(keys[0]), ttl=0)
+
+    asyncio.run(verify_clerk_token(keys[0].sign(subject="user_1")))
+    asyncio.run(verify_clerk_token(keys[0].sign(subject="user_2")))
+
+    assert fetcher.fetches == 2
+
+
+def test_expired_tokens_are_rejected(keys, use_jwks):
+    use_jwks(FakeJWKS(keys[0]))
+
+    with pytest.raises(ClerkAuthError, match="expired"):
+        asyncio.run(verify_clerk_token(keys[0].sign(expires_in=-10)))
+
+
+def test_cached_claims_are_not_served_past_expiry(keys, use_jwks, monkeypatch):
+    use_jwks(FakeJWKS(keys[0]))
+    decoded = []
+    decode = jwt.decode
+    monkeypatch.setattr(clerk_auth.jwt, "decode", lambda *args, **kwargs: decoded.append(1) or decode(*args, **kwargs))
+
+    long_lived = keys[0].sign(expires_in=300)
+    asyncio.run(verify_clerk_token(long_lived))
+    asyncio.run(verify_clerk_token(long_lived))
+    assert len(decoded) == 1
+
+    # Within the expiry leeway: still valid, but never answered from the cache
+    expiring = keys[0].sign(subject="user_2", expires_in=2)
+    asyncio.run(verify_clerk_token(expiring))
+    asyncio.run(verify_clerk_token(expiring))
+    assert len(decoded) == 3
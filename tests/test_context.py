@@ -0,0 +1,45 @@
+import asyncio
+
+from models.rag import RAGRequest
+from services.context import ContextPacker
+
+META = {"source_type": "notion", "source_id": "handbook", "title": "Handbook"}
+PAGE = (
+    "Vacation days: up to five unused vacation days carry over into the next year. "
+    "Requests go to your manager at least two weeks ahead and are approved in the HR portal. "
+    "Sick leave is separate and does not carry over."
+)
+
+
+def _words(text):
+    return len(text.split())
+
+
+def test_overlapping_chunks_are_merged_and_the_savings_reported(make_rag_service, add_chunks, chat_model):
+    # Two chunks of one page sharing a 60-character overlap, plus the whole page copied elsewhere
+    first, second = PAGE[:120], PAGE[60:]
+    copy = {**META, "source_id": "wiki-copy", "title": "Wiki copy"}
+    add_chunks([("handbook:0", first, META), ("handbook:1", second, META), ("copy:0", PAGE, copy)])
+    service = make_rag_service(packer=ContextPacker(count_tokens=_words))
+
+    response = asyncio.run(service.query(RAGRequest(question="Do vacation days carry over?", num_sources=3)))
+
+    assert [source.text for source in response.sources] == [PAGE]
+    context = response.metadata["context"]
+    assert context["chunks_merged"] == 1 and context["duplicates_removed"] == 1
+    assert context["tokens_saved"] > 0
+    assert chat_model.calls[0][0]["content"].count("carry over into") == 1
+
+
+def test_the_last_passage_is_cut_at_a_word_boundary_to_fill_the_budget():
+    from models.rag import SearchResult
+
+    packer = ContextPacker(count_tokens=_words, min_truncated_tokens=3)
+    result = SearchResult.model_validate({"text": PAGE, "metadata": META, "score": 0.9})
+
+    packed = packer.pack([result], budget=12)
+
+    assert packed.tokens_used <= 12
+    assert packed.chunks_truncated == 1
+    assert packed.sources[0].text.endswith(" …")
+    assert PAGE.startswith(packed.sources[0].text[:-2])
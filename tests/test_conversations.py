@@ -0,0 +1,53 @@
+from services.auth import AuthService
+
+HANDBOOK = [
+    ("handbook:0", "Vacation days: up to five unused vacation days carry over into the next year.",
+     {"source_type": "notion", "source_id": "handbook", "title": "Employee Handbook"}),
+    ("handbook:1", "Vacation requests go to your manager at least two weeks ahead.",
+     {"source_type": "notion", "source_id": "handbook", "title": "Employee Handbook"}),
+]
+
+
+def _auth(email):
+    return {"Authorization": f"Bearer {AuthService().create_access_token({'email': email})}"}
+
+
+def _ask(client, question, conversation_id, headers=None):
+    body = {"question": question, "num_sources": 2, "conversation_id": conversation_id}
+    response = client.post("/query", json=body, headers=headers or {})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_follow_up_reuses_chunks_and_sends_history(client, add_chunks, chat_model, rag_service):
+    add_chunks(HANDBOOK)
+    owner = _auth("owner@example.com")
+
+    first = _ask(client, "How many vacation days carry over?", "new", owner)
+    conversation_id = first["metadata"]["conversation_id"]
+    second = _ask(client, "Do vacation days carry over?", conversation_id, owner)
+
+    assert second["metadata"]["conversation_id"] == conversation_id
+    assert second["metadata"]["reused_chunks"] > 0
+    assert second["context_used"] == first["context_used"]
+    follow_up = chat_model.calls[1]
+    assert follow_up[0] == chat_model.calls[0][0]  # same system prompt and context prefix
+    assert [m["role"] for m in follow_up[1:]] == ["user", "assistant", "user"]
+    assert follow_up[1]["content"] == "How many vacation days carry over?"
+    # Follow-ups never come from (or go into) the answer cache
+    assert rag_service.cache.stats()["size"] == 0
+
+
+def test_conversations_are_private_to_their_owner(client, add_chunks):
+    add_chunks(HANDBOOK)
+    owner, other = _auth("owner@example.com"), _auth("other@example.com")
+    conversation_id = _ask(client, "How many vacation days carry over?", "new", owner)["metadata"]["conversation_id"]
+
+    hijacked = _ask(client, "What did I ask before?", conversation_id, other)
+    assert hijacked["metadata"]["conversation_id"] != conversation_id
+    assert hijacked["metadata"]["reused_chunks"] == 0
+
+    assert client.delete(f"/query/conversations/{conversation_id}").status_code == 401
+    assert client.delete(f"/query/conversations/{conversation_id}", headers=other).status_code == 404
+    assert client.delete(f"/query/conversations/{conversation_id}", headers=owner).status_code == 204
+    assert client.delete(f"/query/conversations/{conversation_id}", headers=owner).status_code == 404
@@ -0,0 +1,158 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from benchmarks.corpus import HashingEmbedder
+from services.document import DocumentService
+from services.http_fetch import AsyncFetcher
+from services.keyword_index import KeywordIndex
+from services.manifest import IndexManifest
+
+
+def _fetcher(handler, **kwargs):
+    return AsyncFetcher(transport=httpx.MockTransport(handler), default_rate=100, **kwargs)
+
+
+def _serve(responses):
+    """Handler replaying ``responses`` in order and recording when each request arrived"""
+    arrivals = []
+
+    def handler(request):
+        arrivals.append(time.monotonic())
+        return responses[len(arrivals) - 1]
+
+    return handler, arrivals
+
+
+def test_retry_after_is_waited_out_once():
+    handler, arrivals = _serve([
+        httpx.Response(429, headers={"Retry-After": "0.3"}),
+        httpx.Response(200, json={"ok": True}),
+    ])
+
+    async def run():
+        fetcher = _fetcher(handler)
+        try:
+            return await fetcher.get_json("https://api.example.com/pages")
+        finally:
+            await fetcher.aclose()
+
+    assert asyncio.run(run()) == {"ok": True}
+    waited = arrivals[1] - arrivals[0]
+    assert 0.3 <= waited < 0.5
+
+
+def test_retry_after_pauses_the_whole_host():
+    handler, arrivals = _serve([
+        httpx.Response(429, headers={"Retry-After": "0.3"}),
+        httpx.Response(200, json={}),
+        httpx.Response(200, json={}),
+    ])
+
+    async def run():
+        fetcher = _fetcher(handler, per_host_concurrency=1)
+        try:
+            first = asyncio.create_task(fetcher.get_json("https://api.example.com/a"))
+            await asyncio.sleep(0.05)
+            await fetcher.get_json("https://api.example.com/b")
+            await first
+        finally:
+            await fetcher.aclose()
+
+    asyncio.run(run())
+    assert arrivals[1] - arrivals[0] >= 0.3
+    assert arrivals[2] - arrivals[0] >= 0.3
+
+
+def test_server_errors_are_retried_with_backoff():
+    handler, arrivals = _serve([httpx.Response(503), httpx.Response(502), httpx.Response(200, json=[1])])
+
+    async def run():
+        fetcher = _fetcher(handler)
+        try:
+            return await fetcher.get_json("https://api.example.com/x")
+        finally:
+            await fetcher.aclose()
+
+    assert asyncio.run(run()) == [1]
+    assert arrivals[1] - arrivals[0] >= 0.25  # 0.5s +/- 50% jitter
+    assert arrivals[2] - arrivals[1] >= 0.5  # doubled
+
+
+def test_gives_up_after_max_retries():
+    handler, arrivals = _serve([httpx.Response(500)] * 2)
+
+    async def run():
+        fetcher = _fetcher(handler, max_retries=1)
+        try:
+            await fetcher.get_json("https://api.example.com/x")
+        finally:
+            await fetcher.aclose()
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(run())
+    assert len(arrivals) == 2
+
+
+def _notion_server():
+    """Fake Notion API: two pages of search results, nested blocks and one throttled request"""
+    state = {"throttled": False}
+
+    def text_block(block_id, text, has_children=False):
+        return {"id": block_id, "type": "paragraph", "has_children": has_children,
+                "paragraph": {"rich_text": [{"plain_text": text}]}}
+
+    def page(page_id, title):
+        return {"id": page_id, "url": f"https://notion.so/{page_id}", "last_edited_time": "2024-05-01T10:00:00.000Z",
+                "properties": {"Name": {"type": "title", "title": [{"plain_text": title}]}}}
+
+    def handler(request):
+        path = request.url.path
+        if path == "/v1/search":
+            if b"start_cursor" in request.content:
+                return httpx.Response(200, json={"results": [page("p2", "Expenses")], "has_more": False})
+            return httpx.Response(200, json={"results": [page("p1", "Handbook")], "has_more": True, "next_cursor": "c1"})
+        if path == "/v1/blocks/p1/children":
+            if not state["throttled"]:
+                state["throttled"] = True
+                return httpx.Response(429, headers={"Retry-After": "0.1"})
+            return httpx.Response(200, json={"results": [text_block("b1", "Vacation days carry over.", True)],
+                                             "has_more": False})
+        if path == "/v1/blocks/b1/children":
+            return httpx.Response(200, json={"results": [text_block("b2", "Up to five of them.")], "has_more": False})
+        if path == "/v1/blocks/p2/children":
+            return httpx.Response(200, json={"results": [text_block("b3", "Expense reports are due monthly.")],
+                                             "has_more": False})
+        return httpx.Response(404)
+
+    return handler
+
+
+def test_document_service_crawls_notion_through_the_fetcher(collection, tmp_path):
+    fetcher = _fetcher(_notion_server())
+    keywords = KeywordIndex(str(tmp_path / "keyword_index"))
+    service = DocumentService(
+        collection=collection,
+        engine=HashingEmbedder(),
+        fetcher=lambda: fetcher,
+        cache=None,
+        manifest=IndexManifest(str(tmp_path / "manifest.json")),
+        keyword_index=keywords,
+    )
+
+    async def run():
+        try:
+            return await service.process_notion_pages(token="secret")
+        finally:
+            await fetcher.aclose()
+
+    assert sorted(asyncio.run(run())) == ["p1", "p2"]
+    stored = collection.get(include=["documents", "metadatas"])
+    by_source = {metadata["source_id"]: text for text, metadata in zip(stored["documents"], stored["metadatas"])}
+    assert by_source["p1"] == "Vacation days carry over.\nUp to five of them."
+    assert by_source["p2"] == "Expense reports are due monthly."
+    # The keyword index is filled from the same chunks and saved after the crawl
+    [(chunk_id, _)] = KeywordIndex(keywords.path).search("expense reports", k=1)
+    assert chunk_id in stored["ids"]
@@ -0,0 +1,147 @@
+import asyncio
+
+from benchmarks.corpus import HashingEmbedder
+from models.docs import Document, DocumentMetadata, SourceType
+from models.rag import ChunkingConfig
+from services.chunking import TextChunker
+from services.manifest import IndexManifest
+from services.pipeline import build_document_pipeline
+
+CHUNKER = TextChunker(ChunkingConfig(chunk_size=100, chunk_overlap=0))
+
+
+def _document(source_id, paragraphs):
+    return Document(
+        id=source_id,
+        content="\n\n".join(paragraphs),
+        metadata=DocumentMetadata(source_type=SourceType.notion, source_id=source_id, title=source_id),
+    )
+
+
+def _ingest(collection, manifest, documents):
+    async def source():
+        for document in documents:
+            yield document
+
+    pipeline = build_document_pipeline(
+        collection, lambda document: document, chunker=CHUNKER, engine=HashingEmbedder(), manifest=manifest
+    )
+    report = asyncio.run(pipeline.run(source()))
+    manifest.save()
+    return report["stages"]["upsert"]["items_in"]
+
+
+HANDBOOK = _document("handbook", [
+    "Vacation days: up to five unused days carry over into the next year.",
+    "Sick leave does not carry over and is not paid out when you leave.",
+])
+
+
+def test_chunk_ids_are_the_manifest_content_hashes(collection, tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.json"))
+    _ingest(collection, manifest, [HANDBOOK])
+
+    expected = [chunk.id for chunk in CHUNKER.split_documents([HANDBOOK])]
+    assert sorted(collection.get()["ids"]) == sorted(expected)
+    reloaded = IndexManifest(manifest.path)
+    assert sorted(reloaded.forget("notion", "handbook")) == sorted(expected)
+
+
+def test_unchanged_documents_are_skipped(collection, tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.json"))
+    assert _ingest(collection, manifest, [HANDBOOK]) > 0
+
+    assert _ingest(collection, manifest, [HANDBOOK]) == 0
+
+
+def test_only_new_chunks_are_embedded_and_stale_ones_deleted(collection, tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.json"))
+    _ingest(collection, manifest, [HANDBOOK])
+    before = set(collection.get()["ids"])
+
+    edited = _document("handbook", [
+        "Vacation days: up to five unused days carry over into the next year.",
+        "Parental leave is sixteen weeks at full pay.",
+    ])
+    assert _ingest(collection, manifest, [edited]) == 1
+
+    after = collection.get(include=["documents"])
+    assert set(after["ids"]) == {chunk.id for chunk in CHUNKER.split_documents([edited])}
+    assert len(before & set(after["ids"])) == 1
+    assert not any("Sick leave" in text for text in after["documents"])
+
+
+def test_engines_for_different_models_use_their_own_model(monkeypatch):
+    import numpy as np
+
+    from services import embeddings
+
+    class FakeModel:
+        def __init__(self, dim):
+            self.dim = dim
+
+        def encode(self, texts, **kwargs):
+            return np.ones((len(texts), self.dim))
+
+    monkeypatch.setattr(embeddings, "_worker_models", {"small-model": FakeModel(3), "large-model": FakeModel(5)})
+
+    assert embeddings.EmbeddingEngine("small-model").embed(["text"]).shape == (1, 3)
+    assert embeddings.EmbeddingEngine("large-model").embed(["text"]).shape == (1, 5)
+    assert embeddings.EmbeddingEngine("small-model").embed_query("text").shape == (3,)
+
+
+def test_pages_missing_from_a_full_crawl_are_removed(collection, keyword_index, tmp_path, monkeypatch):
+    from services.document import DocumentService
+
+    def page(page_id, text):
+        return {"id": page_id, "title": page_id, "body": {"storage": {"value": f"<p>{text}</p>"}}}
+
+    crawls = [
+        [page("vpn", "Connect to the VPN at vpn.example.com."), page("lunch", "Lunch is served at noon.")],
+        [page("vpn", "Connect to the VPN at vpn.example.com.")],
+    ]
+
+    async def iter_pages(*args):
+        for item in crawls.pop(0):
+            yield item
+
+    monkeypatch.setattr("services.document.iter_confluence_pages", iter_pages)
+    service = DocumentService(
+        collection=collection,
+        engine=HashingEmbedder(),
+        chunker=CHUNKER,
+        fetcher=lambda: None,
+        cache=None,
+        manifest=IndexManifest(str(tmp_path / "manifest.json")),
+        keyword_index=keyword_index,
+    )
+    crawl = lambda: asyncio.run(service.process_confluence_docs("https://wiki.example.com", "user", "token"))
+
+    crawl()
+    assert {m["source_id"] for m in collection.get()["metadatas"]} == {"vpn", "lunch"}
+    assert keyword_index.search("lunch noon", 5) != []
+
+    crawl()
+    assert {m["source_id"] for m in collection.get()["metadatas"]} == {"vpn"}
+    assert keyword_index.search("lunch noon", 5) == []
+    assert IndexManifest(service.manifest.path).removed_sources("confluence", ["vpn"]) == []
+
+
+def test_default_chunker_fits_chunks_in_the_embedding_window(monkeypatch, tmp_path):
+    from transformers import BertTokenizerFast
+
+    from services.chunking import default_chunker
+
+    words = [f"word{i}" for i in range(50)]
+    (tmp_path / "vocab.txt").write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "."] + words))
+    BertTokenizerFast(str(tmp_path / "vocab.txt")).save_pretrained(str(tmp_path / "model"))
+    monkeypatch.setattr("services.chunking.settings.EMBEDDING_MODEL_NAME", str(tmp_path / "model"))
+    monkeypatch.setattr("services.chunking.settings.CHUNK_LENGTH_FUNCTION", "token")
+    monkeypatch.setattr("services.chunking.settings.CHUNK_SIZE", 2000)
+
+    chunker = default_chunker()
+    text = " ".join(f"{' '.join(words[i % 40:i % 40 + 9])}." for i in range(300))
+    chunks = chunker.split_text(text)
+
+    assert len(chunks) > 1
+    assert max(len(chunker.tokenizer(chunk)["input_ids"]) for chunk in chunks) <= 256
@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services.auth import AuthService
+from services.container import get_document_service
+
+
+class StalledDocumentService:
+    """Indexing work that runs until it is cancelled"""
+
+    async def process_confluence_docs(self, **kwargs):
+        await asyncio.Event().wait()
+
+    async def process_google_doc(self, credentials, document_id, tenant_id=None, job=None):
+        return [document_id]
+
+
+def _auth(email):
+    return {"Authorization": f"Bearer {AuthService().create_access_token({'email': email})}"}
+
+
+@pytest.fixture
+def jobs_client():
+    app.dependency_overrides[get_document_service] = StalledDocumentService
+    with TestClient(app) as client:
+        yield client
+    app.dependency_overrides.clear()
+
+
+CONFLUENCE = {"base_url": "https://wiki.example.com", "username": "a", "api_token": "t"}
+
+
+def test_jobs_are_only_visible_to_their_owner(jobs_client):
+    owner, other = _auth("owner@example.com"), _auth("other@example.com")
+    job_id = jobs_client.post("/docs/index/confluence", json=CONFLUENCE, headers=owner).json()["job_id"]
+
+    assert jobs_client.get(f"/docs/jobs/{job_id}").status_code == 401
+    assert jobs_client.get(f"/docs/jobs/{job_id}", headers=other).status_code == 404
+    assert jobs_client.delete(f"/docs/jobs/{job_id}", headers=other).status_code == 404
+    assert jobs_client.get(f"/docs/jobs/{job_id}", headers=owner).json()["status"] in ("queued", "running")
+
+    assert jobs_client.delete(f"/docs/jobs/{job_id}", headers=owner).status_code == 200
+    for _ in range(50):
+        status = jobs_client.get(f"/docs/jobs/{job_id}", headers=owner).json()["status"]
+        if status != "running":
+            break
+        time.sleep(0.02)
+    assert status == "cancelled"
+
+
+def test_google_jobs_belong_to_the_caller(jobs_client):
+    owner = _auth("owner@example.com")
+    body = {"google_token": "token", "document_id": "doc-1"}
+
+    assert jobs_client.post("/docs/index/google", json=body).status_code == 401
+    job_id = jobs_client.post("/docs/index/google", json=body, headers=owner).json()["job_id"]
+
+    assert jobs_client.get(f"/docs/jobs/{job_id}", headers=owner).status_code == 200
+    assert jobs_client.get(f"/docs/jobs/{job_id}", headers=_auth("other@example.com")).status_code == 404
+
+
+def test_running_jobs_report_indexed_documents_and_page_errors(collection, keyword_index, tmp_path, monkeypatch):
+    from benchmarks.corpus import HashingEmbedder
+    from services.document import DocumentService
+    from services.jobs import IndexingJobManager
+    from services.manifest import IndexManifest
+
+    release = asyncio.Event()
+
+    async def iter_pages(*args):
+        yield {"id": "vpn", "title": "VPN", "body": {"storage": {"value": "<p>Connect to vpn.example.com.</p>"}}}
+        await release.wait()
+        yield {"id": "broken", "title": "Broken", "body": None}
+
+    monkeypatch.setattr("services.document.iter_confluence_pages", iter_pages)
+    service = DocumentService(
+        collection=collection,
+        engine=HashingEmbedder(),
+        fetcher=lambda: None,
+        cache=None,
+        manifest=IndexManifest(str(tmp_path / "manifest.json")),
+        keyword_index=keyword_index,
+    )
+
+    async def wait_for(condition):
+        for _ in range(500):
+            if condition():
+                return
+            await asyncio.sleep(0.01)
+        raise AssertionError("timed out")
+
+    async def scenario():
+        manager = IndexingJobManager(max_workers=1)
+        job = manager.submit("owner", "confluence", lambda job: service.process_confluence_docs(
+            **CONFLUENCE, space_key="ENG", job=job
+        ))
+        await wait_for(lambda: job.to_status().documents_processed == 1)
+        running = job.to_status()
+        release.set()
+        await wait_for(lambda: job.status == "completed")
+        await manager.shutdown()
+        return running, job.to_status()
+
+    running, finished = asyncio.run(scenario())
+
+    assert running.status == "running" and running.throughput > 0
+    assert finished.document_ids == ["vpn"]
+    assert finished.errors and "AttributeError" in finished.errors[0]
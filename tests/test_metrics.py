@@ -0,0 +1,51 @@
+import asyncio
+
+from core.metrics import Registry, _request_timings, span
+from services.batching import EmbeddingMicroBatcher
+
+QUESTION = {"question": "How many vacation days carry over?"}
+HANDBOOK = [("handbook:0", "Up to five unused vacation days carry over into the next year.",
+             {"source_type": "notion", "source_id": "handbook", "title": "Employee Handbook"})]
+
+
+def test_query_reports_stage_timings_and_tokens(client, add_chunks):
+    add_chunks(HANDBOOK)
+
+    response = client.post("/query", json=QUESTION)
+
+    stages = {entry.split(";")[0].strip() for entry in response.headers["server-timing"].split(",")}
+    assert {"retrieve", "generate", "total"} <= stages
+    metrics = client.get("/metrics").text
+    assert 'rag_stage_duration_seconds_count{stage="generate"}' in metrics
+    assert 'rag_llm_tokens_total{direction="in"}' in metrics
+    assert 'rag_llm_tokens_total{direction="out"}' in metrics
+
+
+def test_spans_in_executor_threads_reach_the_request():
+    def embed_batch(texts):
+        with span("forward_pass"):
+            return [[1.0] for _ in texts]
+
+    async def request():
+        timings = {}
+        _request_timings.set(timings)
+        batcher = EmbeddingMicroBatcher(embed_batch, max_wait_ms=1)
+        try:
+            await batcher.embed("question")
+        finally:
+            batcher.close()
+        return timings
+
+    assert "forward_pass" in asyncio.run(request())
+
+
+def test_gauges_are_described_once_per_name():
+    registry = Registry()
+    registry.register_gauges("rag_shards", "Per-tenant index shards", lambda: {"open": 1})
+    registry.register_gauges("rag_shards", "Per-tenant index shards", lambda: {"open": 2})
+
+    text = registry.render()
+
+    assert text.count("# HELP rag_shards_open ") == 1
+    assert text.count("# TYPE rag_shards_open gauge") == 1
+    assert "rag_shards_open 2" in text
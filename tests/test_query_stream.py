@@ -0,0 +1,109 @@
+import json
+
+
+def _sse_events(body: str):
+    events = []
+    for frame in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+HANDBOOK = [
+    ("handbook:0", "Vacation days: up to five unused vacation days carry over into the next year.",
+     {"source_type": "notion", "source_id": "handbook", "title": "Employee Handbook"}),
+    ("expenses:0", "Expense reports are due by the fifth business day of the following month.",
+     {"source": "google_docs", "doc_id": "expenses", "title": "Expense Policy"}),
+]
+
+
+def test_stream_sends_sources_then_tokens_then_metadata(client, add_chunks, chat_model):
+    add_chunks(HANDBOOK)
+
+    response = client.post("/query/stream", json={"question": "How many vacation days carry over?", "num_sources": 2})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _sse_events(response.text)
+    names = [name for name, _ in events]
+    assert names[0] == "sources"
+    assert names[-1] == "metadata"
+    assert set(names[1:-1]) == {"token"}
+
+    sources = events[0][1]
+    assert sources[0]["metadata"]["title"] == "Employee Handbook"
+    assert 0 <= sources[-1]["score"] <= sources[0]["score"] <= 1
+    # Chunks written by the old LangChain indexer map onto the same metadata
+    assert sources[1]["metadata"]["source_type"] == "google_docs"
+    assert sources[1]["metadata"]["source_id"] == "expenses"
+
+    assert "".join(data for name, data in events if name == "token") == chat_model.answer
+    metadata = events[-1][1]
+    assert metadata["model"] == "fake-chat-model"
+    assert set(metadata["timings"]) >= {"retrieval_ms", "first_token_ms", "total_ms"}
+
+    system_prompt = chat_model.calls[0][0]["content"]
+    assert "carry over into the next year" in system_prompt
+
+
+def test_query_returns_the_streamed_answer(client, add_chunks, chat_model):
+    add_chunks(HANDBOOK)
+
+    response = client.post("/query", json={"question": "When are expense reports due?", "num_sources": 1})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["answer"] == chat_model.answer
+    assert [source["metadata"]["title"] for source in body["sources"]] == ["Expense Policy"]
+    assert "fifth business day" in body["context_used"]
+
+
+def test_stream_reports_generation_errors_as_an_event(client, add_chunks, chat_model):
+    add_chunks(HANDBOOK)
+
+    async def failing(messages, max_tokens, temperature):
+        raise RuntimeError("model unavailable")
+        yield
+
+    chat_model.astream = failing
+    response = client.post("/query/stream", json={"question": "How many vacation days carry over?"})
+
+    events = _sse_events(response.text)
+    assert [name for name, _ in events] == ["sources", "error"]
+    assert events[-1][1] == {"detail": "model unavailable"}
+
+
+def test_batch_embeds_all_questions_in_one_call(make_rag_service, add_chunks, embedder, chat_model):
+    from fastapi.testclient import TestClient
+
+    from main import app
+    from services.container import get_rag_service
+
+    add_chunks(HANDBOOK)
+    embed_calls = []
+
+    async def embed_queries(questions):
+        embed_calls.append(questions)
+        return embedder.embed(questions)
+
+    async def astream(messages, max_tokens, temperature):
+        if "expense" in messages[-1]["content"]:
+            raise RuntimeError("model unavailable")
+        yield "Five."
+
+    chat_model.astream = astream
+    service = make_rag_service(embed_queries=embed_queries)
+    app.dependency_overrides[get_rag_service] = lambda: service
+    try:
+        response = TestClient(app).post("/query/batch", json={"requests": [
+            {"question": "How many vacation days carry over?"},
+            {"question": "When are expense reports due?"},
+        ]})
+    finally:
+        app.dependency_overrides.clear()
+
+    lines = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda line: line["index"])
+    assert embed_calls == [["How many vacation days carry over?", "When are expense reports due?"]]
+    assert lines[0]["status"] == "ok" and lines[0]["response"]["answer"] == "Five."
+    assert lines[1]["status"] == "error" and lines[1]["error"] == "model unavailable"
+    assert lines[1]["elapsed_ms"] >= 0
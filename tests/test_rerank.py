@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+from models.rag import RAGRequest
+from services.rerank import CrossEncoderReranker
+
+
+class FakeCrossEncoder:
+    """Scores a pair by how often the text mentions ``keyword``; ``delays`` slows the next calls"""
+
+    def __init__(self, keyword="carry"):
+        self.keyword = keyword
+        self.delays = []
+        self.calls = 0
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.calls += 1
+        if self.delays:
+            time.sleep(self.delays.pop(0))
+        return [4.0 * text.lower().count(self.keyword) - 2.0 for _, text in pairs]
+
+
+TEXTS = [
+    "Expense reports are due monthly.",
+    "Up to five vacation days carry over into the next year.",
+    "Sick leave does not carry over.",
+]
+
+
+def test_rank_returns_indices_best_first():
+    reranker = CrossEncoderReranker(model=FakeCrossEncoder(), min_score=0.5)
+
+    ranking, info = reranker.rank("Do vacation days carry over?", TEXTS, top_n=3)
+
+    assert [index for index, _ in ranking] == [1, 2]  # the expense chunk scores below min_score
+    assert all(0 <= score <= 1 for _, score in ranking)
+    assert info["reranked"] and not info["cached"]
+    assert reranker.rank("Do vacation days carry over?", TEXTS, top_n=3)[1]["cached"]
+
+
+def test_one_slow_call_does_not_disable_reranking():
+    model = FakeCrossEncoder()
+    reranker = CrossEncoderReranker(model=model, budget_ms=50, reprobe_seconds=0.1)
+    model.delays = [0.2]  # one outlier, far over the budget
+
+    reranker.rank("first question", TEXTS, top_n=2)
+    ranking, info = reranker.rank("second question", TEXTS, top_n=2)
+    assert ranking is None and info["reason"] == "latency_budget"
+
+    time.sleep(0.1)
+    ranking, info = reranker.rank("third question", TEXTS, top_n=2)
+    assert info["reranked"]
+    assert reranker.stats()["probes"] == 1
+    # The probe replaced the outlier, so later requests are reranked again
+    assert reranker.rank("fourth question", TEXTS, top_n=2)[1]["reranked"]
+
+
+def test_warm_up_is_not_counted_against_the_budget():
+    model = FakeCrossEncoder()
+    reranker = CrossEncoderReranker(model=model, budget_ms=50)
+    model.delays = [0.2]
+
+    reranker.warm_up()
+
+    assert reranker.stats()["ms_per_pair"] is None
+    assert reranker.rank("question", TEXTS, top_n=2)[1]["reranked"]
+
+
+def test_rag_service_sends_the_reranked_chunks(make_rag_service, add_chunks, chat_model):
+    meta = {"source_type": "notion", "source_id": "handbook", "title": "Handbook"}
+    add_chunks([(f"handbook:{i}", text, meta) for i, text in enumerate(TEXTS)])
+    service = make_rag_service(reranker=CrossEncoderReranker(model=FakeCrossEncoder(), min_score=0.5))
+
+    response = asyncio.run(service.query(RAGRequest(question="When are expense reports due?", num_sources=3)))
+
+    assert [source.text for source in response.sources] == TEXTS[1:]
+    assert response.metadata["rerank"]["reranked"]
+    assert "Expense reports" not in chat_model.calls[0][0]["content"]
@@ -0,0 +1,50 @@
+import asyncio
+
+from core.config import settings
+from models.rag import RAGRequest
+
+META = {"source_type": "confluence", "source_id": "runbook", "title": "Runbook"}
+CHUNKS = [
+    (f"runbook:{i}", f"Which outage did the region {i} drill cover? Dashboards stayed green.", META)
+    for i in range(30)
+] + [
+    ("incident", "INC-4211 postmortem: ERR_CONN_RESET from the payments gateway.", META),
+]
+QUESTION = "Which outage did INC-4211 cover?"
+
+
+def test_keyword_hits_are_fused_with_vector_results(make_rag_service, add_chunks, monkeypatch):
+    monkeypatch.setattr(settings, "HYBRID_CANDIDATES", 2)
+    add_chunks(CHUNKS)
+    request = RAGRequest(question=QUESTION, num_sources=3)
+
+    vector_only = asyncio.run(make_rag_service(keyword_index=None).query(request))
+    assert "INC-4211" not in vector_only.context_used
+
+    hybrid = asyncio.run(make_rag_service().query(request))
+    assert any("INC-4211" in source.text for source in hybrid.sources)
+    assert all(0 <= source.score <= 1 for source in hybrid.sources)
+
+
+def test_keyword_hits_missing_from_the_collection_are_skipped(make_rag_service, add_chunks, keyword_index, monkeypatch):
+    monkeypatch.setattr(settings, "HYBRID_CANDIDATES", 2)
+    add_chunks(CHUNKS)
+    keyword_index.add(["deleted"], ["INC-4211 postmortem draft"])
+
+    sources = asyncio.run(make_rag_service().query(RAGRequest(question=QUESTION, num_sources=3))).sources
+    assert len(sources) == 3
+    assert any("ERR_CONN_RESET" in source.text for source in sources)
+
+
+def test_source_filter_is_applied_inside_the_search(make_rag_service, add_chunks):
+    notion = {"source_type": "notion", "source_id": "wiki", "title": "Wiki"}
+    confluence = {"source_type": "confluence", "source_id": "space", "title": "Space"}
+    add_chunks(
+        [(f"notion:{i}", f"Vacation days carry over, note {i}.", notion) for i in range(40)]
+        + [(f"confluence:{i}", f"Holiday calendar entry {i}.", confluence) for i in range(3)]
+    )
+    request = RAGRequest(question="Do vacation days carry over?", num_sources=3, source_types=["confluence"])
+
+    sources = asyncio.run(make_rag_service().query(request)).sources
+    assert len(sources) == 3
+    assert {source.metadata.source_type for source in sources} == {"confluence"}
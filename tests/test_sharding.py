@@ -0,0 +1,93 @@
+import asyncio
+import uuid
+
+import chromadb
+import pytest
+
+from models.auth import UserResponse
+from models.rag import RAGRequest
+from services.sharding import ChromaShard, ShardRouter, chroma_shard_opener, tenant_for_user, tenants_for_user
+
+
+def _user(user_id, workspace_id=None):
+    return UserResponse(id=user_id, email=f"{user_id}@example.com", name=user_id, workspace_id=workspace_id)
+
+
+def test_workspace_shards_key_on_the_explicit_workspace_id():
+    assert tenant_for_user(_user("ana", "org_acme"), "workspace") == "workspace:org_acme"
+    # No workspace claim: the email domain is never used, the user gets a shard of their own
+    assert tenant_for_user(_user("ben"), "workspace") == "ben"
+    assert tenant_for_user(_user("cy", "Gmail.com"), "workspace") == "cy"
+    assert tenants_for_user(_user("ana", "org_acme"), "workspace") == ["workspace:org_acme", "ana"]
+    assert tenants_for_user(_user("ana", "org_acme"), "user") == ["ana"]
+
+
+def test_shard_scores_follow_the_collection_distance():
+    collection = chromadb.EphemeralClient().get_or_create_collection(
+        f"l2_{uuid.uuid4().hex[:12]}", metadata={"hnsw:space": "l2"}
+    )
+    collection.upsert(ids=["same", "orthogonal"], embeddings=[[1.0, 0.0], [0.0, 1.0]], documents=["a", "b"])
+
+    hits = ChromaShard("t", collection, dim=2).search([1.0, 0.0], k=2)
+
+    assert [(hit.id, round(hit.score, 3)) for hit in hits] == [("same", 1.0), ("orthogonal", 0.0)]
+
+
+@pytest.fixture
+def shards(embedder):
+    router = ShardRouter(chroma_shard_opener(client=chromadb.EphemeralClient()), memory_budget_bytes=1 << 30)
+    suffix = uuid.uuid4().hex[:8]
+
+    def write(tenant_id, chunks):
+        tenant_id = f"{tenant_id}_{suffix}"
+        ids, texts, metadatas = zip(*chunks)
+        shard = router.shard(tenant_id, create=True)
+        shard.collection.upsert(
+            ids=list(ids), embeddings=embedder.embed(list(texts)), documents=list(texts), metadatas=list(metadatas)
+        )
+        shard.keyword_index.add(ids, texts)
+        return tenant_id
+
+    return router, write
+
+
+def test_rag_service_searches_only_the_callers_shards(make_rag_service, chat_model, shards, monkeypatch):
+    monkeypatch.setattr("services.sharding.settings.SHARD_BY", "workspace")
+    router, write = shards
+    meta = {"source_type": "notion", "source_id": "handbook", "title": "Handbook"}
+    acme = write("workspace:org_acme", [("acme:0", "Acme staff carry over five vacation days.", meta)])
+    ana = write("ana", [("ana:0", "My notes: ask HR about vacation days before March.", meta)])
+    beta = write("workspace:org_beta", [("beta:0", "Beta staff carry over ten vacation days.", meta)])
+    service = make_rag_service(shards=router)
+    request = RAGRequest(question="How many vacation days carry over?", num_sources=5)
+
+    response = asyncio.run(service.query(request, _user(ana, acme.split(":", 1)[1])))
+
+    assert {source.text for source in response.sources} == {
+        "Acme staff carry over five vacation days.",
+        "My notes: ask HR about vacation days before March.",
+    }
+    # Same question from another workspace: its own shards, not the cached Acme answer
+    response = asyncio.run(service.query(request, _user("bo", beta.split(":", 1)[1])))
+    assert [source.text for source in response.sources] == ["Beta staff carry over ten vacation days."]
+    assert len(chat_model.calls) == 2
+
+
+def test_keyword_hits_are_not_crowded_out_by_other_tenants(make_rag_service, embedder, shards):
+    router, write = shards
+    meta = {"source_type": "confluence", "source_id": "runbook", "title": "Runbook"}
+    notes = [(f"acme:{i}", f"Vacation days note {i}: unused vacation days carry over.", meta) for i in range(30)]
+    acme = write("acme", notes + [("acme:xj", "Error XJ-42 means the VPN token expired.", meta)])
+    beta = write("beta", [(f"beta:{i}", f"XJ-42 XJ-42 alert {i}: XJ-42 raised again.", meta) for i in range(30)])
+
+    async def embed_query(text):
+        # The vector side only ever sees Acme's vacation notes
+        return embedder.embed_query("unused vacation days carry over")
+
+    service = make_rag_service(shards=router, embed_query=embed_query)
+    request = RAGRequest(question="What does error XJ-42 mean?", num_sources=3)
+    response = asyncio.run(service.query(request, _user(acme)))
+
+    assert "Error XJ-42 means the VPN token expired." in {source.text for source in response.sources}
+    assert [hit.tenant_id for hit in router.keyword_search("XJ-42", [acme], 5)] == [acme]
+    assert {hit.tenant_id for hit in router.keyword_search("XJ-42", [acme, beta], 40)} == {acme, beta}
@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlencode
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.slack import SlackResponder
+
+SIGNING_SECRET = "test-signing-secret"
+
+
+class FakeSlack:
+    """Local stand-in for Slack's response_url endpoint; answers 429 to the first ``throttle`` posts"""
+
+    def __init__(self, throttle=0):
+        self.throttle = throttle
+        self.posts = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if fake.throttle:
+                    fake.throttle -= 1
+                    self.send_response(429)
+                    self.send_header("Retry-After", "0")
+                else:
+                    fake.posts.append((self.path, body))
+                    self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+
+    def wait_for(self, count, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while len(self.posts) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.posts
+
+
+@pytest.fixture
+def fake_slack():
+    fake = FakeSlack(throttle=1)
+    yield fake
+    fake.server.shutdown()
+
+
+def _signed(form):
+    body = urlencode(form).encode()
+    timestamp = str(int(time.time()))
+    signature = "v0=" + hmac.new(SIGNING_SECRET.encode(), b"v0:" + timestamp.encode() + b":" + body, hashlib.sha256).hexdigest()
+    headers = {
+        "X-Slack-Signature": signature,
+        "X-Slack-Request-Timestamp": timestamp,
+        "Content-Type": "application/x-www-form-urlencoded",
+    }
+    return body, headers
+
+
+def test_commands_are_acked_and_answered_through_response_url(rag_service, add_chunks, chat_model, fake_slack, monkeypatch):
+    from main import app
+    from services.container import get_rag_service_provider
+
+    add_chunks([("handbook:0", "Up to five unused vacation days carry over into the next year.",
+                 {"source_type": "notion", "source_id": "handbook", "title": "Employee Handbook"})])
+    monkeypatch.setattr("routers.slack.settings.SLACK_SIGNING_SECRET", SIGNING_SECRET)
+    built = threading.Event()
+
+    def slow_rag_service():
+        built.wait(5)  # still loading when the commands arrive
+        return rag_service
+
+    app.dependency_overrides[get_rag_service_provider] = lambda: slow_rag_service
+    try:
+        with TestClient(app) as client:
+            acks = []
+            for user, question in (("U1", "How many vacation days carry over?"), ("U2", "how many vacation days carry over")):
+                body, headers = _signed({"text": question, "user_id": user, "team_id": "T1",
+                                         "response_url": fake_slack.url(f"/hooks/{user}")})
+                started = time.perf_counter()
+                acks.append(client.post("/slack/query", content=body, headers=headers))
+                assert time.perf_counter() - started < 1
+
+            built.set()
+            posts = fake_slack.wait_for(2)
+    finally:
+        app.dependency_overrides.clear()
+
+    assert all(ack.status_code == 200 and ack.json()["text"].startswith("Looking that up") for ack in acks)
+    assert sorted(path for path, _ in posts) == ["/hooks/U1", "/hooks/U2"]
+    assert all(body["response_type"] == "in_channel" and body["blocks"] for _, body in posts)
+    assert len(chat_model.calls) == 1  # the two commands shared one query; the 429 was retried
+
+
+def test_unsigned_commands_are_rejected(client, monkeypatch):
+    monkeypatch.setattr("routers.slack.settings.SLACK_SIGNING_SECRET", SIGNING_SECRET)
+    body, headers = _signed({"text": "question", "response_url": "http://127.0.0.1:9/hook"})
+    headers["X-Slack-Signature"] = "v0=" + "0" * 64
+
+    assert client.post("/slack/query", content=body, headers=headers).status_code == 401
+
+
+def test_aclose_cancels_queries_in_flight(fake_slack):
+    started = asyncio.Event()
+    cancelled = []
+
+    class HangingRAGService:
+        async def query(self, request, priority):
+            started.set()
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append(request.question)
+                raise
+
+    async def scenario():
+        responder = SlackResponder()
+        assert responder.submit("What is the VPN address?", fake_slack.url("/hooks/U1"), HangingRAGService)
+        await asyncio.wait_for(started.wait(), 5)
+        await responder.aclose()
+        return responder.stats()
+
+    stats = asyncio.run(scenario())
+
+    assert cancelled == ["What is the VPN address?"]
+    assert stats["inflight_queries"] == 0 and stats["pending"] == 0
@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous for slow CI machines; a cold import is well under a second on a laptop
+IMPORT_BUDGET_SECONDS = 3.0
+FIRST_200_BUDGET_SECONDS = 5.0
+
+# Loaded in the background after startup, never by importing the app
+HEAVY_MODULES = ("torch", "sentence_transformers", "transformers", "chromadb", "openai")
+
+
+def _python(*args, **env):
+    return subprocess.run(
+        [sys.executable, *args], cwd=ROOT, env={**os.environ, **env}, capture_output=True, text=True, check=True
+    )
+
+
+def test_importing_main_stays_fast_and_skips_model_libraries():
+    stderr = _python("-X", "importtime", "-c", "import main").stderr
+    cumulative_us = {}
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, module = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                cumulative_us[module.strip()] = int(cumulative)
+
+    assert cumulative_us["main"] / 1e6 < IMPORT_BUDGET_SECONDS
+    assert [module for module in HEAVY_MODULES if module in cumulative_us] == []
+
+
+def test_health_answers_while_services_warm_up():
+    script = (
+        "import time\n"
+        "started = time.perf_counter()\n"
+        "from fastapi.testclient import TestClient\n"
+        "import main\n"
+        "with TestClient(main.app) as client:\n"
+        "    assert client.get('/health').status_code == 200\n"
+        "    print(time.perf_counter() - started)\n"
+    )
+    # Warm-up runs for real; offline, the model download fails fast instead of retrying
+    output = _python("-c", script, WARM_UP_SERVICES="true", HF_HUB_OFFLINE="1").stdout
+    seconds = float(output.strip().splitlines()[-1])
+
+    assert seconds < FIRST_200_BUDGET_SECONDS